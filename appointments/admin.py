@@ -5,16 +5,19 @@ from .models import Appointment, Prescription, MedicalRecord, Notification
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ('appointment_id', 'patient', 'doctor', 'appointment_date', 'appointment_time', 'status')
     list_filter = ('status', 'appointment_date')
+    list_select_related = ('patient__user', 'doctor__user')
     search_fields = ('appointment_id', 'patient__user__username', 'doctor__user__username')
 
 @admin.register(Prescription)
 class PrescriptionAdmin(admin.ModelAdmin):
     list_display = ('prescription_id', 'patient', 'doctor', 'created_at')
+    list_select_related = ('patient__user', 'doctor__user')
     search_fields = ('prescription_id', 'patient__user__username')
 
 @admin.register(MedicalRecord)
 class MedicalRecordAdmin(admin.ModelAdmin):
     list_display = ('record_id', 'patient', 'record_type', 'title', 'created_at')
+    list_select_related = ('patient__user',)
     list_filter = ('record_type', 'created_at')
     search_fields = ('record_id', 'patient__user__username', 'title')
 
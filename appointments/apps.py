@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AppointmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'appointments'
+
+    def ready(self):
+        # Connect the DoctorWorkload counter maintenance
+        from . import signals  # noqa: F401
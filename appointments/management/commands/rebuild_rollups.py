@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from appointments.rollups import expected_rollups, stored_rollups, write_rollups
+from core.signals import invalidate_shared_cache
+
+
+class Command(BaseCommand):
+    help = 'Recount the analytics rollup tables from the appointments table, report drift and rebuild them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift, do not rebuild')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = expected_rollups()
+            stored = stored_rollups()
+
+            drifted = 0
+            for model, counts in expected.items():
+                drift = sorted(
+                    (key, stored[model].get(key, 0), counts.get(key, 0))
+                    for key in counts.keys() | stored[model].keys()
+                    if stored[model].get(key, 0) != counts.get(key, 0)
+                )
+                for key, was, actual in drift:
+                    self.stdout.write(f"  {model.__name__} {', '.join(map(str, key))}: stored {was}, actual {actual}")
+                drifted += len(drift)
+
+            if not options['dry_run']:
+                write_rollups(expected)
+                invalidate_shared_cache()
+
+        summary = f'{drifted} drifted rollup row(s)'
+        if options['dry_run']:
+            self.stdout.write(summary + ' (dry run, nothing changed)')
+        else:
+            rows = sum(len(counts) for counts in expected.values())
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} rollup row(s); {summary}'))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from appointments.models import DoctorWorkload
+from core.signals import invalidate_shared_cache
+
+
+class Command(BaseCommand):
+    help = 'Recount DoctorWorkload from the appointments table, report drift and rebuild it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift, do not rebuild')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = DoctorWorkload.expected_counts()
+            stored = {
+                (row.doctor_id, row.date): row.appointment_count
+                for row in DoctorWorkload.objects.select_for_update()
+                if row.appointment_count
+            }
+
+            drift = sorted(
+                (key, stored.get(key, 0), expected.get(key, 0))
+                for key in expected.keys() | stored.keys()
+                if stored.get(key, 0) != expected.get(key, 0)
+            )
+            for (doctor_id, day), was, actual in drift:
+                self.stdout.write(f'  doctor {doctor_id} on {day}: stored {was}, actual {actual}')
+
+            if not options['dry_run']:
+                DoctorWorkload.objects.all().delete()
+                DoctorWorkload.objects.bulk_create([
+                    DoctorWorkload(doctor_id=doctor_id, date=day, appointment_count=count)
+                    for (doctor_id, day), count in expected.items()
+                ], batch_size=1000)
+                invalidate_shared_cache()
+
+        summary = f'{len(drift)} drifted day(s) across {len({key[0] for key, _, _ in drift})} doctor(s)'
+        if options['dry_run']:
+            self.stdout.write(summary + ' (dry run, nothing changed)')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(expected)} workload day(s); {summary}'))
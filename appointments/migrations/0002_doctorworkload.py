@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_workload(apps, schema_editor):
+    Appointment = apps.get_model('appointments', 'Appointment')
+    DoctorWorkload = apps.get_model('appointments', 'DoctorWorkload')
+
+    counts = Appointment.objects.filter(
+        status__in=['scheduled', 'confirmed']
+    ).values('doctor_id', 'appointment_date').annotate(total=models.Count('id'))
+
+    DoctorWorkload.objects.bulk_create([
+        DoctorWorkload(doctor_id=row['doctor_id'], date=row['appointment_date'], appointment_count=row['total'])
+        for row in counts
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_auto_20260203_1305'),
+        ('appointments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorWorkload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('appointment_count', models.IntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='workload_days', to='accounts.doctor')),
+            ],
+            options={
+                'unique_together': {('doctor', 'date')},
+            },
+        ),
+        migrations.RunPython(populate_workload, migrations.RunPython.noop),
+    ]
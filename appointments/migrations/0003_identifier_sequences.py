@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_auto_20260203_1305'),
+        ('appointments', '0002_doctorworkload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentifierSequence',
+            fields=[
+                ('prefix', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='appointment_id',
+            field=models.CharField(blank=True, max_length=20, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='medicalrecord',
+            name='record_id',
+            field=models.CharField(blank=True, max_length=20, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='prescription',
+            name='prescription_id',
+            field=models.CharField(blank=True, max_length=20, unique=True),
+        ),
+        migrations.CreateModel(
+            name='TokenCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('last_token', models.IntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='token_counters', to='accounts.doctor')),
+            ],
+            options={
+                'unique_together': {('doctor', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_auto_20260203_1305'),
+        ('appointments', '0003_identifier_sequences'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='doctor',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='accounts.doctor'),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='patient',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='accounts.patient'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'appointment_date', 'status'], name='appointment_doctor_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'appointment_date', 'status'], name='appointment_patient_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_date', 'status'], name='appointment_day_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['-created_at'], name='appointment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['updated_at'], name='appointment_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at'], name='appointment_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorworkload',
+            index=models.Index(fields=['date', 'doctor'], name='doctorworkload_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-created_at'], name='notification_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appointment_day_status_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_date', 'appointment_time', 'id'], name='appointment_listing_idx'),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import TruncMonth
+
+
+def populate_rollups(apps, schema_editor):
+    Appointment = apps.get_model('appointments', 'Appointment')
+    AppointmentDayRollup = apps.get_model('appointments', 'AppointmentDayRollup')
+    AppointmentMonthRollup = apps.get_model('appointments', 'AppointmentMonthRollup')
+    SpecializationPatient = apps.get_model('appointments', 'SpecializationPatient')
+    SpecializationRollup = apps.get_model('appointments', 'SpecializationRollup')
+
+    days = Appointment.objects.values('appointment_date', 'doctor_id', 'status').annotate(total=models.Count('id'))
+    AppointmentDayRollup.objects.bulk_create([
+        AppointmentDayRollup(date=row['appointment_date'], doctor_id=row['doctor_id'], status=row['status'], appointment_count=row['total'])
+        for row in days
+    ], batch_size=1000)
+
+    months = Appointment.objects.annotate(month=TruncMonth('appointment_date')).values(
+        'month', 'doctor__specialization', 'status'
+    ).annotate(total=models.Count('id'))
+    AppointmentMonthRollup.objects.bulk_create([
+        AppointmentMonthRollup(month=row['month'], specialization=row['doctor__specialization'], status=row['status'], appointment_count=row['total'])
+        for row in months
+    ], batch_size=1000)
+
+    patients = Appointment.objects.values('doctor__specialization', 'patient_id').annotate(total=models.Count('id'))
+    SpecializationPatient.objects.bulk_create([
+        SpecializationPatient(specialization=row['doctor__specialization'], patient_id=row['patient_id'], appointment_count=row['total'])
+        for row in patients
+    ], batch_size=1000)
+
+    specializations = SpecializationPatient.objects.values('specialization').annotate(total=models.Count('id'))
+    SpecializationRollup.objects.bulk_create([
+        SpecializationRollup(specialization=row['specialization'], patient_count=row['total'])
+        for row in specializations
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_auto_20260203_1305'),
+        ('appointments', '0005_appointment_listing_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpecializationRollup',
+            fields=[
+                ('specialization', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('patient_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AppointmentMonthRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('specialization', models.CharField(max_length=50)),
+                ('status', models.CharField(max_length=20)),
+                ('appointment_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('month', 'specialization', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SpecializationPatient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('specialization', models.CharField(max_length=50)),
+                ('appointment_count', models.IntegerField(default=0)),
+                ('patient', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounts.patient')),
+            ],
+            options={
+                'unique_together': {('specialization', 'patient')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AppointmentDayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('appointment_count', models.IntegerField(default=0)),
+                ('doctor', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounts.doctor')),
+            ],
+            options={
+                'unique_together': {('date', 'doctor', 'status')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
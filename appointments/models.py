@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from accounts.models import Patient, Doctor
 
 class Appointment(models.Model):
@@ -9,9 +9,10 @@ class Appointment(models.Model):
         ('cancelled', 'Cancelled'),
     )
     
-    appointment_id = models.CharField(max_length=20, unique=True)
-    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='appointments')
-    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='appointments')
+    appointment_id = models.CharField(max_length=20, unique=True, blank=True)
+    # Indexed through the composite indexes in Meta, which start with these columns
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='appointments', db_index=False)
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='appointments', db_index=False)
     appointment_date = models.DateField()
     appointment_time = models.TimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -23,13 +24,157 @@ class Appointment(models.Model):
     
     class Meta:
         ordering = ['-appointment_date', '-appointment_time']
+        # Hot filters (see `python manage.py explain_hot_queries`)
+        indexes = [
+            # Doctor dashboards, allocation and slot lookups: a doctor's day(s) by status
+            models.Index(fields=['doctor', 'appointment_date', 'status'], name='appointment_doctor_day_idx'),
+            # Patient dashboards and history: a patient's appointments newest first, by status
+            models.Index(fields=['patient', 'appointment_date', 'status'], name='appointment_patient_day_idx'),
+            # Date windows across all doctors (slot index build, analytics); also the
+            # keyset order of the admin appointment listing (appointments.pagination)
+            models.Index(fields=['appointment_date', 'appointment_time', 'id'], name='appointment_listing_idx'),
+            # Admin "recent appointments" and incremental sync by modification time
+            models.Index(fields=['-created_at'], name='appointment_created_idx'),
+            models.Index(fields=['updated_at'], name='appointment_updated_idx'),
+            # Pending appointments awaiting confirmation are a small slice of the table
+            # (SQLite only picks this partial index once ANALYZE has collected statistics)
+            models.Index(fields=['created_at'], name='appointment_pending_idx', condition=models.Q(status='pending')),
+        ]
     
     def __str__(self):
         return f"{self.appointment_id} - {self.patient.user.get_full_name()} with Dr. {self.doctor.user.get_full_name()}"
+    
+    def save(self, *args, **kwargs):
+        from .sequences import sequences
+        
+        if not self.appointment_id:
+            self.appointment_id = sequences.next_identifier('APT')
+        
+        # One transaction with the token counter and the DoctorWorkload update done by the post_save signal
+        with transaction.atomic():
+            if self.token_number is None and self.pk is None and self.doctor_id:
+                self.token_number = sequences.next_token(self.doctor_id, self.appointment_date)
+            super().save(*args, **kwargs)
+
+
+class DoctorWorkload(models.Model):
+    """
+    Appointments counting towards a doctor's workload, per day
+    Kept up to date by appointments.signals on every Appointment save/delete,
+    so a rolling workload is a small range sum. Rebuild with
+    `python manage.py reconcile_workload`.
+    """
+    # Appointment statuses that count towards a doctor's workload
+    COUNTED_STATUSES = ('scheduled', 'confirmed')
+    
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='workload_days')
+    date = models.DateField()
+    appointment_count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('doctor', 'date')
+        indexes = [
+            # Workload snapshots of all doctors over a date window
+            models.Index(fields=['date', 'doctor'], name='doctorworkload_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.doctor.doctor_id} on {self.date}: {self.appointment_count}"
+    
+    @classmethod
+    def expected_counts(cls):
+        """{(doctor_id, date): count} recounted from the appointments table"""
+        counts = Appointment.objects.filter(
+            status__in=cls.COUNTED_STATUSES
+        ).values('doctor_id', 'appointment_date').annotate(total=models.Count('id')).order_by()
+        return {(row['doctor_id'], row['appointment_date']): row['total'] for row in counts}
+
+
+class AppointmentDayRollup(models.Model):
+    """
+    Appointments per doctor, day and status (analytics rollup)
+    Kept up to date with the monthly and patient rollups below by
+    appointments.rollups on every Appointment save/delete; rebuild all of them
+    with `python manage.py rebuild_rollups`. Rollups reference doctors and
+    patients without a database constraint, so a cascaded delete leaves their
+    rows for the deleted appointments to count down to zero.
+    """
+    date = models.DateField()
+    doctor = models.ForeignKey(Doctor, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    status = models.CharField(max_length=20)
+    appointment_count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('date', 'doctor', 'status')
+    
+    def __str__(self):
+        return f"Doctor {self.doctor_id} on {self.date}, {self.status}: {self.appointment_count}"
+
+
+class AppointmentMonthRollup(models.Model):
+    """Appointments per month (first day), doctor specialization and status"""
+    month = models.DateField()
+    specialization = models.CharField(max_length=50)
+    status = models.CharField(max_length=20)
+    appointment_count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('month', 'specialization', 'status')
+    
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.specialization}, {self.status}: {self.appointment_count}"
+
+
+class SpecializationPatient(models.Model):
+    """Appointments a patient has had in a specialization; feeds SpecializationRollup"""
+    specialization = models.CharField(max_length=50)
+    patient = models.ForeignKey(Patient, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    appointment_count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('specialization', 'patient')
+    
+    def __str__(self):
+        return f"Patient {self.patient_id} in {self.specialization}: {self.appointment_count}"
+
+
+class SpecializationRollup(models.Model):
+    """Distinct patients seen per specialization (SpecializationPatient rows above zero)"""
+    specialization = models.CharField(max_length=50, primary_key=True)
+    patient_count = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.specialization}: {self.patient_count} patients"
+
+
+class IdentifierSequence(models.Model):
+    """
+    Next free number of an APT/PRE/REC identifier sequence
+    Processes reserve blocks of numbers from it (see appointments.sequences)
+    instead of counting rows per insert.
+    """
+    prefix = models.CharField(max_length=10, primary_key=True)
+    next_value = models.BigIntegerField()
+    
+    def __str__(self):
+        return f"{self.prefix}: next {self.next_value}"
+
+
+class TokenCounter(models.Model):
+    """Last queue token handed out for a doctor's day; tokens start at 1 each day"""
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='token_counters')
+    date = models.DateField()
+    last_token = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('doctor', 'date')
+    
+    def __str__(self):
+        return f"{self.doctor.doctor_id} on {self.date}: {self.last_token}"
 
 
 class Prescription(models.Model):
-    prescription_id = models.CharField(max_length=20, unique=True)
+    prescription_id = models.CharField(max_length=20, unique=True, blank=True)
     appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='prescriptions')
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='prescriptions')
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='prescriptions')
@@ -42,10 +187,16 @@ class Prescription(models.Model):
     
     def __str__(self):
         return f"{self.prescription_id} - {self.patient.user.get_full_name()}"
+    
+    def save(self, *args, **kwargs):
+        if not self.prescription_id:
+            from .sequences import sequences
+            self.prescription_id = sequences.next_identifier('PRE')
+        super().save(*args, **kwargs)
 
 
 class MedicalRecord(models.Model):
-    record_id = models.CharField(max_length=20, unique=True)
+    record_id = models.CharField(max_length=20, unique=True, blank=True)
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='medical_records')
     appointment = models.ForeignKey(Appointment, on_delete=models.SET_NULL, null=True, blank=True)
     record_type = models.CharField(max_length=50, choices=(
@@ -65,6 +216,12 @@ class MedicalRecord(models.Model):
     
     def __str__(self):
         return f"{self.record_id} - {self.title}"
+    
+    def save(self, *args, **kwargs):
+        if not self.record_id:
+            from .sequences import sequences
+            self.record_id = sequences.next_identifier('REC')
+        super().save(*args, **kwargs)
 
 
 class Notification(models.Model):
@@ -85,6 +242,10 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A user's unread notifications, newest first; read ones (the bulk) stay out of it
+            models.Index(fields=['user', '-created_at'], name='notification_unread_idx', condition=models.Q(is_read=False)),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
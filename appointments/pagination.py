@@ -0,0 +1,156 @@
+"""
+Keyset (seek) pagination for appointment listings
+Pages are ordered newest first by (appointment_date, appointment_time, id) and
+located with a WHERE on the last row seen instead of OFFSET, so every page
+costs the same index range read however deep it is. Cursors are opaque
+base64 tokens of that row's key and stay valid while rows are added or removed.
+"""
+
+import base64
+import json
+from datetime import date, time
+from urllib.parse import urlencode
+
+from django.contrib import messages
+from django.db.models import Q
+
+PAGE_SIZE = 25
+
+STATUSES = ('pending', 'confirmed', 'completed', 'cancelled')
+
+
+def encode_cursor(appointment, direction):
+    """Cursor pointing after ('next') or before ('prev') appointment"""
+    key = [appointment.appointment_date.isoformat(), appointment.appointment_time.isoformat(), appointment.id, direction]
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(date, time, id, direction) from a cursor; ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        day, moment, pk, direction = json.loads(raw)
+        key = date.fromisoformat(day), time.fromisoformat(moment), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+    if direction not in ('next', 'prev'):
+        raise ValueError(f'Invalid cursor direction: {direction!r}')
+    return (*key, direction)
+
+
+def filter_appointments(queryset, params):
+    """
+    Apply the listing filters from a GET QueryDict
+
+    Returns:
+        (queryset, filters): filters holds the cleaned values, for the form and page links
+    """
+    filters = {}
+
+    status = params.get('status', '')
+    if status in STATUSES:
+        queryset = queryset.filter(status=status)
+        filters['status'] = status
+
+    for name, lookup in (('date_from', 'appointment_date__gte'), ('date_to', 'appointment_date__lte')):
+        try:
+            value = date.fromisoformat(params.get(name, ''))
+        except ValueError:
+            continue
+        queryset = queryset.filter(**{lookup: value})
+        filters[name] = value.isoformat()
+
+    return queryset, filters
+
+
+class KeysetPage:
+    """One page of appointments plus the cursors of its neighbours"""
+
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def paginate_appointments(queryset, cursor=None, page_size=PAGE_SIZE):
+    """
+    The page of queryset after/before cursor (the first page without one)
+
+    Reads page_size + 1 rows in one query (the extra row tells whether another
+    page follows); callers add select_related() so related rows come in the same query.
+    Raises ValueError for a malformed cursor.
+    """
+    newest_first = ('-appointment_date', '-appointment_time', '-id')
+    oldest_first = ('appointment_date', 'appointment_time', 'id')
+    unfiltered = queryset
+
+    if cursor:
+        day, moment, pk, direction = decode_cursor(cursor)
+    else:
+        day = moment = pk = None
+        direction = 'next'
+
+    if direction == 'next':
+        if day is not None:
+            # Rows after the cursor in newest-first order; the first condition bounds the index range
+            queryset = queryset.filter(Q(appointment_date__lte=day) & (
+                Q(appointment_date__lt=day) |
+                Q(appointment_time__lt=moment) |
+                Q(appointment_time=moment, id__lt=pk)
+            ))
+        rows = list(queryset.order_by(*newest_first)[:page_size + 1])
+        more = len(rows) > page_size
+        rows = rows[:page_size]
+        has_next, has_previous = more, day is not None
+    else:
+        queryset = queryset.filter(Q(appointment_date__gte=day) & (
+            Q(appointment_date__gt=day) |
+            Q(appointment_time__gt=moment) |
+            Q(appointment_time=moment, id__gt=pk)
+        ))
+        rows = list(queryset.order_by(*oldest_first)[:page_size + 1])
+        more = len(rows) > page_size
+        if not more:
+            # Back at the start: show a full first page rather than a short one
+            return paginate_appointments(unfiltered, None, page_size)
+        rows = rows[:page_size][::-1]
+        has_next, has_previous = True, True
+
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], 'next') if rows and has_next else None,
+        previous_cursor=encode_cursor(rows[0], 'prev') if rows and has_previous else None,
+    )
+
+
+def appointment_listing(request, queryset):
+    """Template context for a filtered, keyset-paginated listing of queryset"""
+    queryset, filters = filter_appointments(queryset, request.GET)
+    queryset = queryset.select_related('patient__user', 'doctor__user')
+
+    try:
+        page = paginate_appointments(queryset, request.GET.get('cursor'))
+    except ValueError:
+        messages.error(request, 'That page link is not valid; showing the latest appointments.')
+        page = paginate_appointments(queryset)
+
+    return {
+        'appointments': page,
+        'filters': filters,
+        'filter_query': urlencode(filters),
+        'statuses': STATUSES,
+    }
@@ -0,0 +1,224 @@
+"""
+Analytics rollups
+AppointmentDayRollup, AppointmentMonthRollup and SpecializationPatient hold
+appointment counts at the grain the analytics page charts, and
+SpecializationRollup the distinct patients per specialization, so reports read
+a few hundred rows however many years of appointments are stored.
+
+appointments.signals moves the counters with F() updates on every Appointment
+save/delete (and when a doctor changes specialization); bulk_create() callers
+use bulk_adjust_rollups. `python manage.py rebuild_rollups` recounts
+everything from the appointments table.
+"""
+
+from collections import Counter
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import (
+    Appointment,
+    AppointmentDayRollup,
+    AppointmentMonthRollup,
+    SpecializationPatient,
+    SpecializationRollup,
+)
+
+_appointment_date = Appointment._meta.get_field('appointment_date')
+
+# Each rollup table's key fields and counter
+ROLLUP_FIELDS = {
+    AppointmentDayRollup: (('date', 'doctor_id', 'status'), 'appointment_count'),
+    AppointmentMonthRollup: (('month', 'specialization', 'status'), 'appointment_count'),
+    SpecializationPatient: (('specialization', 'patient_id'), 'appointment_count'),
+    SpecializationRollup: (('specialization',), 'patient_count'),
+}
+
+
+def rollup_key(doctor_id, specialization, patient_id, appointment_date, status):
+    """What one appointment counts towards, or None for an unsaved/incomplete one"""
+    if doctor_id is None or patient_id is None:
+        return None
+    # Views may assign the date as the raw 'YYYY-MM-DD' string from the form
+    return doctor_id, specialization, patient_id, _appointment_date.to_python(appointment_date), status
+
+
+def _rows(key):
+    doctor_id, specialization, patient_id, day, status = key
+    return (
+        ('day', day, doctor_id, status),
+        ('month', day.replace(day=1), specialization, status),
+        ('patient', specialization, patient_id),
+    )
+
+
+def rollup_deltas(previous=(), current=()):
+    """
+    {rollup row: delta} for appointments leaving previous keys and joining current
+    ones; rows whose count doesn't change (a status change leaves the patient
+    row alone) are dropped.
+    """
+    deltas = Counter()
+    for key in previous:
+        if key is not None:
+            deltas.subtract(_rows(key))
+    for key in current:
+        if key is not None:
+            deltas.update(_rows(key))
+    return {row: delta for row, delta in deltas.items() if delta}
+
+
+def _adjust(model, lookup, delta, field='appointment_count'):
+    """Add delta to the counter row for lookup, creating the row on first use"""
+    rows = model.objects.filter(**lookup)
+    if rows.update(**{field: F(field) + delta}):
+        return
+
+    _, created = model.objects.get_or_create(**lookup, defaults={field: delta})
+    if not created:
+        # Another transaction created the row in the meantime
+        rows.update(**{field: F(field) + delta})
+
+
+def apply_rollup_deltas(deltas):
+    """Apply rollup_deltas() output; must run inside the transaction that wrote the appointments"""
+    patients = Counter()
+    for row, delta in deltas.items():
+        kind = row[0]
+        if kind == 'day':
+            _, day, doctor_id, status = row
+            _adjust(AppointmentDayRollup, {'date': day, 'doctor_id': doctor_id, 'status': status}, delta)
+        elif kind == 'month':
+            _, month, specialization, status = row
+            _adjust(AppointmentMonthRollup, {'month': month, 'specialization': specialization, 'status': status}, delta)
+        else:
+            _, specialization, patient_id = row
+            lookup = {'specialization': specialization, 'patient_id': patient_id}
+            _adjust(SpecializationPatient, lookup, delta)
+            count = SpecializationPatient.objects.filter(**lookup).values_list('appointment_count', flat=True).get()
+            # A patient is counted in a specialization while they have appointments there
+            was = count - delta
+            if was <= 0 < count:
+                patients[specialization] += 1
+            elif count <= 0 < was:
+                patients[specialization] -= 1
+
+    for specialization, delta in patients.items():
+        if delta:
+            _adjust(SpecializationRollup, {'specialization': specialization}, delta, field='patient_count')
+
+
+def _bulk_adjust(model, deltas):
+    """
+    Apply {key: delta} to model's counters in a few queries (keys as in
+    ROLLUP_FIELDS); returns {key: (count before, count after)}
+    """
+    key_fields, count_field = ROLLUP_FIELDS[model]
+    existing = model.objects.select_for_update().filter(**{
+        f'{field}__in': {key[i] for key in deltas} for i, field in enumerate(key_fields)
+    })
+    counts, changed = {}, []
+    for row in existing:
+        key = tuple(getattr(row, field) for field in key_fields)
+        if key in deltas:
+            was = getattr(row, count_field)
+            setattr(row, count_field, was + deltas[key])
+            counts[key] = (was, was + deltas[key])
+            changed.append(row)
+
+    model.objects.bulk_update(changed, [count_field], batch_size=500)
+    model.objects.bulk_create([
+        model(**dict(zip(key_fields, key)), **{count_field: delta})
+        for key, delta in deltas.items() if key not in counts
+    ], batch_size=500)
+    counts.update((key, (0, delta)) for key, delta in deltas.items() if key not in counts)
+    return counts
+
+
+def bulk_adjust_rollups(appointments, specializations):
+    """
+    Count appointments inserted with bulk_create() (which sends no signals) in a
+    few queries; specializations maps their doctor IDs to specializations.
+    Must run inside the transaction that inserted them.
+    """
+    deltas = {model: Counter() for model in ROLLUP_FIELDS}
+    for appointment in appointments:
+        key = rollup_key(
+            appointment.doctor_id, specializations[appointment.doctor_id], appointment.patient_id,
+            appointment.appointment_date, appointment.status
+        )
+        if key is None:
+            continue
+        doctor_id, specialization, patient_id, day, status = key
+        deltas[AppointmentDayRollup][(day, doctor_id, status)] += 1
+        deltas[AppointmentMonthRollup][(day.replace(day=1), specialization, status)] += 1
+        deltas[SpecializationPatient][(specialization, patient_id)] += 1
+
+    for model in (AppointmentDayRollup, AppointmentMonthRollup):
+        if deltas[model]:
+            _bulk_adjust(model, deltas[model])
+    if deltas[SpecializationPatient]:
+        for (specialization, _), (was, count) in _bulk_adjust(SpecializationPatient, deltas[SpecializationPatient]).items():
+            if was <= 0 < count:
+                deltas[SpecializationRollup][(specialization,)] += 1
+    if deltas[SpecializationRollup]:
+        _bulk_adjust(SpecializationRollup, deltas[SpecializationRollup])
+
+
+def move_doctor_rollups(doctor_id, old_specialization, new_specialization):
+    """Recount a doctor's appointments under their new specialization"""
+    deltas = Counter()
+    months = AppointmentDayRollup.objects.filter(doctor_id=doctor_id).annotate(
+        month=TruncMonth('date')
+    ).values_list('month', 'status').annotate(count=Sum('appointment_count'))
+    for month, status, count in months:
+        deltas[('month', month, old_specialization, status)] -= count
+        deltas[('month', month, new_specialization, status)] += count
+
+    patients = Appointment.objects.filter(doctor_id=doctor_id).values_list('patient_id').annotate(count=Count('id'))
+    for patient_id, count in patients:
+        deltas[('patient', old_specialization, patient_id)] -= count
+        deltas[('patient', new_specialization, patient_id)] += count
+
+    apply_rollup_deltas({row: delta for row, delta in deltas.items() if delta})
+
+
+def expected_rollups():
+    """Every rollup counter recomputed from the appointments table: {model: {key: count}}"""
+    days = Appointment.objects.values_list('appointment_date', 'doctor_id', 'status').annotate(count=Count('id'))
+    months = Appointment.objects.annotate(month=TruncMonth('appointment_date')).values_list(
+        'month', 'doctor__specialization', 'status'
+    ).annotate(count=Count('id'))
+    patients = Appointment.objects.values_list('doctor__specialization', 'patient_id').annotate(count=Count('id'))
+
+    expected = {
+        AppointmentDayRollup: {(day, doctor_id, status): count for day, doctor_id, status, count in days},
+        AppointmentMonthRollup: {(month, specialization, status): count for month, specialization, status, count in months},
+        SpecializationPatient: {(specialization, patient_id): count for specialization, patient_id, count in patients},
+    }
+    expected[SpecializationRollup] = {
+        (specialization,): count
+        for specialization, count in Counter(specialization for specialization, _ in expected[SpecializationPatient]).items()
+    }
+    return expected
+
+
+def stored_rollups():
+    """The rollup counters as stored (rows at zero left out), shaped like expected_rollups()"""
+    stored = {}
+    for model, (key_fields, count_field) in ROLLUP_FIELDS.items():
+        stored[model] = {
+            tuple(row[:-1]): row[-1]
+            for row in model.objects.exclude(**{count_field: 0}).values_list(*key_fields, count_field)
+        }
+    return stored
+
+
+def write_rollups(expected):
+    """Replace every rollup table with expected (from expected_rollups())"""
+    for model, (key_fields, count_field) in ROLLUP_FIELDS.items():
+        model.objects.all().delete()
+        model.objects.bulk_create([
+            model(**dict(zip(key_fields, key)), **{count_field: count})
+            for key, count in expected[model].items()
+        ], batch_size=1000)
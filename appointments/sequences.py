@@ -0,0 +1,184 @@
+"""
+Identifier and queue token allocation
+APT/PRE/REC identifiers come from blocks of numbers each process reserves in
+IdentifierSequence (one short transaction per ID_SEQUENCE_BLOCK_SIZE
+identifiers), so inserts neither count rows nor collide on the unique column.
+Identifiers stay unique but are not gap-free or strictly ordered across
+processes. A block reserved inside the caller's transaction is rolled back
+with it: later identifiers in the same transaction continue from that block,
+and the process keeps the rest of it once the transaction commits, so a
+rollback never hands the same numbers out twice and several bookings in one
+transaction don't each open a new block.
+Databases that allow a second connection to write alongside the first
+(PostgreSQL, MySQL) can set ID_SEQUENCE_DATABASE to an alias for one, so
+reservations commit on their own and never hold the sequence row for the
+length of a booking transaction. On SQLite that second connection would wait
+on the first, so reservations there always use 'default'.
+
+Queue tokens are numbered per doctor and day by an F() increment of the
+TokenCounter row inside the booking transaction (the row lock serializes
+concurrent bookings for that doctor and day only).
+"""
+
+import re
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.functions import Length
+
+from .models import Appointment, IdentifierSequence, MedicalRecord, Prescription, TokenCounter
+
+# Models whose existing identifiers a new sequence continues from
+IDENTIFIER_FIELDS = {
+    'APT': (Appointment, 'appointment_id'),
+    'PRE': (Prescription, 'prescription_id'),
+    'REC': (MedicalRecord, 'record_id'),
+}
+
+
+def format_identifier(prefix, number):
+    return f"{prefix}{number:06d}"
+
+
+class SequenceAllocator:
+    """Per-process blocks of identifier numbers plus per-doctor-day token counters"""
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size
+        self._blocks = {}
+        self._lock = threading.Lock()
+        # Blocks reserved inside this thread's open transaction, not committed yet
+        self._local = threading.local()
+
+    def next_identifier(self, prefix):
+        """Next identifier for prefix, e.g. 'APT000042'"""
+        return self.reserve_identifiers(prefix, 1)[0]
+
+    def reserve_identifiers(self, prefix, count):
+        """count unique identifiers for prefix (for bulk inserts)"""
+        numbers = []
+        with self._lock:
+            while len(numbers) < count:
+                start, end = self._blocks.get(prefix, (0, 0))
+                if start >= end:
+                    needed = count - len(numbers)
+                    alias = self._alias()
+                    if connections[alias].in_atomic_block:
+                        numbers.extend(self._take_uncommitted(prefix, needed, alias))
+                        continue
+                    start, end = self._reserve_block(prefix, max(needed, self._block_size()), alias)
+                taken = min(end - start, count - len(numbers))
+                numbers.extend(range(start, start + taken))
+                self._blocks[prefix] = (start + taken, end)
+
+        return [format_identifier(prefix, number) for number in numbers]
+
+    def _block_size(self):
+        return self.block_size or getattr(settings, 'ID_SEQUENCE_BLOCK_SIZE', 50)
+
+    def _take_uncommitted(self, prefix, needed, alias):
+        """
+        Up to needed numbers from the block this thread's open transaction on
+        alias reserved, reserving one first if there is none
+        """
+        connection = connections[alias]
+        if not hasattr(self._local, 'pending'):
+            self._local.pending = {}
+        pending = self._local.pending
+        block, keep = pending.get((prefix, alias), (None, None))
+        # The callback leaves run_on_commit when the transaction (or the
+        # savepoint that reserved the block) commits or rolls back
+        if block is None or block[0] >= block[1] or not any(
+            callback is keep for _, callback, *_ in connection.run_on_commit
+        ):
+            block = list(self._reserve_block(prefix, max(needed, self._block_size()), alias))
+            keep = partial(self._keep_uncommitted, prefix, block)
+            transaction.on_commit(keep, using=alias)
+            pending[(prefix, alias)] = (block, keep)
+
+        start = block[0]
+        block[0] = min(start + needed, block[1])
+        return range(start, block[0])
+
+    def _keep_uncommitted(self, prefix, block):
+        start, end = block
+        # The rest now belongs to the process, not to the transaction
+        block[0] = end
+        self._keep_block(prefix, start, end)
+
+    def _keep_block(self, prefix, start, end):
+        with self._lock:
+            current_start, current_end = self._blocks.get(prefix, (0, 0))
+            if current_start >= current_end:
+                self._blocks[prefix] = (start, end)
+
+    @staticmethod
+    def _alias():
+        """Where to reserve: ID_SEQUENCE_DATABASE inside a transaction, if configured"""
+        alias = getattr(settings, 'ID_SEQUENCE_DATABASE', None)
+        if alias and alias in settings.DATABASES and connections['default'].in_atomic_block:
+            return alias
+        return 'default'
+
+    def _reserve_block(self, prefix, size, alias='default'):
+        """Claim numbers [start, start + size) of the prefix's sequence"""
+        sequence = IdentifierSequence.objects.using(alias)
+        with transaction.atomic(using=alias):
+            if not sequence.filter(prefix=prefix).update(next_value=F('next_value') + size):
+                sequence.get_or_create(prefix=prefix, defaults={'next_value': self._initial_value(prefix, alias)})
+                sequence.filter(prefix=prefix).update(next_value=F('next_value') + size)
+            end = sequence.filter(prefix=prefix).values_list('next_value', flat=True).get()
+        return end - size, end
+
+    @staticmethod
+    def _initial_value(prefix, alias):
+        """First number of a new sequence: after the highest existing identifier"""
+        if prefix not in IDENTIFIER_FIELDS:
+            return 1
+
+        model, field = IDENTIFIER_FIELDS[prefix]
+        # Longest, then greatest, identifier holds the highest number
+        highest = model.objects.using(alias).filter(**{f'{field}__startswith': prefix}).order_by(
+            Length(field).desc(), f'-{field}'
+        ).values_list(field, flat=True).first()
+
+        match = re.fullmatch(rf'{re.escape(prefix)}(\d+)', highest or '')
+        return int(match.group(1)) + 1 if match else 1
+
+    def next_token(self, doctor_id, day):
+        """Next queue token for doctor_id on day; call inside the booking transaction"""
+        return self.reserve_tokens(doctor_id, day, 1)
+
+    def reserve_tokens(self, doctor_id, day, count):
+        """
+        Claim count consecutive tokens for doctor_id on day
+
+        Returns:
+            The first token; the rest follow it
+        """
+        day = Appointment._meta.get_field('appointment_date').to_python(day)
+        counters = TokenCounter.objects.filter(doctor_id=doctor_id, date=day)
+        with transaction.atomic():
+            if not counters.update(last_token=F('last_token') + count):
+                # First booking of the day: continue after tokens assigned before counters existed
+                existing = Appointment.objects.filter(
+                    doctor_id=doctor_id,
+                    appointment_date=day,
+                    token_number__isnull=False
+                ).order_by('-token_number').values_list('token_number', flat=True).first()
+                _, created = TokenCounter.objects.get_or_create(
+                    doctor_id=doctor_id,
+                    date=day,
+                    defaults={'last_token': (existing or 0) + count}
+                )
+                if not created:
+                    # Another booking created the row in the meantime
+                    counters.update(last_token=F('last_token') + count)
+            last = counters.values_list('last_token', flat=True).get()
+        return last - count + 1
+
+
+sequences = SequenceAllocator()
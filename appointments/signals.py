@@ -0,0 +1,161 @@
+"""
+Keeps DoctorWorkload in step with Appointment
+Every save and delete (booking, rescheduling, cancelling, completing, and
+cascades from deleted doctors/patients) moves the affected day counters with
+F() updates inside the same transaction as the appointment write.
+Queryset .update() and bulk_create() bypass signals: bulk inserts call
+bulk_adjust_workload, anything else should be followed by reconcile_workload.
+
+The analytics rollups (appointments.rollups) move in the same transaction;
+bulk inserts call bulk_adjust_rollups, and rebuild_rollups recounts them.
+
+The same receivers keep this process's slot index (appointments.slot_index)
+current once it has been built, once the write commits (a rolled back booking
+must not leave its slot marked as taken).
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from accounts.models import Doctor
+
+from .models import Appointment, DoctorWorkload
+from .rollups import apply_rollup_deltas, move_doctor_rollups, rollup_deltas, rollup_key
+from .slot_index import get_slot_index
+
+_appointment_date = Appointment._meta.get_field('appointment_date')
+
+
+def _workload_key(doctor_id, appointment_date, status):
+    """(doctor_id, date) the appointment counts towards, or None if it doesn't count"""
+    if status not in DoctorWorkload.COUNTED_STATUSES or doctor_id is None:
+        return None
+    # Views may assign the date as the raw 'YYYY-MM-DD' string from the form
+    return doctor_id, _appointment_date.to_python(appointment_date)
+
+
+def adjust_workload(key, delta):
+    """Add delta to the counter for key, creating the row on first use"""
+    if key is None or not delta:
+        return
+
+    doctor_id, day = key
+    counters = DoctorWorkload.objects.filter(doctor_id=doctor_id, date=day)
+    if counters.update(appointment_count=F('appointment_count') + delta):
+        return
+
+    _, created = DoctorWorkload.objects.get_or_create(
+        doctor_id=doctor_id,
+        date=day,
+        defaults={'appointment_count': delta}
+    )
+    if not created:
+        # Another transaction created the row in the meantime
+        counters.update(appointment_count=F('appointment_count') + delta)
+
+
+def bulk_adjust_workload(deltas):
+    """
+    Apply {(doctor_id, date): delta} in a few queries, for bulk_create() callers
+    (bulk inserts don't send signals). Must run inside a transaction.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    existing = DoctorWorkload.objects.select_for_update().filter(
+        doctor_id__in={doctor_id for doctor_id, _ in deltas},
+        date__in={day for _, day in deltas}
+    )
+    changed = []
+    for counter in existing:
+        delta = deltas.pop((counter.doctor_id, counter.date), None)
+        if delta:
+            counter.appointment_count += delta
+            changed.append(counter)
+
+    DoctorWorkload.objects.bulk_update(changed, ['appointment_count'], batch_size=500)
+    DoctorWorkload.objects.bulk_create([
+        DoctorWorkload(doctor_id=doctor_id, date=day, appointment_count=delta)
+        for (doctor_id, day), delta in deltas.items()
+    ], batch_size=500)
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_previous_workload_key(sender, instance, raw=False, **kwargs):
+    instance._previous_workload_key = None
+    instance._previous_rollup_key = None
+    if raw or instance.pk is None:
+        return
+
+    previous = sender.objects.filter(pk=instance.pk).values_list(
+        'doctor_id', 'appointment_date', 'status', 'doctor__specialization', 'patient_id'
+    ).first()
+    if previous is not None:
+        doctor_id, appointment_date, status, specialization, patient_id = previous
+        instance._previous_workload_key = _workload_key(doctor_id, appointment_date, status)
+        instance._previous_rollup_key = rollup_key(doctor_id, specialization, patient_id, appointment_date, status)
+
+
+def _rollup_key(appointment):
+    return rollup_key(
+        appointment.doctor_id, appointment.doctor.specialization, appointment.patient_id,
+        appointment.appointment_date, appointment.status
+    )
+
+
+@receiver(post_save, sender=Appointment)
+def update_workload_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    previous = getattr(instance, '_previous_workload_key', None)
+    current = _workload_key(instance.doctor_id, instance.appointment_date, instance.status)
+    if previous != current:
+        adjust_workload(previous, -1)
+        adjust_workload(current, 1)
+    apply_rollup_deltas(rollup_deltas(
+        previous=[getattr(instance, '_previous_rollup_key', None)], current=[_rollup_key(instance)]
+    ))
+
+    slot_index = get_slot_index(create=False)
+    if slot_index is not None:
+        transaction.on_commit(lambda: slot_index.appointment_changed(instance))
+
+
+@receiver(post_delete, sender=Appointment)
+def update_workload_on_delete(sender, instance, **kwargs):
+    adjust_workload(_workload_key(instance.doctor_id, instance.appointment_date, instance.status), -1)
+    apply_rollup_deltas(rollup_deltas(previous=[_rollup_key(instance)]))
+
+    slot_index = get_slot_index(create=False)
+    if slot_index is not None:
+        # delete() clears instance.pk before the commit
+        pk = instance.pk
+        transaction.on_commit(lambda: slot_index.appointment_deleted(pk))
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def update_slot_index_on_doctor_change(sender, instance, raw=False, **kwargs):
+    slot_index = get_slot_index(create=False)
+    if slot_index is not None and not raw:
+        transaction.on_commit(lambda: slot_index.doctor_changed(instance))
+
+
+@receiver(pre_save, sender=Doctor)
+def remember_previous_specialization(sender, instance, raw=False, **kwargs):
+    instance._previous_specialization = None
+    if not raw and instance.pk is not None:
+        instance._previous_specialization = sender.objects.filter(pk=instance.pk).values_list(
+            'specialization', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Doctor)
+def move_rollups_on_specialization_change(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_specialization', None)
+    if not raw and not created and previous is not None and previous != instance.specialization:
+        move_doctor_rollups(instance.pk, previous, instance.specialization)
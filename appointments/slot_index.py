@@ -0,0 +1,307 @@
+"""
+Materialized 15-minute slot index of doctor availability
+Per doctor, weekly availability (parsed once from available_days and the
+start/end times) and booked slots per date are kept as packed bitsets, so
+"earliest free slot for a specialization after T" and "free slots of doctor D
+on date Y" are a few NumPy operations over all doctors instead of loading
+and parsing every Doctor and Appointment.
+
+Each process holds its own index, built in a background thread when a
+gunicorn worker starts (gunicorn.conf.py) or when the booking page first asks
+for it, so no request pays for the build. appointments.signals
+updates it on every Appointment/Doctor save or delete in this process;
+changes made by other processes are picked up through Appointment.updated_at
+every SLOT_INDEX_REFRESH_SECONDS, and the whole index is rebuilt every
+SLOT_INDEX_REBUILD_SECONDS (which also catches deletions elsewhere).
+"""
+
+import logging
+import re
+import threading
+import time as monotonic_time
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOT_BYTES = SLOTS_PER_DAY // 8
+
+DEFAULT_START = time(9, 0)
+DEFAULT_END = time(17, 0)
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+WEEKDAY_RANGE_PATTERN = re.compile(r'^([a-z]{3})[a-z]*\s*-\s*([a-z]{3})[a-z]*$')
+
+# Appointments in these statuses leave their slot free
+FREE_STATUSES = ('cancelled',)
+
+
+def parse_available_days(text):
+    """Weekday numbers (Mon=0) from free text like 'Mon,Tue,Wed', 'monday, friday' or 'Mon-Fri'"""
+    days = set()
+    for part in re.split(r'[,;/]+', (text or '').lower()):
+        part = part.strip()
+        match = WEEKDAY_RANGE_PATTERN.match(part)
+        if match and match.group(1) in WEEKDAYS and match.group(2) in WEEKDAYS:
+            first, last = WEEKDAYS.index(match.group(1)), WEEKDAYS.index(match.group(2))
+            days.update(WEEKDAYS.index(WEEKDAYS[(first + i) % 7]) for i in range((last - first) % 7 + 1))
+        elif part[:3] in WEEKDAYS:
+            days.add(WEEKDAYS.index(part[:3]))
+    return sorted(days)
+
+
+def slot_of(value):
+    """Slot number (0-95) containing a time"""
+    return (value.hour * 60 + value.minute) // SLOT_MINUTES
+
+
+def first_slot_from(value):
+    """First slot starting at or after a time"""
+    partial = value.minute % SLOT_MINUTES or value.second or value.microsecond
+    return slot_of(value) + (1 if partial else 0)
+
+
+def slot_time(slot):
+    return time(slot * SLOT_MINUTES // 60, slot * SLOT_MINUTES % 60)
+
+
+def _slot_bits(first, last):
+    """Packed bitset with slots first..last-1 set"""
+    bits = np.zeros(SLOTS_PER_DAY, dtype=bool)
+    bits[first:last] = True
+    return np.packbits(bits)
+
+
+class SlotIndex:
+    """Weekly availability and booked slots of every bookable doctor, as packed bitsets"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build()
+
+    def _build(self):
+        from accounts.models import Doctor
+        from appointments.models import Appointment
+
+        doctors = list(Doctor.objects.filter(user__is_active=True, is_available=True).order_by('id').values_list(
+            'id', 'specialization', 'available_days', 'available_time_start', 'available_time_end'
+        ))
+
+        self.doctor_ids = np.array([row[0] for row in doctors], dtype=np.int64)
+        self.positions = {doctor_id: position for position, doctor_id in enumerate(self.doctor_ids.tolist())}
+        self.by_specialization = {}
+        self.weekly = np.zeros((len(doctors), 7, SLOT_BYTES), dtype=np.uint8)
+        for position, row in enumerate(doctors):
+            self._set_weekly(position, *row[2:])
+            self.by_specialization.setdefault(self._normalize(row[1]), []).append(position)
+        self.by_specialization = {name: np.array(positions, dtype=np.intp) for name, positions in self.by_specialization.items()}
+
+        # booked[date] is a packed (n_doctors, SLOT_BYTES) bitset; a bit stays set while
+        # any appointment occupies the slot (occupancy counts double bookings)
+        self.booked = {}
+        self.occupancy = {}
+        self.appointments = {}
+
+        self.synced_at = timezone.now()
+        upcoming = Appointment.objects.filter(
+            appointment_date__gte=timezone.localdate()
+        ).exclude(status__in=FREE_STATUSES).order_by().values_list('id', 'doctor_id', 'appointment_date', 'appointment_time', 'status')
+        for row in upcoming.iterator():
+            self._apply(*row)
+
+        self.refreshed_at = self.built_at = monotonic_time.monotonic()
+        self.stale = False
+
+    @staticmethod
+    def _normalize(specialization):
+        return specialization.lower().replace(' ', '_')
+
+    def _set_weekly(self, position, available_days, start, end):
+        first, last = slot_of(start or DEFAULT_START), slot_of(end or DEFAULT_END)
+        hours = _slot_bits(first, last)
+        self.weekly[position] = 0
+        for weekday in parse_available_days(available_days):
+            self.weekly[position, weekday] = hours
+
+    def _booked_day(self, day):
+        bitset = self.booked.get(day)
+        if bitset is None:
+            bitset = self.booked[day] = np.zeros((len(self.doctor_ids), SLOT_BYTES), dtype=np.uint8)
+        return bitset
+
+    def _occupy(self, key, delta):
+        position, day, slot = key
+        count = self.occupancy.get(key, 0) + delta
+        if count > 0:
+            self.occupancy[key] = count
+        else:
+            self.occupancy.pop(key, None)
+
+        bitset = self._booked_day(day)
+        mask = np.uint8(0x80 >> (slot % 8))
+        if count > 0:
+            bitset[position, slot // 8] |= mask
+        else:
+            bitset[position, slot // 8] &= ~mask
+
+    def _apply(self, appointment_pk, doctor_id, appointment_date, appointment_time, status):
+        """Record an appointment's current state, releasing the slot it held before"""
+        previous = self.appointments.pop(appointment_pk, None)
+        if previous is not None:
+            self._occupy(previous, -1)
+
+        position = self.positions.get(doctor_id)
+        if position is None or status in FREE_STATUSES or appointment_date < timezone.localdate():
+            return
+
+        key = (position, appointment_date, slot_of(appointment_time))
+        self.appointments[appointment_pk] = key
+        self._occupy(key, 1)
+
+    # Sync hooks (appointments.signals)
+
+    def appointment_changed(self, appointment):
+        field = appointment._meta.get_field
+        with self._lock:
+            self._apply(
+                appointment.pk,
+                appointment.doctor_id,
+                field('appointment_date').to_python(appointment.appointment_date),
+                field('appointment_time').to_python(appointment.appointment_time),
+                appointment.status
+            )
+
+    def appointment_deleted(self, appointment_pk):
+        with self._lock:
+            previous = self.appointments.pop(appointment_pk, None)
+            if previous is not None:
+                self._occupy(previous, -1)
+
+    def doctor_changed(self, doctor):
+        with self._lock:
+            # Joining/leaving doctors resize the arrays, so rebuild on the next query
+            self.stale = True
+
+    def _refresh(self):
+        """Rebuild if due, otherwise apply appointment changes made by other processes"""
+        from appointments.models import Appointment
+
+        now = monotonic_time.monotonic()
+        if self.stale or now - self.built_at >= getattr(settings, 'SLOT_INDEX_REBUILD_SECONDS', 300):
+            self._build()
+            return
+        if now - self.refreshed_at < getattr(settings, 'SLOT_INDEX_REFRESH_SECONDS', 5):
+            return
+
+        self.refreshed_at = now
+        changed = Appointment.objects.filter(updated_at__gte=self.synced_at).order_by('updated_at').values_list(
+            'id', 'doctor_id', 'appointment_date', 'appointment_time', 'status', 'updated_at'
+        )
+        for *row, updated_at in changed:
+            self._apply(*row)
+            self.synced_at = max(self.synced_at, updated_at)
+
+    # Queries
+
+    def _free(self, positions, day):
+        free = self.weekly[positions, day.weekday()]
+        booked = self.booked.get(day)
+        if booked is not None:
+            free = free & ~booked[positions]
+        return free
+
+    def free_slots(self, doctor_id, day, after=None):
+        """Start times of doctor_id's free slots on day (from `after` on, if given)"""
+        with self._lock:
+            self._refresh()
+            position = self.positions.get(doctor_id)
+            if position is None:
+                return []
+            bits = np.unpackbits(self._free(np.array([position]), day)[0])
+
+        first = first_slot_from(after) if after else 0
+        return [slot_time(slot) for slot in np.flatnonzero(bits[first:]) + first]
+
+    def earliest_slot(self, specialization, after=None, horizon_days=60):
+        """
+        Earliest free slot of any doctor with the specialization, starting at or after `after`
+        (a datetime, default now). Ties go to the lowest doctor id.
+
+        Returns:
+            (doctor_id, datetime) or None if nothing is free within horizon_days
+        """
+        after = after or timezone.localtime().replace(tzinfo=None)
+        with self._lock:
+            self._refresh()
+            positions = self.by_specialization.get(self._normalize(specialization))
+            if positions is None:
+                return None
+
+            first_slot = first_slot_from(after)
+            for offset in range(horizon_days):
+                day = after.date() + timedelta(days=offset)
+                free = self._free(positions, day)
+                if not free.any():
+                    continue
+
+                bits = np.unpackbits(free, axis=1)
+                if offset == 0:
+                    bits[:, :first_slot] = 0
+                has_free = bits.any(axis=1)
+                if not has_free.any():
+                    continue
+
+                earliest = np.where(has_free, bits.argmax(axis=1), SLOTS_PER_DAY)
+                best = int(np.argmin(earliest))
+                return int(self.doctor_ids[positions[best]]), datetime.combine(day, slot_time(int(earliest[best])))
+
+        return None
+
+
+_slot_index = None
+_slot_index_lock = threading.Lock()
+_warm_up_thread = None
+
+
+def get_slot_index(create=True):
+    """This process's SlotIndex, built on first use (None if not built and create is False)"""
+    global _slot_index
+    if _slot_index is None and create:
+        with _slot_index_lock:
+            if _slot_index is None:
+                _slot_index = SlotIndex()
+    return _slot_index
+
+
+def _build_in_background():
+    from django.db import connection
+
+    try:
+        get_slot_index()
+    except Exception:
+        logger.exception("Slot index build failed; the next warm_slot_index() call retries")
+    finally:
+        # The thread's own database connection
+        connection.close()
+
+
+def warm_slot_index():
+    """
+    Build this process's SlotIndex in a background thread unless it exists or
+    is being built already
+
+    Returns:
+        The build thread, or None if nothing was started
+    """
+    global _warm_up_thread
+    with _slot_index_lock:
+        if _slot_index is not None or (_warm_up_thread is not None and _warm_up_thread.is_alive()):
+            return None
+        _warm_up_thread = threading.Thread(target=_build_in_background, name='slot-index-build', daemon=True)
+        _warm_up_thread.start()
+    return _warm_up_thread
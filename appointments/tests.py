@@ -0,0 +1,380 @@
+import base64
+import io
+from datetime import time, timedelta
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.core.management import call_command
+from django.db import transaction
+from django.http import QueryDict
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Doctor, Patient, User
+from core.shared_cache import get_shared_cache
+
+from . import slot_index as slot_index_module
+from .models import Appointment, DoctorWorkload, IdentifierSequence, Notification, SpecializationRollup
+from .pagination import decode_cursor, filter_appointments, paginate_appointments
+from .rollups import expected_rollups, stored_rollups
+from .sequences import SequenceAllocator
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_doctor(username, **fields):
+    """A general practitioner working 9:00-17:00 every day"""
+    fields = {
+        'specialization': 'general', 'qualification': 'MBBS', 'available_days': 'Mon-Sun',
+        'available_time_start': time(9), 'available_time_end': time(17), **fields,
+    }
+    user = User.objects.create_user(username, password='pass', role='doctor', first_name=username.title())
+    return Doctor.objects.create(user=user, doctor_id=username.upper(), **fields)
+
+
+def make_patient(username):
+    user = User.objects.create_user(username, password='pass', role='patient', first_name=username.title())
+    return Patient.objects.create(user=user, patient_id=username.upper())
+
+
+class WorkloadCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctors = [make_doctor(f'doctor{i}') for i in range(2)]
+        cls.patient = make_patient('patient')
+
+    def stored_counts(self):
+        return {
+            (row.doctor_id, row.date): row.appointment_count
+            for row in DoctorWorkload.objects.exclude(appointment_count=0)
+        }
+
+    def test_counters_follow_appointment_writes(self):
+        doctor, other_doctor = self.doctors
+        today, tomorrow = timezone.localdate(), timezone.localdate() + timedelta(days=1)
+
+        confirmed = Appointment.objects.create(
+            patient=self.patient, doctor=doctor, appointment_date=today, appointment_time=time(9), status='confirmed'
+        )
+        pending = Appointment.objects.create(
+            patient=self.patient, doctor=doctor, appointment_date=today, appointment_time=time(10), status='pending'
+        )
+        self.assertEqual(self.stored_counts(), {(doctor.id, today): 1})
+
+        pending.status = 'confirmed'
+        pending.save()
+        self.assertEqual(self.stored_counts(), {(doctor.id, today): 2})
+
+        # Rescheduling moves the count to the new doctor and day
+        pending.doctor, pending.appointment_date = other_doctor, tomorrow.isoformat()
+        pending.save()
+        self.assertEqual(self.stored_counts(), {(doctor.id, today): 1, (other_doctor.id, tomorrow): 1})
+
+        confirmed.status = 'cancelled'
+        confirmed.save()
+        pending.delete()
+        self.assertEqual(self.stored_counts(), {})
+        self.assertEqual(DoctorWorkload.expected_counts(), {})
+
+    def test_reconcile_workload_repairs_drift(self):
+        doctor, day = self.doctors[0], timezone.localdate()
+        for hour in (9, 10):
+            Appointment.objects.create(
+                patient=self.patient, doctor=doctor, appointment_date=day, appointment_time=time(hour),
+                status='confirmed',
+            )
+        # Queryset updates send no signals
+        Appointment.objects.filter(appointment_time=time(10)).update(status='cancelled')
+        DoctorWorkload.objects.create(doctor=self.doctors[1], date=day, appointment_count=3)
+
+        out = io.StringIO()
+        call_command('reconcile_workload', '--dry-run', stdout=out)
+        self.assertIn('2 drifted day(s) across 2 doctor(s) (dry run, nothing changed)', out.getvalue())
+        self.assertEqual(self.stored_counts(), {(doctor.id, day): 2, (self.doctors[1].id, day): 3})
+
+        call_command('reconcile_workload', stdout=io.StringIO())
+        self.assertEqual(self.stored_counts(), {(doctor.id, day): 1})
+        self.assertEqual(self.stored_counts(), DoctorWorkload.expected_counts())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AnalyticsRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='pass', role='admin')
+        cls.doctors = [make_doctor(f'doctor{i}') for i in range(3)]
+        cls.patients = [make_patient(f'patient{i}') for i in range(2)]
+        today = timezone.localdate()
+        for i, status in enumerate(('confirmed', 'pending', 'completed', 'confirmed')):
+            Appointment.objects.create(
+                patient=cls.patients[i % 2], doctor=cls.doctors[i % 2], appointment_date=today + timedelta(days=i),
+                appointment_time=time(9), status=status,
+            )
+
+    def setUp(self):
+        # The analytics view caches its charts across tests
+        get_shared_cache().invalidate()
+
+    def assertRollupsCurrent(self):
+        self.assertEqual(stored_rollups(), expected_rollups())
+
+    def test_rollups_follow_appointment_writes(self):
+        self.assertRollupsCurrent()
+        appointments = list(Appointment.objects.order_by('id'))
+
+        appointments[0].status = 'cancelled'
+        appointments[0].save()
+        appointments[1].appointment_date += timedelta(days=45)
+        appointments[1].save()
+        appointments[2].doctor, appointments[2].patient = self.doctors[2], self.patients[1]
+        appointments[2].save()
+        appointments[3].delete()
+        self.assertRollupsCurrent()
+
+        self.patients[1].delete()
+        self.assertRollupsCurrent()
+
+    def test_specialization_change_moves_counts(self):
+        doctor = self.doctors[0]
+        doctor.specialization = 'cardiology'
+        doctor.save()
+        self.assertRollupsCurrent()
+        self.assertIn(('cardiology',), stored_rollups()[SpecializationRollup])
+
+    def test_charts_and_rebuild(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('analytics'))
+        self.assertContains(response, 'id="monthly-data"')
+        self.assertContains(response, '"specialization": "General Medicine", "count": 2')
+
+        out = io.StringIO()
+        call_command('rebuild_rollups', '--dry-run', stdout=out)
+        self.assertIn('0 drifted rollup row(s)', out.getvalue())
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='pass', role='admin')
+        doctor, patient = make_doctor('doctor'), make_patient('patient')
+        today = timezone.localdate()
+        # Two appointments per (date, time), so pages split ties on id
+        for day in range(2):
+            for hour, status in ((9, 'confirmed'), (10, 'pending')):
+                for _ in range(2):
+                    Appointment.objects.create(
+                        patient=patient, doctor=doctor, appointment_date=today + timedelta(days=day),
+                        appointment_time=time(hour), status=status,
+                    )
+
+    def walk(self, queryset, page_size):
+        """Every page from the first, following next cursors"""
+        pages = [paginate_appointments(queryset, page_size=page_size)]
+        while pages[-1].has_next:
+            pages.append(paginate_appointments(queryset, pages[-1].next_cursor, page_size))
+        return pages
+
+    def test_next_and_prev_round_trip_across_ties(self):
+        queryset = Appointment.objects.all()
+        newest_first = list(queryset.order_by('-appointment_date', '-appointment_time', '-id'))
+
+        for page_size in (2, 3, 5):
+            pages = self.walk(queryset, page_size)
+            self.assertEqual([row for page in pages for row in page], newest_first)
+            self.assertFalse(pages[0].has_previous)
+
+            # Walking back from the last page lands on the same pages
+            page = pages[-1]
+            for expected in reversed(pages[:-1]):
+                page = paginate_appointments(queryset, page.previous_cursor, page_size)
+                self.assertEqual(page.items, expected.items)
+            self.assertFalse(page.has_previous)
+
+    def test_prev_with_exactly_one_page_before_returns_first_page(self):
+        queryset = Appointment.objects.all()
+        first, second = self.walk(queryset, 4)
+
+        page = paginate_appointments(queryset, second.previous_cursor, 4)
+        self.assertEqual(page.items, first.items)
+        self.assertFalse(page.has_previous)
+        self.assertEqual(page.next_cursor, first.next_cursor)
+
+    def test_malformed_cursor(self):
+        bad_direction = base64.urlsafe_b64encode(b'["2024-01-01","09:00:00",1,"sideways"]').decode()
+        for cursor in ('garbage', bad_direction, base64.urlsafe_b64encode(b'[1,2]').decode()):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('appointments:my_appointments'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['appointments']), 8)
+        self.assertEqual(
+            [str(message) for message in response.context['messages']],
+            ['That page link is not valid; showing the latest appointments.'],
+        )
+
+    def test_filters_carry_across_pages(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        params = QueryDict(mutable=True)
+        params.update({'status': 'confirmed', 'date_from': tomorrow.isoformat(), 'date_to': 'bad'})
+        queryset, filters = filter_appointments(Appointment.objects.all(), params)
+        self.assertEqual(filters, {'status': 'confirmed', 'date_from': tomorrow.isoformat()})
+
+        expected = Appointment.objects.filter(status='confirmed', appointment_date__gte=tomorrow)
+        pages = self.walk(queryset, 1)
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(sorted(row.id for page in pages for row in page), sorted(row.id for row in expected))
+
+        # The view applies the filters to a cursor taken from a filtered page
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            reverse('appointments:my_appointments'), {**filters, 'cursor': pages[0].next_cursor}
+        )
+        self.assertEqual(response.context['filter_query'], urlencode(filters))
+        self.assertEqual(list(response.context['appointments']), pages[1].items)
+
+
+class IdentifierSequenceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('admin', password='pass', role='admin')
+
+    def next_value(self, prefix):
+        return IdentifierSequence.objects.get(prefix=prefix).next_value
+
+    def test_one_block_serves_a_transaction_until_exhausted(self):
+        worker = SequenceAllocator(block_size=5)
+
+        issued = [worker.next_identifier('PRE') for _ in range(7)]
+        self.assertEqual(issued, [f'PRE{number:06d}' for number in range(1, 8)])
+        self.assertEqual(self.next_value('PRE'), 11)
+
+    def test_committed_blocks_are_kept(self):
+        worker = SequenceAllocator(block_size=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(worker.reserve_identifiers('PRE', 3), ['PRE000001', 'PRE000002', 'PRE000003'])
+
+        # The rest of the committed block first, then a new one
+        self.assertEqual(worker.reserve_identifiers('PRE', 4), ['PRE000004', 'PRE000005', 'PRE000006', 'PRE000007'])
+        self.assertEqual(self.next_value('PRE'), 11)
+
+    def test_new_sequence_continues_after_existing_identifiers(self):
+        appointment = Appointment.objects.create(
+            patient=make_patient('patient'), doctor=make_doctor('doctor'), appointment_date=timezone.localdate(),
+            appointment_time=time(9), appointment_id='APT000041',
+        )
+        self.assertEqual(appointment.appointment_id, 'APT000041')
+        self.assertEqual(SequenceAllocator().next_identifier('APT'), 'APT000042')
+
+    def test_tokens_count_per_doctor_and_day(self):
+        doctor, other_doctor, patient = make_doctor('doctor'), make_doctor('other'), make_patient('patient')
+        today, tomorrow = timezone.localdate(), timezone.localdate() + timedelta(days=1)
+
+        def book(doctor, day, hour, **fields):
+            return Appointment.objects.create(
+                patient=patient, doctor=doctor, appointment_date=day, appointment_time=time(hour), **fields
+            ).token_number
+
+        self.assertEqual([book(doctor, today, hour) for hour in (9, 10, 11)], [1, 2, 3])
+        self.assertEqual((book(other_doctor, today, 9), book(doctor, tomorrow, 9)), (1, 1))
+
+        # A day whose bookings predate the counters continues after their highest token
+        later = today + timedelta(days=2)
+        book(doctor, later, 9, token_number=4)
+        self.assertEqual(book(doctor, later, 10), 5)
+
+        allocator = SequenceAllocator()
+        self.assertEqual(allocator.reserve_tokens(doctor.id, today, 3), 4)
+        self.assertEqual(allocator.next_token(doctor.id, today), 7)
+
+    def test_blocks_reserved_in_a_rolled_back_transaction_are_dropped(self):
+        worker, other_worker = SequenceAllocator(block_size=5), SequenceAllocator(block_size=5)
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Notification.objects.create(user=self.user, title='Write first', message='', notification_type='general')
+            rolled_back = worker.next_identifier('PRE')
+            raise RuntimeError
+
+        issued = other_worker.reserve_identifiers('PRE', 5) + worker.reserve_identifiers('PRE', 5)
+        self.assertIn(rolled_back, issued)
+        self.assertEqual(len(set(issued)), 10)
+
+
+class IdentifierBlockTests(TransactionTestCase):
+    def test_blocks_reserved_outside_a_transaction(self):
+        worker, other_worker = SequenceAllocator(block_size=5), SequenceAllocator(block_size=5)
+
+        self.assertEqual(worker.reserve_identifiers('REC', 3), ['REC000001', 'REC000002', 'REC000003'])
+        self.assertEqual(other_worker.next_identifier('REC'), 'REC000006')
+        # Each process exhausts its own block before reserving the next
+        self.assertEqual(worker.reserve_identifiers('REC', 3), ['REC000004', 'REC000005', 'REC000011'])
+        self.assertEqual(IdentifierSequence.objects.get(prefix='REC').next_value, 16)
+
+
+class SlotIndexSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor, cls.patient = make_doctor('doctor'), make_patient('patient')
+
+    def setUp(self):
+        self.slot_index = slot_index_module.get_slot_index()
+        self.addCleanup(setattr, slot_index_module, '_slot_index', None)
+
+    def test_only_committed_writes_reach_the_index(self):
+        doctor, day = self.doctor, timezone.localdate() + timedelta(days=10)
+
+        def book():
+            return Appointment.objects.create(
+                patient=self.patient, doctor=doctor, appointment_date=day, appointment_time=time(9)
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                book()
+                raise RuntimeError
+        self.assertIn(time(9), self.slot_index.free_slots(doctor.id, day))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment = book()
+        self.assertNotIn(time(9), self.slot_index.free_slots(doctor.id, day))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.delete()
+        self.assertIn(time(9), self.slot_index.free_slots(doctor.id, day))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BookingPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor, cls.patient = make_doctor('doctor'), make_patient('patient')
+
+    def setUp(self):
+        get_shared_cache().invalidate()
+        self.addCleanup(setattr, slot_index_module, '_slot_index', None)
+        self.client.force_login(self.patient.user)
+        session = self.client.session
+        session['symptom_analysis'] = {'specialization': 'general', 'symptoms': 'fever'}
+        session.save()
+
+    def test_slot_index_is_built_off_the_request(self):
+        with mock.patch('appointments.views.warm_slot_index') as warm_slot_index:
+            response = self.client.get(reverse('appointments:book_appointment'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['earliest_slot'])
+        warm_slot_index.assert_called_once_with()
+        self.assertIsNone(slot_index_module.get_slot_index(create=False))
+
+    def test_earliest_slot_skips_doctors_gone_since_the_build(self):
+        slot_index_module.get_slot_index()
+        response = self.client.get(reverse('appointments:book_appointment'))
+        self.assertEqual(response.context['earliest_slot']['doctor'], self.doctor)
+
+        # A queryset update sends no signal, so the index still offers the doctor
+        Doctor.objects.filter(pk=self.doctor.pk).update(is_available=False)
+        response = self.client.get(reverse('appointments:book_appointment'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['earliest_slot'])
+
@@ -5,6 +5,7 @@ app_name = 'appointments'
 
 urlpatterns = [
     path('book/', views.book_appointment, name='book_appointment'),
+    path('slots/', views.available_slots, name='available_slots'),
     path('my-appointments/', views.my_appointments, name='my_appointments'),
     path('<int:appointment_id>/', views.appointment_detail, name='appointment_detail'),
     path('<int:appointment_id>/cancel/', views.cancel_appointment, name='cancel_appointment'),
@@ -1,7 +1,11 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.http import JsonResponse
+from django.utils import timezone
 from .models import Appointment, Notification
+from .pagination import appointment_listing
+from .slot_index import get_slot_index, warm_slot_index
 from accounts.models import Doctor
 from datetime import datetime
 
@@ -26,6 +30,7 @@ def book_appointment(request):
     # Smart doctor allocation if specialization is known
     recommended_doctor = None
     allocation_info = None
+    earliest_slot = None
     
     if recommended_specialization:
         from core.ai_utils import doctor_allocator
@@ -45,6 +50,22 @@ def book_appointment(request):
             'workload': allocation_result.get('workload'),
             'alternatives': allocation_result.get('alternatives', [])
         }
+        
+        # Soonest free slot of any doctor with the specialization; until this
+        # worker's slot index is built (in the background) the page goes without
+        slot_index = get_slot_index(create=False)
+        if slot_index is None:
+            warm_slot_index()
+        else:
+            earliest = slot_index.earliest_slot(recommended_specialization)
+            if earliest:
+                doctor_id, start = earliest
+                # The doctor may have been removed or made unavailable since the index was built
+                doctor = Doctor.objects.select_related('user').filter(
+                    id=doctor_id, is_available=True, user__is_active=True
+                ).first()
+                if doctor is not None:
+                    earliest_slot = {'doctor': doctor, 'start': start}
     
     if request.method == 'POST':
         doctor_id = request.POST.get('doctor')
@@ -54,13 +75,8 @@ def book_appointment(request):
         
         doctor = get_object_or_404(Doctor, id=doctor_id)
         
-        # Generate appointment ID
-        appointment_count = Appointment.objects.count() + 1
-        appointment_id = f"APT{appointment_count:06d}"
-        
-        # Create appointment
+        # Create appointment (the ID and the doctor's token for the day are assigned on save)
         appointment = Appointment.objects.create(
-            appointment_id=appointment_id,
             patient=patient,
             doctor=doctor,
             appointment_date=appointment_date,
@@ -85,18 +101,39 @@ def book_appointment(request):
         return redirect('appointments:my_appointments')
     
     # Get all available doctors
-    doctors = Doctor.objects.filter(is_available=True)
+    from core.ai_utils import doctor_allocator
+    doctors = doctor_allocator.get_available_doctors()
     
     context = {
         'doctors': doctors,
         'recommended_doctor': recommended_doctor,
         'allocation_info': allocation_info,
+        'earliest_slot': earliest_slot,
         'symptom_analysis': symptom_analysis
     }
     
     return render(request, 'appointments/book_appointment.html', context)
 
 
+@login_required
+def available_slots(request):
+    """Free 15-minute slots of a doctor on a date, as JSON for the booking form"""
+    try:
+        doctor_id = int(request.GET.get('doctor', ''))
+        day = datetime.strptime(request.GET.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'error': 'doctor and date (YYYY-MM-DD) are required'}, status=400)
+    
+    # Slots already started today are not bookable
+    after = timezone.localtime().time() if day == timezone.localdate() else None
+    slots = get_slot_index().free_slots(doctor_id, day, after)
+    return JsonResponse({
+        'doctor': doctor_id,
+        'date': day.isoformat(),
+        'slots': [slot.strftime('%H:%M') for slot in slots]
+    })
+
+
 @login_required
 def my_appointments(request):
     if request.user.role == 'patient':
@@ -106,7 +143,8 @@ def my_appointments(request):
     else:
         appointments = Appointment.objects.all()
     
-    return render(request, 'appointments/my_appointments.html', {'appointments': appointments})
+    # One page at a time, filtered by status/date
+    return render(request, 'appointments/my_appointments.html', appointment_listing(request, appointments))
 
 
 @login_required
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+Benchmark for doctor allocation scoring
+
+Scores synthetic doctor pools with AllocationEngine and with a per-doctor
+Python version of the same formula (string normalization and related_map
+rebuilt per call, full sort), and checks both rank doctors identically.
+
+Usage: python benchmark_allocation.py [--doctors 100 1000 10000] [--runs N]
+"""
+import os
+import sys
+import timeit
+import random
+import argparse
+import django
+
+# Set up Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medconnect.settings')
+django.setup()
+
+from core.allocation_engine import AllocationEngine, DoctorFeatures
+
+SPECIALIZATIONS = [
+    'cardiology', 'neurology', 'orthopedics', 'pediatrics', 'dermatology', 'general',
+    'psychiatry', 'ophthalmology', 'ent', 'gynecology', 'general_medicine', 'Internal Medicine',
+    'psychology', 'sports_medicine',
+]
+REQUIRED = [
+    'cardiology', 'neurology', 'orthopedics', 'dermatology', 'gastroenterology', 'pulmonology',
+    'ent', 'ophthalmology', 'gynecology', 'pediatrics', 'psychiatry', 'general_medicine', 'oncology',
+]
+
+
+def legacy_specialization_score(doctor_spec, required_spec):
+    """Per-doctor version of AllocationEngine.affinity_rows: normalize both names and look up related_map on every call"""
+    doctor_spec = doctor_spec.lower().replace(' ', '_')
+    required_spec = required_spec.lower().replace(' ', '_')
+    if doctor_spec == required_spec:
+        return 1.0
+    related_map = {
+        'cardiology': ['general_medicine', 'internal_medicine'],
+        'neurology': ['general_medicine', 'internal_medicine'],
+        'gastroenterology': ['general_medicine', 'internal_medicine'],
+        'pulmonology': ['general_medicine', 'internal_medicine'],
+        'ent': ['general_medicine'],
+        'ophthalmology': ['general_medicine'],
+        'orthopedics': ['general_medicine', 'sports_medicine'],
+        'dermatology': ['general_medicine'],
+        'psychiatry': ['psychology', 'counseling'],
+    }
+    if required_spec in related_map:
+        if doctor_spec in related_map[required_spec]:
+            return 0.5
+    if doctor_spec == 'general_medicine':
+        return 0.3
+    return 0.1
+
+
+def legacy_workload_score(workload):
+    """Per-doctor version of AllocationEngine.workload_scores"""
+    if workload <= 5:
+        return 1.0
+    elif workload <= 10:
+        return 0.7
+    elif workload <= 15:
+        return 0.4
+    else:
+        return 0.2
+
+
+def legacy_rank(doctors, required, k=3):
+    """AllocationEngine.rank computed one doctor at a time in Python, sorting the whole pool"""
+    scored = []
+    for position, (spec, workload, available) in enumerate(doctors):
+        score = (
+            legacy_specialization_score(spec, required) * 0.4 +
+            legacy_workload_score(workload) * 0.4 +
+            (1.0 if available else 0.0) * 0.2
+        )
+        scored.append((position, score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:k]
+
+
+def synthetic_doctors(count, rng):
+    return [
+        (rng.choice(SPECIALIZATIONS), rng.randint(0, 25), rng.random() > 0.1)
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--doctors', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    engine = AllocationEngine()
+
+    print("=== Doctor allocation scoring benchmark ===")
+    print(f"Best of {args.runs} runs per required specialization, microseconds\n")
+    print(f"{'doctors':>8}{'legacy':>12}{'engine':>12}{'speed-up':>10}{'diffs':>7}")
+
+    failed = False
+    for count in args.doctors:
+        doctors = synthetic_doctors(count, rng)
+        features = DoctorFeatures(
+            range(count),
+            [spec for spec, _, _ in doctors],
+            [workload for _, workload, _ in doctors],
+            [available for _, _, available in doctors],
+            [0.0] * count,
+            [0] * count,
+        )
+
+        mismatches = 0
+        for required in REQUIRED:
+            positions, scores = engine.rank(features, required)
+            if legacy_rank(doctors, required) != list(zip(positions.tolist(), scores.tolist())):
+                mismatches += 1
+
+        legacy = min(timeit.repeat(lambda: [legacy_rank(doctors, r) for r in REQUIRED], number=1, repeat=args.runs))
+        current = min(timeit.repeat(lambda: [engine.rank(features, r) for r in REQUIRED], number=1, repeat=args.runs))
+        legacy, current = legacy / len(REQUIRED) * 1e6, current / len(REQUIRED) * 1e6
+
+        print(f"{count:>8}{legacy:>12.1f}{current:>12.1f}{legacy / current:>9.1f}x{mismatches:>7}")
+        failed = failed or mismatches > 0
+
+    if failed:
+        print("\nThe engine ranked doctors differently from the original scoring")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Latency benchmark for inverted-index candidate pruning in the symptom index
+
+Builds synthetic symptom corpora of growing size (Zipf-distributed vocabulary,
+like real clinical phrases) and times one symptom check against each with:
+  - brute force: cosine similarity against every phrase, then top-k
+  - pruned: only phrases sharing a term with the query (SymptomIndex.search)
+Both must return the same matches; any difference fails the run.
+
+Usage: python benchmark_candidate_pruning.py [--sizes 100 1000 10000 100000] [--queries N]
+"""
+import os
+import sys
+import time
+import argparse
+import django
+
+# Set up Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medconnect.settings')
+django.setup()
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from core.symptom_index import SymptomIndex
+
+TOP_K = 5
+
+
+def synthetic_phrases(count, rng, vocabulary_size=20000):
+    """Phrases of 1-4 terms drawn from a Zipf-like vocabulary"""
+    weights = 1.0 / np.arange(1, vocabulary_size + 1)
+    weights /= weights.sum()
+    lengths = rng.integers(1, 5, size=count)
+    terms = rng.choice(vocabulary_size, size=lengths.sum(), p=weights)
+    words = np.char.add('term', terms.astype(str))
+    return [' '.join(chunk) for chunk in np.split(words, np.cumsum(lengths)[:-1])]
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def benchmark(size, queries, rng):
+    phrases = synthetic_phrases(size, rng)
+    labels = rng.integers(0, 12, size=size).astype(str)
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2))
+    index = SymptomIndex.build(vectorizer, phrases, labels)
+
+    # Queries are longer than phrases, like a patient's description
+    query_texts = [' '.join(synthetic_phrases(3, rng)) for _ in range(queries)]
+
+    brute_times, pruned_times, mismatches = [], [], 0
+    for text in query_texts:
+        query = index.vectorizer.transform([text])
+
+        start = time.perf_counter()
+        similarities = index.similarities(query)
+        brute_indices = index.top_k(similarities, TOP_K)
+        brute_similarities = np.take_along_axis(similarities, brute_indices, axis=1)
+        brute_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        pruned_indices, pruned_similarities = index.search(query, TOP_K)
+        pruned_times.append(time.perf_counter() - start)
+
+        if not (np.array_equal(brute_indices, pruned_indices)
+                and np.array_equal(brute_similarities, pruned_similarities)):
+            mismatches += 1
+
+    return percentiles(brute_times), percentiles(pruned_times), mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+
+    print("=== Symptom index candidate pruning benchmark ===")
+    print(f"{args.queries} single-text queries per corpus, latency in ms\n")
+    print(f"{'phrases':>10}{'brute p50':>12}{'brute p99':>12}{'pruned p50':>12}{'pruned p99':>12}{'speed-up':>10}{'diffs':>7}")
+
+    failed = False
+    for size in args.sizes:
+        (brute_p50, brute_p99), (pruned_p50, pruned_p99), mismatches = benchmark(size, args.queries, rng)
+        print(f"{size:>10}{brute_p50:>12.3f}{brute_p99:>12.3f}{pruned_p50:>12.3f}{pruned_p99:>12.3f}"
+              f"{brute_p50 / pruned_p50:>9.1f}x{mismatches:>7}")
+        failed = failed or mismatches > 0
+
+    if failed:
+        print("\nPruned search returned different matches than brute force")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for SymptomAnalyzer.preprocess_text
+
+Compares the original NLTK pipeline (stopword corpus reloaded and the
+Treebank word tokenizer run on every call) with the precompiled one, and
+checks that both produce the same tokens.
+
+Usage: python benchmark_preprocessing.py [--iterations N]
+"""
+import os
+import re
+import sys
+import timeit
+import argparse
+import django
+
+# Set up Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medconnect.settings')
+django.setup()
+
+from core.ai_utils import symptom_analyzer
+
+SAMPLES = [
+    "I have chest pain and heart palpitations",
+    "I've been having severe headaches with nausea and some vision problems for the past 3 days",
+    "I have severe chest pain and difficulty breathing, I think it might be a heart attack",
+    "My child has a high fever and cough, and I cannot get him to sleep",
+    "I don't feel well",
+    "gonna need a checkup, wanna know why my back pain keeps coming back!!",
+]
+
+
+def legacy_preprocess_text(text):
+    """
+    The original implementation, kept here as the baseline
+    word_tokenize is punkt sentence splitting plus NLTKWordTokenizer; the
+    cleaned text has no punctuation, so it is always one sentence and the
+    tokenizer alone gives the same tokens without the punkt data.
+    """
+    from nltk.tokenize.destructive import NLTKWordTokenizer
+    from nltk.corpus import stopwords
+
+    text = text.lower()
+    text = re.sub(r'[^a-z0-9\s]', '', text)
+    tokens = NLTKWordTokenizer().tokenize(text)
+    stop_words = set(stopwords.words('english'))
+    tokens = [t for t in tokens if t not in stop_words]
+    return ' '.join(tokens)
+
+
+def per_call_microseconds(func, iterations):
+    timer = timeit.Timer(lambda: [func(sample) for sample in SAMPLES])
+    best = min(timer.repeat(repeat=5, number=iterations))
+    return best / (iterations * len(SAMPLES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    print("=== preprocess_text micro-benchmark ===\n")
+
+    current = per_call_microseconds(symptom_analyzer.preprocess_text, args.iterations)
+
+    mismatches = [
+        sample for sample in SAMPLES
+        if legacy_preprocess_text(sample) != symptom_analyzer.preprocess_text(sample)
+    ]
+    legacy = per_call_microseconds(legacy_preprocess_text, max(args.iterations // 10, 1))
+
+    print(f"Before (NLTK per call):  {legacy:10.1f} us/call")
+    print(f"After (precompiled):     {current:10.1f} us/call")
+    print(f"Speed-up:                {legacy / current:10.1f}x")
+
+    if mismatches:
+        print("\nToken mismatch for:")
+        for sample in mismatches:
+            print(f"  {sample!r}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Startup benchmark for the AI utilities
+
+Each run happens in a fresh interpreter, as a new gunicorn worker would see it,
+and reports:
+  - import time of core.ai_utils
+  - time to the first symptom analysis (lazy build + first request)
+  - the same numbers when the warm-up hook runs first
+
+Usage: python benchmark_startup.py [--runs N]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+PROBE = r'''
+import json, os, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medconnect.settings')
+import django
+django.setup()
+
+start = time.perf_counter()
+import core.ai_utils as ai_utils
+imported = time.perf_counter()
+if os.environ.get('BENCHMARK_WARM_UP') == '1':
+    ai_utils.warm_up()
+ready = time.perf_counter()
+ai_utils.symptom_analyzer.analyze_symptoms('I have chest pain and shortness of breath')
+first = time.perf_counter()
+
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'warm_up_ms': (ready - imported) * 1000,
+    'first_analysis_ms': (first - ready) * 1000,
+}))
+'''
+
+
+def run_probe(warm_up):
+    # The warm-up is called explicitly so it is timed apart from django.setup()
+    env = dict(os.environ, AI_WARMUP_ON_STARTUP='0', BENCHMARK_WARM_UP='1' if warm_up else '0')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print("=== AI utilities startup benchmark ===")
+    print(f"Median of {args.runs} fresh interpreters (ms)\n")
+    print(f"{'mode':<10}{'import':>10}{'warm-up':>10}{'1st analysis':>14}")
+
+    for warm_up in (False, True):
+        runs = [run_probe(warm_up) for _ in range(args.runs)]
+        medians = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        mode = 'warm-up' if warm_up else 'lazy'
+        print(f"{mode:<10}{medians['import_ms']:>10.1f}{medians['warm_up_ms']:>10.1f}{medians['first_analysis_ms']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import ExportJob
 
-# Register your models here.
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'format', 'entity', 'start_date', 'end_date', 'status', 'rows_written', 'requested_by', 'created_at')
+    list_filter = ('status', 'format', 'entity')
+    list_select_related = ('requested_by',)
+    readonly_fields = ('content_hash', 'size', 'worker', 'started_at', 'heartbeat_at', 'finished_at')
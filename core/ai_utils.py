@@ -1,396 +1,20 @@
 """
 AI Utilities for MedConnect
 Provides NLP-based symptom analysis and smart doctor allocation
+
+The symptom analyzer pulls in NumPy, scikit-learn and NLTK and fits a TF-IDF
+model, so it is built on first use rather than at import. Call warm_up() (gunicorn
+does when AI_WARMUP_ON_STARTUP is set) to pay that cost before the first request instead.
 """
 
-import re
-import numpy as np
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
+import threading
+import time
 from datetime import datetime, timedelta
-from django.db.models import Count, Q
-
-# Download required NLTK data (run once)
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('punkt_tab', quiet=True)
-    nltk.download('stopwords', quiet=True)
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
 
-class SymptomAnalyzer:
-    """
-    NLP-based symptom analyzer using TF-IDF and pattern matching
-    Can be extended with TensorFlow models for more advanced analysis
-    """
-    
-    def __init__(self):
-        # Medical knowledge base: symptoms mapped to specializations
-        self.symptom_specialization_map = {
-            'cardiology': [
-                'chest pain', 'heart pain', 'palpitations', 'irregular heartbeat',
-                'shortness of breath', 'heart attack', 'angina', 'hypertension',
-                'high blood pressure', 'heart pounding', 'dizzy', 'faint',
-                'heartburn', 'acid reflux'  # Added common cardiac symptoms
-            ],
-            'neurology': [
-                'headache', 'migraine', 'seizure', 'numbness', 'tingling',
-                'memory loss', 'confusion', 'dizziness', 'vertigo', 'tremor',
-                'paralysis', 'weakness', 'stroke', 'brain', 'nerve pain',
-                'brain fog', 'concentration problems', 'focus issues'  # Added common neurological symptoms
-            ],
-            'orthopedics': [
-                'joint pain', 'back pain', 'knee pain', 'arthritis', 'fracture',
-                'sprain', 'bone pain', 'muscle pain', 'hip pain', 'shoulder pain',
-                'neck pain', 'injury', 'sports injury', 'mobility issues', 'leg pain'
-            ],
-            'dermatology': [
-                'rash', 'skin rash', 'itching', 'acne', 'eczema', 'psoriasis',
-                'skin lesion', 'moles', 'hives', 'skin infection', 'burn',
-                'skin discoloration', 'dry skin', 'oily skin'
-            ],
-            'gastroenterology': [
-                'stomach pain', 'abdominal pain', 'nausea', 'vomiting', 'diarrhea',
-                'constipation', 'bloating', 'acid reflux', 'heartburn', 'ulcer',
-                'indigestion', 'bowel', 'digestive issues', 'cramps'
-            ],
-            'pulmonology': [
-                'cough', 'breathing difficulty', 'wheezing', 'asthma', 'bronchitis',
-                'pneumonia', 'lung pain', 'respiratory', 'chest congestion',
-                'phlegm', 'tuberculosis', 'covid', 'shortness of breath',
-                'chest tightness', 'difficulty breathing'  # Added respiratory symptoms
-            ],
-            'ent': [
-                'ear pain', 'sore throat', 'throat pain', 'hearing loss', 'tinnitus',
-                'nasal congestion', 'sinus', 'nose bleeding', 'throat infection',
-                'voice loss', 'ear infection', 'tonsillitis', 'sinusitis'
-            ],
-            'ophthalmology': [
-                'eye pain', 'vision problems', 'blurry vision', 'double vision',
-                'eye redness', 'eye discharge', 'eye infection', 'cataract',
-                'glaucoma', 'dry eyes', 'watery eyes', 'light sensitivity'
-            ],
-            'gynecology': [
-                'menstrual pain', 'period pain', 'irregular periods', 'pelvic pain',
-                'vaginal discharge', 'pregnancy', 'menopause', 'cramps',
-                'heavy bleeding', 'missed period', 'reproductive', 'ovarian'
-            ],
-            'pediatrics': [
-                'child fever', 'infant', 'baby', 'vaccination', 'growth issues',
-                'developmental delay', 'child cough', 'child rash', 'newborn'
-            ],
-            'psychiatry': [
-                'depression', 'anxiety', 'stress', 'panic attack', 'insomnia',
-                'sleep problems', 'mood swings', 'mental health', 'ptsd',
-                'bipolar', 'schizophrenia', 'suicidal thoughts'
-            ],
-            'general_medicine': [
-                'fever', 'fatigue', 'weakness', 'cold', 'flu', 'infection',
-                'body ache', 'tiredness', 'general checkup', 'malaise'
-            ]
-        }
-        
-        # Urgency keywords for severity assessment
-        self.high_urgency_keywords = [
-            'severe', 'unbearable', 'extreme', 'critical', 'emergency',
-            'heart attack', 'stroke', 'bleeding heavily',
-            'unconscious', 'seizure', 'suicidal', 'difficulty breathing',
-            'chest pain severe', 'cannot breathe'  # More specific high urgency
-        ]
-        
-        self.moderate_urgency_keywords = [
-            'moderate', 'persistent', 'recurring', 'worsening', 'painful',
-            'high fever', 'vomiting blood', 'severe pain',
-            'difficulty breathing mild', 'chest discomfort'  # More specific moderate urgency
-        ]
-        
-        # Initialize TF-IDF vectorizer for symptom matching
-        self.vectorizer = TfidfVectorizer(
-            ngram_range=(1, 2),  # Reduced from 1-3 for better matching
-            #stop_words='english',
-            max_features=1000,
-            lowercase=True,
-            strip_accents='ascii'
-        )
-        
-        # Build corpus from symptom knowledge base
-        self._build_symptom_corpus()
-    
-    def _build_symptom_corpus(self):
-        """Build a corpus of all symptoms for TF-IDF matching"""
-        self.corpus_texts = []
-        self.corpus_labels = []
-        
-        for specialization, symptoms in self.symptom_specialization_map.items():
-            for symptom in symptoms:
-                self.corpus_texts.append(symptom)
-                self.corpus_labels.append(specialization)
-        
-        # Fit the vectorizer on the corpus
-        if self.corpus_texts:
-            self.vectorizer.fit(self.corpus_texts)
-        else:
-            # Handle empty corpus case with fallback
-            self.corpus_texts = ['general medicine']
-            self.corpus_labels = ['general_medicine']
-            self.vectorizer.fit(self.corpus_texts)
-    
-    def preprocess_text(self, text):
-        """Clean and preprocess symptom text"""
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Remove special characters except spaces
-        text = re.sub(r'[^a-z0-9\s]', '', text)
-        
-        # Tokenize
-        tokens = word_tokenize(text)
-        
-        # Remove stopwords
-        stop_words = set(stopwords.words('english'))
-        tokens = [t for t in tokens if t not in stop_words]
-        
-        return ' '.join(tokens)
-    
-    def analyze_symptoms(self, symptom_text, patient_age=None, patient_gender=None):
-        """
-        Analyze patient symptoms using NLP and return recommendations
-        
-        Args:
-            symptom_text: Patient's description of symptoms
-            patient_age: Patient age (optional, for better recommendations)
-            patient_gender: Patient gender (optional, for better recommendations)
-        
-        Returns:
-            dict with specialization, severity, confidence, and recommendations
-        """
-        # Preprocess the input
-        processed_text = self.preprocess_text(symptom_text)
-        
-        if not processed_text:
-            return {
-                'recommended_specialization': 'general_medicine',
-                'severity': 'low',
-                'confidence': 0.5,
-                'recommendations': ['Please provide more details about your symptoms.'],
-                'matched_symptoms': []
-            }
-        
-        # Calculate TF-IDF similarity with symptom corpus
-        symptom_vector = self.vectorizer.transform([processed_text])
-        corpus_vectors = self.vectorizer.transform(self.corpus_texts)
-        similarities = cosine_similarity(symptom_vector, corpus_vectors)[0]
-        
-        # Get top matches with improved threshold
-        top_indices = np.argsort(similarities)[-5:][::-1]
-        top_specializations = [self.corpus_labels[i] for i in top_indices]
-        top_similarities = [similarities[i] for i in top_indices]
-        
-        # Use adaptive threshold for matched symptoms
-        max_similarity = max(similarities) if similarities.size > 0 else 0
-        adaptive_threshold = max(0.1, max_similarity * 0.3)  # 30% of max similarity
-        matched_symptoms = [self.corpus_texts[i] for i in top_indices if similarities[i] > adaptive_threshold]
-        
-        # Determine primary specialization using improved confidence calculation
-        if top_similarities[0] > 0:
-            specialization_scores = {}
-            
-            # Calculate weighted scores for each specialization
-            for i, spec in enumerate(top_specializations):
-                similarity = top_similarities[i]
-                
-                # Base score is the similarity value
-                score = similarity
-                
-                # Apply multiple factors for scoring
-                # Boost score if multiple symptoms match this specialization
-                spec_matches = [j for j, s in enumerate(top_specializations) if s == spec]
-                if len(spec_matches) > 1:
-                    score *= 1.1  # Reduced boost for multiple matches
-                
-                specialization_scores[spec] = specialization_scores.get(spec, 0) + score
-            
-            # Get best specialization
-            if specialization_scores:
-                recommended_spec = max(specialization_scores.items(), key=lambda x: x[1])[0]
-                
-                # Calculate proper confidence using multiple factors
-                confidence = self._calculate_confidence(
-                    top_similarities, 
-                    top_specializations, 
-                    recommended_spec,
-                    similarities
-                )
-            else:
-                recommended_spec = 'general_medicine'
-                confidence = 0.3  # Low confidence for fallback
-        else:
-            recommended_spec = 'general_medicine'
-            confidence = 0.2  # Very low confidence for no matches
-        
-        # Assess severity based on urgency keywords
-        severity = self._assess_severity(symptom_text.lower())
-        
-        # Generate recommendations
-        recommendations = self._generate_recommendations(
-            recommended_spec, 
-            severity, 
-            patient_age, 
-            patient_gender
-        )
-        
-        # Generate alternative specializations with similarity threshold
-        alternative_specs = []
-        seen_specs = set()
-        
-        for i in range(1, min(len(top_specializations), 4)):
-            spec = top_specializations[i]
-            similarity = top_similarities[i]
-            
-            # Add if different from recommended and above threshold
-            if spec != recommended_spec and spec not in seen_specs and similarity > 0.2:
-                alternative_specs.append(spec)
-                seen_specs.add(spec)
-        
-        return {
-            'recommended_specialization': recommended_spec,
-            'severity': severity,
-            'confidence': round(confidence, 2),
-            'recommendations': recommendations,
-            'matched_symptoms': matched_symptoms[:3],
-            'alternative_specializations': alternative_specs
-        }
-    
-    def _assess_severity(self, text):
-        """Assess symptom severity based on keywords"""
-        # Check for high urgency keywords with word boundaries
-        high_urgency_patterns = [
-            r'\b' + re.escape(keyword) + r'\b' 
-            for keyword in self.high_urgency_keywords
-        ]
-        
-        for pattern in high_urgency_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return 'high'
-        
-        # Check for moderate urgency keywords with word boundaries
-        moderate_urgency_patterns = [
-            r'\b' + re.escape(keyword) + r'\b' 
-            for keyword in self.moderate_urgency_keywords
-        ]
-        
-        for pattern in moderate_urgency_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return 'moderate'
-        
-        return 'low'
-    
-    def _calculate_confidence(self, top_similarities, top_specializations, recommended_spec, all_similarities):
-        """
-        Calculate realistic confidence score using multiple factors
-        
-        Args:
-            top_similarities: Similarities of top 5 matches
-            top_specializations: Specializations of top 5 matches
-            recommended_spec: Recommended specialization
-            all_similarities: All similarity scores from corpus
-            
-        Returns:
-            float: Confidence score between 0.0 and 1.0
-        """
-        try:
-            # Factor 1: Average similarity of top 3 matches (40% weight)
-            top_3_similarities = top_similarities[:3]
-            avg_similarity = np.mean(top_3_similarities) if top_3_similarities else 0
-            
-            # Factor 2: Consistency across matches (25% weight)
-            # Lower standard deviation = more consistent matches
-            consistency = 1.0 - min(np.std(top_3_similarities) if len(top_3_similarities) > 1 else 0, 1.0)
-            
-            # Factor 3: Number of quality matches (20% weight)
-            # Count matches above reasonable threshold
-            quality_matches = len([s for s in top_3_similarities if s > 0.2])
-            quality_factor = min(quality_matches / 3.0, 1.0)
-            
-            # Factor 4: Similarity distribution (15% weight)
-            # Prefer scenarios where top match is significantly better than others
-            if len(top_3_similarities) >= 2:
-                distribution = top_3_similarities[0] - top_3_similarities[1]
-                distribution_factor = min(distribution, 1.0)
-            else:
-                distribution_factor = 0.5
-            
-            # Calculate weighted confidence
-            confidence = (
-                avg_similarity * 0.4 +
-                consistency * 0.25 +
-                quality_factor * 0.2 +
-                distribution_factor * 0.15
-            )
-            
-            # Apply additional sanity checks
-            # Ensure confidence doesn't exceed maximum similarity by too much
-            max_possible_confidence = min(top_similarities[0] * 1.2, 1.0)
-            confidence = min(confidence, max_possible_confidence)
-            
-            # Ensure minimum confidence for reasonable matches
-            if top_similarities[0] > 0.3:
-                confidence = max(confidence, 0.3)
-            
-            return round(max(0.0, min(1.0, confidence)), 2)
-            
-        except Exception as e:
-            # Fallback confidence calculation
-            return round(min(top_similarities[0] * 0.8, 0.6), 2)
-    
-    def _generate_recommendations(self, specialization, severity, age, gender):
-        """Generate personalized recommendations"""
-        recommendations = []
-        
-        # Urgency-based recommendations
-        if severity == 'high':
-            recommendations.append('⚠️ Your symptoms suggest urgent medical attention may be needed.')
-            recommendations.append('Please visit the emergency department or book an immediate consultation.')
-        elif severity == 'moderate':
-            recommendations.append('Your symptoms require medical attention soon.')
-            recommendations.append('Please book an appointment within the next 1-2 days.')
-        else:
-            recommendations.append('Your symptoms can typically be managed with a routine consultation.')
-            recommendations.append('Book an appointment at your convenience.')
-        
-        # Specialization-specific advice
-        spec_advice = {
-            'cardiology': 'Avoid strenuous activities and rest until you see a doctor.',
-            'neurology': 'Keep a symptom diary noting frequency and triggers.',
-            'orthopedics': 'Apply ice/heat as appropriate and avoid aggravating movements.',
-            'dermatology': 'Avoid scratching and keep the affected area clean.',
-            'gastroenterology': 'Stay hydrated and maintain a bland diet until symptoms improve.',
-            'pulmonology': 'Rest, stay hydrated, and avoid smoke/pollutants.',
-            'ent': 'Gargle with warm salt water and stay hydrated.',
-            'ophthalmology': 'Avoid eye strain and bright lights until examined.',
-            'gynecology': 'Track your symptoms and menstrual cycle.',
-            'psychiatry': 'Practice stress management and maintain sleep routine.',
-            'general_medicine': 'Get adequate rest and stay hydrated.'
-        }
-        
-        if specialization in spec_advice:
-            recommendations.append(spec_advice[specialization])
-        
-        # Age-specific recommendations
-        if age:
-            if age < 18:
-                recommendations.append('As this is for a minor, parental/guardian presence is recommended.')
-            elif age > 65:
-                recommendations.append('Given your age, regular health monitoring is advisable.')
-        
-        return recommendations
+from .query_count import QueryCounter
+from .shared_cache import ALLOCATION, ANALYTICS, WORKLOAD, get_shared_cache
 
 
 class DoctorAllocator:
@@ -399,12 +23,23 @@ class DoctorAllocator:
     Uses decision algorithm with scikit-learn principles
     """
     
+    # Batch allocation: appointments per doctor per day, and how they are spaced
+    DAILY_CAPACITY = 15
+    SLOT_MINUTES = 15
+    DEFAULT_START_TIME = datetime.strptime('09:00', '%H:%M').time()
+    DEFAULT_END_TIME = datetime.strptime('17:00', '%H:%M').time()
+    
     def __init__(self):
-        self.specialization_weights = {
-            'exact_match': 1.0,
-            'related_match': 0.5,
-            'general_fallback': 0.3
-        }
+        self._engine = None
+    
+    @property
+    def engine(self):
+        """Vectorized scoring engine (imports NumPy, so built on first allocation)"""
+        if self._engine is None:
+            from accounts.models import Doctor
+            from .allocation_engine import AllocationEngine
+            self._engine = AllocationEngine(code for code, _ in Doctor.SPECIALIZATION_CHOICES)
+        return self._engine
     
     def allocate_doctor(self, patient, required_specialization, preferred_date=None):
         """
@@ -423,20 +58,7 @@ class DoctorAllocator:
             dict with recommended doctor and allocation score
         """
         from accounts.models import Doctor
-        from appointments.models import Appointment
-        
-        # Get all available doctors
-        available_doctors = Doctor.objects.filter(
-            user__is_active=True,
-            is_available=True
-        )
-        
-        if not available_doctors.exists():
-            return {
-                'doctor': None,
-                'score': 0,
-                'reason': 'No doctors currently available'
-            }
+        from .allocation_engine import DoctorFeatures
         
         # Calculate date range for workload analysis (next 7 days)
         if preferred_date:
@@ -446,25 +68,41 @@ class DoctorAllocator:
         
         end_date = start_date + timedelta(days=7)
         
-        # Score each doctor
-        doctor_scores = []
-        
-        for doctor in available_doctors:
-            score = self._calculate_doctor_score(
-                doctor,
-                required_specialization,
-                start_date,
-                end_date
+        with QueryCounter() as queries:
+            # Feature arrays of all available doctors, workload included, in one grouped
+            # query; shared by all workers until an appointment or doctor changes
+            features = get_shared_cache().get_or_set(
+                ALLOCATION,
+                ('features', start_date, end_date),
+                lambda: DoctorFeatures.from_queryset(self._with_workload(
+                    Doctor.objects.filter(user__is_active=True, is_available=True),
+                    start_date,
+                    end_date
+                ))
             )
             
-            doctor_scores.append({
-                'doctor': doctor,
-                'score': score,
-                'workload': self._get_doctor_workload(doctor, start_date, end_date)
-            })
-        
-        # Sort by score (descending)
-        doctor_scores.sort(key=lambda x: x['score'], reverse=True)
+            if not len(features):
+                return {
+                    'doctor': None,
+                    'score': 0,
+                    'reason': 'No doctors currently available',
+                    'queries': queries.count
+                }
+            
+            # Score every doctor in one NumPy pass and keep the best three
+            positions, scores = self.engine.rank(features, required_specialization, k=3)
+            
+            # Only the ranked doctors are loaded as model instances
+            doctors = Doctor.objects.select_related('user').in_bulk(features.ids[positions].tolist())
+        
+        doctor_scores = [
+            {
+                'doctor': doctors[features.ids[position]],
+                'score': float(score),
+                'workload': int(features.workloads[position])
+            }
+            for position, score in zip(positions, scores)
+        ]
         
         if doctor_scores and doctor_scores[0]['score'] > 0:
             best_match = doctor_scores[0]
@@ -484,102 +122,290 @@ class DoctorAllocator:
                         'workload': d['workload']
                     }
                     for d in doctor_scores[1:3]
-                ]
+                ],
+                'queries': queries.count
             }
         
         return {
             'doctor': None,
             'score': 0,
-            'reason': 'No suitable doctor found for the required specialization'
+            'reason': 'No suitable doctor found for the required specialization',
+            'queries': queries.count
         }
     
-    def _calculate_doctor_score(self, doctor, required_specialization, start_date, end_date):
-        """Calculate multi-factor score for doctor allocation"""
-        # Factor 1: Specialization match (40% weight)
-        specialization_score = self._get_specialization_score(
-            doctor.specialization,
-            required_specialization
-        )
+    def allocate_batch(self, requests, capacity=None, status='confirmed', create=True):
+        """
+        Allocate many patients at once (vaccination drives, camp days)
         
-        # Factor 2: Workload balance (40% weight)
-        workload = self._get_doctor_workload(doctor, start_date, end_date)
-        workload_score = self._get_workload_score(workload)
+        Requests for the same day are solved together as one min-cost
+        assignment over every doctor's free slots, so each assignment accounts
+        for the load the others add. Days are solved in order, each seeing the
+        assignments of the days before it. Doctors only get days they work
+        (available_days) and free slots within their hours; any booking that
+        isn't cancelled occupies its slot and counts towards capacity.
         
-        # Factor 3: Availability (20% weight)
-        availability_score = 1.0 if doctor.is_available else 0.0
+        Args:
+            requests: Iterable of (patient, required_specialization, preferred_date)
+            capacity: Maximum appointments per doctor per day (default DAILY_CAPACITY)
+            status: Status of the created appointments
+            create: Write the appointments (bulk insert); False for a dry run
         
-        # Weighted total score
-        total_score = (
-            specialization_score * 0.4 +
-            workload_score * 0.4 +
-            availability_score * 0.2
-        )
+        Returns:
+            dict with assignments, unassigned requests, solve_ms, queries and
+            per-day workload spread before and after
+        """
+        import numpy as np
+        from accounts.models import Doctor
+        from appointments.models import Appointment
+        from appointments.slot_index import FREE_STATUSES, parse_available_days, slot_of, slot_time
+        from .allocation_engine import DoctorFeatures
+        
+        capacity = self.DAILY_CAPACITY if capacity is None else capacity
+        requests = list(requests)
+        by_date = {}
+        for index, (patient, specialization, preferred_date) in enumerate(requests):
+            by_date.setdefault(preferred_date or datetime.now().date(), []).append(index)
+        
+        assignments = []
+        unassigned = []
+        days = []
+        solve_seconds = 0.0
+        added = {}  # (doctor_id, date) -> appointments assigned in this batch
+        schedules = {}  # doctor_id -> (weekdays, working slots)
+        
+        with QueryCounter() as queries:
+            for day in sorted(by_date):
+                indexes = by_date[day]
+                window_end = day + timedelta(days=7)
+                features = DoctorFeatures.from_queryset(self._with_workload(
+                    Doctor.objects.filter(user__is_active=True, is_available=True),
+                    day,
+                    window_end
+                ))
+                
+                doctor_ids = features.ids.tolist()
+                positions_by_id = {doctor_id: position for position, doctor_id in enumerate(doctor_ids)}
+                
+                # Count what earlier days of this batch already assigned within the window
+                for (doctor_id, added_day), count in added.items():
+                    if doctor_id in positions_by_id and day <= added_day <= window_end:
+                        features.workloads[positions_by_id[doctor_id]] += count
+                
+                for doctor_id, available_days, start, end in Doctor.objects.filter(
+                    id__in=[doctor_id for doctor_id in doctor_ids if doctor_id not in schedules]
+                ).values_list('id', 'available_days', 'available_time_start', 'available_time_end'):
+                    schedules[doctor_id] = (
+                        set(parse_available_days(available_days)),
+                        range(slot_of(start or self.DEFAULT_START_TIME), slot_of(end or self.DEFAULT_END_TIME))
+                    )
+                
+                booked = {}
+                for doctor_id, booked_time in Appointment.objects.filter(
+                    doctor_id__in=doctor_ids, appointment_date=day
+                ).exclude(status__in=FREE_STATUSES).values_list('doctor_id', 'appointment_time'):
+                    booked.setdefault(doctor_id, []).append(slot_of(booked_time))
+                
+                # Free slot times per doctor, as many as its remaining capacity allows
+                free_slots = []
+                for doctor_id in doctor_ids:
+                    weekdays, working = schedules[doctor_id]
+                    taken = booked.get(doctor_id, [])
+                    if day.weekday() not in weekdays:
+                        free_slots.append([])
+                        continue
+                    taken_slots = set(taken)
+                    free = [slot_time(slot) for slot in working if slot not in taken_slots]
+                    free_slots.append(free[:max(capacity - len(taken), 0)])
+                day_loads = np.array([capacity - len(free) for free in free_slots], dtype=np.int64)
+                workload_before = features.workloads.copy()
+                
+                start = time.perf_counter()
+                positions, scores = self.engine.assign(
+                    features,
+                    [requests[index][1] for index in indexes],
+                    day_loads,
+                    capacity
+                )
+                solve_seconds += time.perf_counter() - start
+                
+                assigned = positions >= 0
+                doctors = Doctor.objects.select_related('user').in_bulk(features.ids[positions[assigned]].tolist())
+                new_per_doctor = np.bincount(positions[assigned], minlength=len(features))
+                
+                next_slot = {}
+                for index, position, score in zip(indexes, positions.tolist(), scores.tolist()):
+                    patient, specialization, _ = requests[index]
+                    if position < 0:
+                        unassigned.append({'patient': patient, 'specialization': specialization, 'date': day})
+                        continue
+                    
+                    doctor = doctors[int(features.ids[position])]
+                    slot = next_slot.get(position, 0)
+                    next_slot[position] = slot + 1
+                    
+                    assignments.append({
+                        'patient': patient,
+                        'doctor': doctor,
+                        'specialization': specialization,
+                        'date': day,
+                        'time': free_slots[position][slot],
+                        'score': round(score, 2)
+                    })
+                    added[(doctor.id, day)] = added.get((doctor.id, day), 0) + 1
+                
+                days.append({
+                    'date': day,
+                    'requests': len(indexes),
+                    'assigned': int(assigned.sum()),
+                    'workload_before': self._spread(workload_before),
+                    'workload_after': self._spread(workload_before + new_per_doctor),
+                })
+            
+            if create and assignments:
+                self._create_batch_appointments(assignments, status, added)
         
-        return total_score
+        return {
+            'assignments': assignments,
+            'unassigned': unassigned,
+            'days': days,
+            'solve_ms': round(solve_seconds * 1000, 2),
+            'queries': queries.count
+        }
     
-    def _get_specialization_score(self, doctor_spec, required_spec):
-        """Score how well doctor's specialization matches requirement"""
-        # Normalize specialization strings
-        doctor_spec = doctor_spec.lower().replace(' ', '_')
-        required_spec = required_spec.lower().replace(' ', '_')
-        
-        # Exact match
-        if doctor_spec == required_spec:
-            return self.specialization_weights['exact_match']
-        
-        # Related specializations
-        related_map = {
-            'cardiology': ['general_medicine', 'internal_medicine'],
-            'neurology': ['general_medicine', 'internal_medicine'],
-            'gastroenterology': ['general_medicine', 'internal_medicine'],
-            'pulmonology': ['general_medicine', 'internal_medicine'],
-            'ent': ['general_medicine'],
-            'ophthalmology': ['general_medicine'],
-            'orthopedics': ['general_medicine', 'sports_medicine'],
-            'dermatology': ['general_medicine'],
-            'psychiatry': ['psychology', 'counseling'],
+    def _create_batch_appointments(self, assignments, status, added):
+        """Bulk insert the batch's appointments and notifications, keeping workload counters and rollups in step"""
+        from django.db import transaction
+        from appointments.models import Appointment, DoctorWorkload, Notification
+        from appointments.sequences import sequences
+        from appointments.rollups import bulk_adjust_rollups
+        from appointments.signals import bulk_adjust_workload
+        from appointments.slot_index import get_slot_index
+        from .signals import invalidate_shared_cache
+        
+        # bulk_create skips Appointment.save, which assigns IDs and tokens;
+        # IDs are reserved before the transaction starts writing
+        appointment_ids = sequences.reserve_identifiers('APT', len(assignments))
+        
+        with transaction.atomic():
+            tokens = {}
+            for assignment in assignments:
+                key = (assignment['doctor'].id, assignment['date'])
+                tokens[key] = tokens.get(key, 0) + 1
+            tokens = {key: sequences.reserve_tokens(*key, count) for key, count in tokens.items()}
+            
+            appointments = []
+            for appointment_id, assignment in zip(appointment_ids, assignments):
+                key = (assignment['doctor'].id, assignment['date'])
+                appointments.append(Appointment(
+                    appointment_id=appointment_id,
+                    patient=assignment['patient'],
+                    doctor=assignment['doctor'],
+                    appointment_date=assignment['date'],
+                    appointment_time=assignment['time'],
+                    status=status,
+                    token_number=tokens[key]
+                ))
+                tokens[key] += 1
+            appointments = Appointment.objects.bulk_create(appointments, batch_size=500)
+            
+            # bulk_create skips the signals that maintain DoctorWorkload and the analytics rollups
+            if status in DoctorWorkload.COUNTED_STATUSES:
+                bulk_adjust_workload(added)
+            bulk_adjust_rollups(appointments, {
+                assignment['doctor'].id: assignment['doctor'].specialization for assignment in assignments
+            })
+            
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=assignment['patient'].user_id,
+                    notification_type='appointment',
+                    title='Appointment Booked',
+                    message=f"Your appointment with Dr. {assignment['doctor'].user.get_full_name()} on {assignment['date']} has been booked."
+                )
+                for assignment in assignments
+            ], batch_size=500)
+        
+        for assignment, appointment in zip(assignments, appointments):
+            assignment['appointment'] = appointment
+        
+        # bulk_create skips the signals that invalidate the shared cache...
+        invalidate_shared_cache()
+        
+        # ... and the ones that keep this process's slot index current (after an
+        # enclosing transaction commits, if the batch runs inside one)
+        slot_index = get_slot_index(create=False)
+        if slot_index is not None:
+            def update_slot_index():
+                for appointment in appointments:
+                    slot_index.appointment_changed(appointment)
+            transaction.on_commit(update_slot_index)
+    
+    @staticmethod
+    def _spread(workloads):
+        """Summary of how evenly workload is spread across doctors"""
+        if not len(workloads):
+            return {'min': 0, 'max': 0, 'mean': 0.0, 'std': 0.0}
+        return {
+            'min': int(workloads.min()),
+            'max': int(workloads.max()),
+            'mean': round(float(workloads.mean()), 2),
+            'std': round(float(workloads.std()), 2),
         }
-        
-        # Check if doctor's specialization is related to required
-        if required_spec in related_map:
-            if doctor_spec in related_map[required_spec]:
-                return self.specialization_weights['related_match']
-        
-        # General medicine as fallback
-        if doctor_spec == 'general_medicine':
-            return self.specialization_weights['general_fallback']
-        
-        return 0.1  # Minimal score for non-matching specialization
+    
+    def _with_workload(self, doctors, start_date, end_date):
+        """
+        Annotate a Doctor queryset with `workload`, the number of upcoming
+        appointments between start_date and end_date, in a single grouped query
+        summing the per-day DoctorWorkload counters
+        """
+        return doctors.select_related('user').annotate(
+            workload=Coalesce(Sum('workload_days__appointment_count', filter=Q(
+                workload_days__date__gte=start_date,
+                workload_days__date__lte=end_date
+            )), 0)
+        )
     
     def _get_doctor_workload(self, doctor, start_date, end_date):
         """Calculate doctor's current workload"""
-        from appointments.models import Appointment
-        
-        # Count upcoming appointments
-        upcoming_count = Appointment.objects.filter(
-            doctor=doctor,
-            appointment_date__gte=start_date,
-            appointment_date__lte=end_date,
-            status__in=['scheduled', 'confirmed']
-        ).count()
-        
-        return upcoming_count
+        return self.get_workload_snapshot(start_date, end_date).get(doctor.id, 0)
     
-    def _get_workload_score(self, workload):
-        """Convert workload to a score (lower workload = higher score)"""
-        # Ideal workload: 0-5 appointments (score: 1.0)
-        # Moderate: 6-10 appointments (score: 0.7)
-        # High: 11-15 appointments (score: 0.4)
-        # Very high: 16+ appointments (score: 0.2)
+    def get_workload_snapshot(self, start_date, end_date):
+        """Upcoming appointments per doctor id between start_date and end_date (cached)"""
+        from appointments.models import DoctorWorkload
+        
+        # Sum the per-day counters of upcoming appointments, all doctors in one query
+        return get_shared_cache().get_or_set(
+            WORKLOAD,
+            ('snapshot', start_date, end_date),
+            lambda: dict(DoctorWorkload.objects.filter(
+                date__gte=start_date,
+                date__lte=end_date
+            ).values('doctor_id').annotate(total=Sum('appointment_count')).values_list('doctor_id', 'total'))
+        )
+    
+    def get_available_doctors(self):
+        """
+        Bookable doctors for doctor pickers (cached), as dicts with id, name,
+        specialization (display name) and consultation_fee
+        """
+        from accounts.models import Doctor
         
-        if workload <= 5:
-            return 1.0
-        elif workload <= 10:
-            return 0.7
-        elif workload <= 15:
-            return 0.4
-        else:
-            return 0.2
+        specializations = dict(Doctor.SPECIALIZATION_CHOICES)
+        return get_shared_cache().get_or_set(
+            ALLOCATION,
+            ('available_doctors',),
+            lambda: [
+                {
+                    'id': doctor_id,
+                    'name': f'{first_name} {last_name}'.strip(),
+                    'specialization': specializations.get(specialization, specialization),
+                    'consultation_fee': fee,
+                }
+                for doctor_id, first_name, last_name, specialization, fee in Doctor.objects.filter(
+                    is_available=True
+                ).values_list('id', 'user__first_name', 'user__last_name', 'specialization', 'consultation_fee')
+            ]
+        )
     
     def _get_allocation_reason(self, doctor, required_spec, score):
         """Generate human-readable reason for allocation"""
@@ -603,30 +429,67 @@ class DoctorAllocator:
         return " | ".join(reasons)
     
     def get_workload_analytics(self):
-        """Get system-wide workload analytics for admin dashboard"""
+        """Get system-wide workload analytics for admin dashboard (cached for all workers)"""
+        today = datetime.now().date()
+        return get_shared_cache().get_or_set(ANALYTICS, ('workload', today), lambda: self._compute_workload_analytics(today))
+    
+    def _compute_workload_analytics(self, today):
         from accounts.models import Doctor
-        from appointments.models import Appointment
         
-        today = datetime.now().date()
         next_week = today + timedelta(days=7)
         
-        doctors = Doctor.objects.filter(user__is_active=True)
+        doctors = self._with_workload(Doctor.objects.filter(user__is_active=True), today, next_week)
         
         analytics = []
         for doctor in doctors:
-            workload = self._get_doctor_workload(doctor, today, next_week)
-            workload_status = 'Low' if workload <= 5 else 'Moderate' if workload <= 10 else 'High'
+            workload_status, utilization_rate = self.describe_workload(doctor.workload)
             
             analytics.append({
                 'doctor': doctor,
-                'workload': workload,
+                'workload': doctor.workload,
                 'status': workload_status,
-                'utilization_rate': min(workload / 15 * 100, 100)  # Assuming 15 is max capacity
+                'utilization_rate': utilization_rate
             })
         
         return analytics
+    
+    @staticmethod
+    def describe_workload(workload):
+        """(status, utilization rate %) of a week's upcoming appointment count"""
+        workload_status = 'Low' if workload <= 5 else 'Moderate' if workload <= 10 else 'High'
+        return workload_status, min(workload / 15 * 100, 100)  # Assuming 15 is max capacity
 
 
 # Singleton instances
-symptom_analyzer = SymptomAnalyzer()
 doctor_allocator = DoctorAllocator()
+
+_symptom_analyzer = None
+_symptom_analyzer_lock = threading.Lock()
+
+
+def get_symptom_analyzer():
+    """Shared SymptomAnalyzer, built (heavy imports and fitting) on first call"""
+    global _symptom_analyzer
+    if _symptom_analyzer is None:
+        with _symptom_analyzer_lock:
+            if _symptom_analyzer is None:
+                from .symptom_analyzer import SymptomAnalyzer
+                _symptom_analyzer = SymptomAnalyzer()
+    return _symptom_analyzer
+
+
+def warm_up():
+    """Build the analyzer and run one analysis so the first patient request is fast"""
+    analyzer = get_symptom_analyzer()
+    analyzer.analyze_symptoms('headache and fever')
+    return analyzer
+
+
+def __getattr__(name):
+    # Keeps `from core.ai_utils import symptom_analyzer` working while building lazily
+    if name == 'symptom_analyzer':
+        return get_symptom_analyzer()
+    if name == 'SymptomAnalyzer':
+        from .symptom_analyzer import SymptomAnalyzer
+        return SymptomAnalyzer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
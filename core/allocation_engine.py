@@ -0,0 +1,213 @@
+"""
+Vectorized scoring engine for doctor allocation
+Scores every candidate doctor in one NumPy pass: a precomputed specialization
+affinity matrix replaces the per-doctor string normalization and related_map
+lookups, and top-k selection uses argpartition instead of sorting everyone.
+Batch requests are solved as one min-cost assignment over doctor capacity slots.
+Imported lazily through DoctorAllocator so core.ai_utils stays light.
+"""
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+def normalize_specialization(name):
+    return name.lower().replace(' ', '_')
+
+
+class DoctorFeatures:
+    """
+    Column arrays describing candidate doctors, one entry per doctor:
+    ids (Doctor pk), specialization, workload, available, rating and experience.
+    Specializations are stored factorized: specialization_names[specialization_index].
+    """
+
+    def __init__(self, ids, specializations, workloads, available, ratings, experience):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        names, index = np.unique(np.asarray(specializations, dtype=str), return_inverse=True)
+        self.specialization_names = [normalize_specialization(name) for name in names]
+        self.specialization_index = index.astype(np.intp)
+        self.workloads = np.asarray(workloads, dtype=np.int64)
+        self.available = np.asarray(available, dtype=bool)
+        self.ratings = np.asarray(ratings, dtype=np.float64)
+        self.experience = np.asarray(experience, dtype=np.int64)
+
+    @classmethod
+    def from_queryset(cls, doctors):
+        """
+        Load features with one values_list query; doctors must be annotated
+        with `workload` (see DoctorAllocator._with_workload)
+        """
+        rows = list(doctors.order_by('id').values_list(
+            'id', 'specialization', 'workload', 'is_available', 'rating', 'experience_years'
+        ))
+        if not rows:
+            return cls([], [], [], [], [], [])
+        return cls(*zip(*rows))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class AllocationEngine:
+    """
+    Scores doctors for a required specialization:
+        0.4 * specialization affinity + 0.4 * workload score + 0.2 * availability
+    """
+
+    # Affinity of a doctor's specialization to the required one
+    EXACT_MATCH = 1.0
+    RELATED_MATCH = 0.5
+    GENERAL_FALLBACK = 0.3
+    NO_MATCH = 0.1
+
+    # Specializations that can stand in for the key specialization
+    RELATED_SPECIALIZATIONS = {
+        'cardiology': ['general_medicine', 'internal_medicine'],
+        'neurology': ['general_medicine', 'internal_medicine'],
+        'gastroenterology': ['general_medicine', 'internal_medicine'],
+        'pulmonology': ['general_medicine', 'internal_medicine'],
+        'ent': ['general_medicine'],
+        'ophthalmology': ['general_medicine'],
+        'orthopedics': ['general_medicine', 'sports_medicine'],
+        'dermatology': ['general_medicine'],
+        'psychiatry': ['psychology', 'counseling'],
+    }
+
+    # Workload upper bounds and their scores: 0-5 -> 1.0, 6-10 -> 0.7, 11-15 -> 0.4, 16+ -> 0.2
+    WORKLOAD_BOUNDS = np.array([5, 10, 15])
+    WORKLOAD_SCORES = np.array([1.0, 0.7, 0.4, 0.2])
+
+    def __init__(self, specializations=()):
+        """
+        The vocabulary (ids and affinity matrix) is fixed here and never changes
+        afterwards, so one engine can be shared by concurrent requests.
+        Specializations outside it get the extra UNKNOWN id.
+        """
+        names = list(specializations) + list(self.RELATED_SPECIALIZATIONS) + [
+            name for related in self.RELATED_SPECIALIZATIONS.values() for name in related
+        ] + ['general_medicine']
+        self.specialization_ids = {
+            name: i for i, name in enumerate(dict.fromkeys(map(normalize_specialization, names)))
+        }
+        self.unknown_id = len(self.specialization_ids)
+
+        # affinity[required_id, doctor_id]
+        size = self.unknown_id + 1
+        affinity = np.full((size, size), self.NO_MATCH)
+        affinity[:, self.specialization_ids['general_medicine']] = self.GENERAL_FALLBACK
+        for required, related in self.RELATED_SPECIALIZATIONS.items():
+            for name in related:
+                affinity[self.specialization_ids[required], self.specialization_ids[name]] = self.RELATED_MATCH
+        np.fill_diagonal(affinity, self.EXACT_MATCH)
+        # Two unknown specializations only match when their names do (see affinity_rows)
+        affinity[self.unknown_id, self.unknown_id] = self.NO_MATCH
+        affinity.flags.writeable = False
+        self.affinity = affinity
+
+    def specialization_codes(self, features):
+        """Vocabulary id per doctor (unknown_id for specializations outside it)"""
+        ids = np.array([
+            self.specialization_ids.get(name, self.unknown_id) for name in features.specialization_names
+        ], dtype=np.intp)
+        return ids[features.specialization_index]
+
+    def affinity_rows(self, required_specializations, features):
+        """Affinity of every doctor (columns) to each required specialization (rows)"""
+        required = [normalize_specialization(name) for name in required_specializations]
+        required_ids = np.array([self.specialization_ids.get(name, self.unknown_id) for name in required], dtype=np.intp)
+        rows = self.affinity[np.ix_(required_ids, self.specialization_codes(features))]
+
+        # Unknown names still match doctors with the same name exactly
+        unknown = {name for name in required if name not in self.specialization_ids}
+        for name in unknown:
+            same = np.array([doctor == name for doctor in features.specialization_names], dtype=bool)
+            matches = same[features.specialization_index] if len(features) else np.zeros(0, dtype=bool)
+            rows[np.ix_([i for i, r in enumerate(required) if r == name], np.flatnonzero(matches))] = self.EXACT_MATCH
+        return rows
+
+    def workload_scores(self, workloads):
+        """Lower workload = higher score"""
+        return self.WORKLOAD_SCORES[np.searchsorted(self.WORKLOAD_BOUNDS, workloads, side='left')]
+
+    def score(self, features, required_specialization):
+        """Allocation score of every doctor for required_specialization"""
+        specialization_score = self.affinity_rows([required_specialization], features)[0]
+        return (
+            specialization_score * 0.4 +
+            self.workload_scores(features.workloads) * 0.4 +
+            features.available * 0.2
+        )
+
+    @staticmethod
+    def top_k(scores, k):
+        """
+        Positions of the k best scores, best first; equal scores keep their
+        original order (like a stable sort by descending score)
+        """
+        n = len(scores)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+
+        if k < n:
+            kth = np.partition(scores, n - k)[n - k]
+            above = np.flatnonzero(scores > kth)
+            ties = np.flatnonzero(scores == kth)[:k - len(above)]
+            candidates = np.concatenate([above, ties])
+        else:
+            candidates = np.arange(n)
+
+        return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+    def rank(self, features, required_specialization, k=3):
+        """
+        Best k doctors for required_specialization
+
+        Returns:
+            (positions, scores): positions into features and their scores, best first
+        """
+        scores = self.score(features, required_specialization)
+        positions = self.top_k(scores, k)
+        return positions, scores[positions]
+
+    def assign(self, features, required_specializations, day_loads, capacity):
+        """
+        Assign many requests to doctors at once, maximizing the total score
+
+        Each doctor offers capacity - day_load slots; its j-th new appointment
+        is scored with workload + j, so every assignment accounts for the load
+        the earlier ones added. Solved exactly with linear_sum_assignment.
+
+        Args:
+            features: DoctorFeatures of the candidates (workload over the window)
+            required_specializations: One specialization per request
+            day_loads: Appointments each doctor already has on the day
+            capacity: Maximum appointments per doctor per day
+
+        Returns:
+            (positions, scores): per request, position into features (-1 if
+            no slot was left) and its score
+        """
+        n_requests = len(required_specializations)
+        positions = np.full(n_requests, -1, dtype=np.intp)
+        scores = np.zeros(n_requests)
+
+        slots = np.clip(capacity - np.asarray(day_loads, dtype=np.int64), 0, n_requests)
+        if not n_requests or not slots.sum():
+            return positions, scores
+
+        # One column per free slot: (doctor, j-th new appointment of that doctor)
+        slot_doctor = np.repeat(np.arange(len(features)), slots)
+        slot_number = np.arange(len(slot_doctor)) - np.repeat(np.cumsum(slots) - slots, slots)
+
+        matrix = (
+            self.affinity_rows(required_specializations, features)[:, slot_doctor] * 0.4 +
+            self.workload_scores(features.workloads[slot_doctor] + slot_number) * 0.4 +
+            features.available[slot_doctor] * 0.2
+        )
+
+        rows, columns = linear_sum_assignment(matrix, maximize=True)
+        positions[rows] = slot_doctor[columns]
+        scores[rows] = matrix[rows, columns]
+        return positions, scores
@@ -0,0 +1,172 @@
+"""
+Result cache for symptom analyses
+Many patients type near-identical complaints, so analyses are cached by their
+preprocessed text. Keys include the symptom model fingerprint, so changing the
+knowledge base invalidates every earlier entry automatically.
+
+Backends:
+    'local'  - bounded in-process LRU with TTL (per worker)
+    'django' - Django's cache framework (CACHES), shared by all workers
+"""
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def age_bucket(age):
+    """Collapse an age into the groups that change recommendations"""
+    if not age:
+        return 'unknown'
+    if age < 18:
+        return 'minor'
+    if age > 65:
+        return 'senior'
+    return 'adult'
+
+
+class LocalResultCache:
+    """Thread-safe LRU cache with per-entry TTL, bounded to max_entries"""
+    
+    backend = 'local'
+    
+    def __init__(self, max_entries=10000, timeout=3600):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.timeout if self.timeout else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    @property
+    def size(self):
+        return len(self._entries)
+
+
+class DjangoResultCache:
+    """Stores entries in a Django cache alias so every worker shares them"""
+    
+    backend = 'django'
+    
+    def __init__(self, alias='default', timeout=3600, key_prefix='symptom-analysis'):
+        from django.core.cache import caches
+        
+        self.cache = caches[alias]
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+        self.hits = 0
+        self.misses = 0
+        # Eviction and expiry happen inside the cache backend and aren't observable here
+        self.evictions = None
+        self.expirations = None
+    
+    def get(self, key):
+        value = self.cache.get(f'{self.key_prefix}:{key}')
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+    
+    def set(self, key, value):
+        self.cache.set(f'{self.key_prefix}:{key}', value, self.timeout)
+    
+    def clear(self):
+        # Entries of an old model version simply stop being requested and expire
+        pass
+    
+    @property
+    def size(self):
+        return None
+
+
+class AnalysisCache:
+    """Front for a result cache backend: key building, invalidation and stats"""
+    
+    def __init__(self, backend):
+        self.backend = backend
+        self._version = None
+    
+    @classmethod
+    def from_settings(cls, config):
+        """
+        Build from the SYMPTOM_RESULT_CACHE setting, e.g.
+        {'BACKEND': 'local', 'MAX_ENTRIES': 10000, 'TIMEOUT': 3600}
+        {'BACKEND': 'django', 'CACHE_ALIAS': 'default', 'TIMEOUT': 3600}
+        Returns None (caching off) when config is empty.
+        """
+        if not config:
+            return None
+        
+        backend = config.get('BACKEND', 'local')
+        timeout = config.get('TIMEOUT', 3600)
+        if backend == 'local':
+            return cls(LocalResultCache(config.get('MAX_ENTRIES', 10000), timeout))
+        if backend == 'django':
+            return cls(DjangoResultCache(config.get('CACHE_ALIAS', 'default'), timeout))
+        raise ValueError(f"Unknown SYMPTOM_RESULT_CACHE backend: {backend!r}")
+    
+    def make_key(self, model_version, processed_text, age, severity):
+        """Stable key for one analysis; the model version scopes it to the current knowledge base"""
+        if model_version != self._version:
+            # The knowledge base changed: nothing cached for the old one can be reused
+            self.backend.clear()
+            self._version = model_version
+        
+        raw = '\x1f'.join([model_version, age_bucket(age), severity, processed_text])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    
+    def get(self, key):
+        value = self.backend.get(key)
+        return copy.deepcopy(value) if value is not None else None
+    
+    def set(self, key, value):
+        self.backend.set(key, copy.deepcopy(value))
+    
+    def stats(self):
+        """Hit ratio and eviction counters for monitoring"""
+        lookups = self.backend.hits + self.backend.misses
+        return {
+            'backend': self.backend.backend,
+            'hits': self.backend.hits,
+            'misses': self.backend.misses,
+            'hit_ratio': round(self.backend.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.backend.evictions,
+            'expirations': self.backend.expirations,
+            'size': self.backend.size,
+        }
@@ -0,0 +1,86 @@
+"""
+Dashboard counters
+Each dashboard's appointment counters come from one conditional-aggregation
+query (COUNT ... FILTER (WHERE status = ...) per counter, and for the admin
+totals COUNT subqueries on the per-specialization doctor query) instead of
+one .count() per counter, and are cached per doctor/patient in the shared cache's
+DASHBOARD namespace. core.signals drops the entries an Appointment, Doctor or
+Patient write affects once the transaction commits.
+"""
+
+from django.db.models import Count, F, Func, IntegerField, Q, Subquery
+
+from .shared_cache import DASHBOARD, get_shared_cache
+
+
+def doctor_dashboard_stats(doctor_id):
+    """total_consultations, pending_appointments and total_patients of a doctor"""
+    from appointments.models import Appointment
+
+    def compute():
+        return Appointment.objects.filter(doctor_id=doctor_id).aggregate(
+            total_consultations=Count('id', filter=Q(status='completed')),
+            pending_appointments=Count('id', filter=Q(status='pending')),
+            total_patients=Count('patient', distinct=True),
+        )
+
+    return get_shared_cache().get_or_set(DASHBOARD, ('doctor', doctor_id), compute)
+
+
+def patient_dashboard_stats(patient_id):
+    """total_appointments and upcoming_appointments (confirmed) of a patient"""
+    from appointments.models import Appointment
+
+    def compute():
+        return Appointment.objects.filter(patient_id=patient_id).aggregate(
+            total_appointments=Count('id'),
+            upcoming_appointments=Count('id', filter=Q(status='confirmed')),
+        )
+
+    return get_shared_cache().get_or_set(DASHBOARD, ('patient', patient_id), compute)
+
+
+def _row_count(queryset):
+    """queryset's row count as a scalar subquery (COUNT without GROUP BY)"""
+    return Subquery(
+        queryset.order_by().annotate(total=Func(F('pk'), function='COUNT', output_field=IntegerField())).values('total')
+    )
+
+
+def admin_dashboard_stats():
+    """Appointment, patient and doctor totals plus doctors per specialization"""
+    from accounts.models import Doctor, Patient
+    from appointments.models import Appointment
+
+    def compute():
+        # Doctors grouped by specialization, each row carrying the appointment and
+        # patient totals as subqueries, so everything comes from one query
+        rows = list(Doctor.objects.order_by().values('specialization').annotate(
+            count=Count('id'),
+            total_appointments=_row_count(Appointment.objects.all()),
+            pending_appointments=_row_count(Appointment.objects.filter(status='pending')),
+            total_patients=_row_count(Patient.objects.all()),
+        ))
+        if not rows:
+            # No doctors, so no appointments either
+            return {
+                'total_appointments': 0, 'pending_appointments': 0, 'total_patients': Patient.objects.count(),
+                'total_doctors': 0, 'department_stats': [],
+            }
+
+        totals = ('total_appointments', 'pending_appointments', 'total_patients')
+        return {
+            **{name: rows[0][name] for name in totals},
+            'total_doctors': sum(row['count'] for row in rows),
+            'department_stats': [{'specialization': row['specialization'], 'count': row['count']} for row in rows],
+        }
+
+    return get_shared_cache().get_or_set(DASHBOARD, ('admin',), compute)
+
+
+def invalidate_dashboard_stats(doctor_ids=(), patient_ids=()):
+    """Drop the cached counters of these doctors and patients, and the admin totals"""
+    entries = [('admin',)]
+    entries.extend(('doctor', doctor_id) for doctor_id in doctor_ids)
+    entries.extend(('patient', patient_id) for patient_id in patient_ids)
+    get_shared_cache().delete(DASHBOARD, *entries)
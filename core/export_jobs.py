@@ -0,0 +1,190 @@
+"""
+Background report generation
+Views enqueue an ExportJob row; `python manage.py run_export_worker` claims
+queued jobs one at a time (a conditional UPDATE, so several workers never take
+the same job), renders the report with core.exports and stores the file under
+EXPORT_ROOT named by its SHA-256; downloads are served from disk. Reports are
+deduplicated on their parameters (format, entity, dates), not their bytes,
+since Excel and PDF files embed their creation time: an identical request made
+within EXPORT_JOB_REUSE_SECONDS of a finished (or still pending) job gets that
+job back, and a worker picking up a job whose report was rendered that
+recently reuses the file. While rendering, the worker stamps heartbeat_at every
+EXPORT_JOB_HEARTBEAT_SECONDS, however slowly rows come in.
+"""
+
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .exports import ENTITIES, PDF_ENTITIES, WRITERS, count_rows, export_filename
+from .models import ExportJob
+
+
+def export_root():
+    return Path(getattr(settings, 'EXPORT_ROOT', settings.BASE_DIR / 'var' / 'exports'))
+
+
+def artifact_path(job):
+    return export_root() / job.artifact_name
+
+
+def enqueue_export(user, format, entity, start=None, end=None):
+    """
+    The job rendering this report: a recent or pending identical one, else a new queued job
+
+    Raises:
+        ValueError: unknown format or entity, or no layout for entity in format
+    """
+    if format not in WRITERS or entity not in ENTITIES:
+        raise ValueError(f'Unknown export: {format} {entity}')
+    if format == 'pdf' and entity not in PDF_ENTITIES:
+        raise ValueError(f'{entity.title()} reports are too large for PDF; export CSV or Excel instead')
+
+    existing = _same_report(format, entity, start, end).filter(status__in=('queued', 'running')).first()
+    if existing is None:
+        existing = recent_report(format, entity, start, end)
+    if existing is not None:
+        return existing
+
+    return ExportJob.objects.create(requested_by=user, format=format, entity=entity, start_date=start, end_date=end)
+
+
+def _same_report(format, entity, start, end):
+    return ExportJob.objects.filter(format=format, entity=entity, start_date=start, end_date=end)
+
+
+def recent_report(format, entity, start, end):
+    """The latest job that finished this report within EXPORT_JOB_REUSE_SECONDS and whose file is still there"""
+    reuse_after = timezone.now() - timedelta(seconds=getattr(settings, 'EXPORT_JOB_REUSE_SECONDS', 300))
+    job = _same_report(format, entity, start, end).filter(status='done', finished_at__gte=reuse_after).exclude(
+        content_hash=''
+    ).order_by('-finished_at').first()
+    if job is not None and artifact_path(job).exists():
+        return job
+    return None
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_next_job(worker):
+    """Mark the oldest queued job as running for worker and return it (None if the queue is empty)"""
+    for job_id in ExportJob.objects.filter(status='queued').order_by('created_at').values_list('id', flat=True)[:10]:
+        now = timezone.now()
+        claimed = ExportJob.objects.filter(id=job_id, status='queued').update(
+            status='running', worker=worker, started_at=now, heartbeat_at=now, rows_written=0, error=''
+        )
+        if claimed:
+            return ExportJob.objects.get(id=job_id)
+    return None
+
+
+def requeue_stale_jobs(stale_seconds):
+    """Put running jobs whose worker stopped reporting progress back in the queue"""
+    cutoff = timezone.now() - timedelta(seconds=stale_seconds)
+    return ExportJob.objects.filter(status='running', heartbeat_at__lt=cutoff).update(status='queued', worker='')
+
+
+def _heartbeat(job_id, interval, stop):
+    """Stamp the job's heartbeat_at every interval seconds until stop is set"""
+    try:
+        while not stop.wait(interval):
+            ExportJob.objects.filter(id=job_id, status='running').update(heartbeat_at=timezone.now())
+    finally:
+        connection.close()
+
+
+def run_job(job):
+    """Render job's report into EXPORT_ROOT (or reuse a recent identical one) and mark it done, or failed with the error"""
+    reused = recent_report(job.format, job.entity, job.start_date, job.end_date)
+    if reused is not None:
+        ExportJob.objects.filter(id=job.id).update(
+            status='done',
+            content_hash=reused.content_hash,
+            size=reused.size,
+            filename=reused.filename,
+            total_rows=reused.total_rows,
+            rows_written=reused.rows_written,
+            finished_at=timezone.now(),
+        )
+        job.refresh_from_db()
+        return job
+
+    root = export_root()
+    root.mkdir(parents=True, exist_ok=True)
+
+    def progress(rows_written):
+        ExportJob.objects.filter(id=job.id).update(rows_written=rows_written, heartbeat_at=timezone.now())
+
+    # Chunks can take longer than the stale cutoff (a slow query, a PDF page), so
+    # liveness comes from a clock rather than from progress
+    stop_heartbeat = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat,
+        args=(job.id, getattr(settings, 'EXPORT_JOB_HEARTBEAT_SECONDS', 30), stop_heartbeat),
+        name=f'export-job-{job.id}-heartbeat',
+        daemon=True,
+    )
+    heartbeat.start()
+    try:
+        ExportJob.objects.filter(id=job.id).update(total_rows=count_rows(job.entity, job.start_date, job.end_date))
+
+        with tempfile.NamedTemporaryFile(dir=root, suffix='.part', delete=False) as part:
+            try:
+                WRITERS[job.format](job.entity, job.start_date, job.end_date, part, progress)
+                part.flush()
+                part.seek(0)
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: part.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            except BaseException:
+                os.unlink(part.name)
+                raise
+
+        job.content_hash = digest.hexdigest()
+        path = artifact_path(job)
+        os.replace(part.name, path)
+    except Exception as e:
+        ExportJob.objects.filter(id=job.id).update(status='failed', error=f'{type(e).__name__}: {e}', finished_at=timezone.now())
+        raise
+    finally:
+        stop_heartbeat.set()
+        heartbeat.join()
+
+    ExportJob.objects.filter(id=job.id).update(
+        status='done',
+        content_hash=job.content_hash,
+        size=path.stat().st_size,
+        filename=export_filename(job.entity, job.start_date, job.end_date, job.format),
+        rows_written=F('total_rows'),
+        finished_at=timezone.now(),
+    )
+    job.refresh_from_db()
+    return job
+
+
+def purge_jobs(days):
+    """Delete jobs finished more than days ago, and artifacts no remaining job uses"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = ExportJob.objects.filter(status__in=('done', 'failed'), finished_at__lt=cutoff).delete()
+
+    kept = {f'{content_hash}.{format}' for content_hash, format in ExportJob.objects.exclude(
+        content_hash=''
+    ).values_list('content_hash', 'format')}
+    root = export_root()
+    if root.is_dir():
+        for path in root.iterdir():
+            # Leftover .part files belong to jobs that will be requeued and rewritten
+            if path.name not in kept and (path.suffix != '.part' or path.stat().st_mtime < cutoff.timestamp()):
+                path.unlink()
+    return deleted
@@ -0,0 +1,349 @@
+"""
+Streaming report exports
+Rows come from .values_list(...).iterator(), so the database hands them over
+EXPORT_CHUNK_SIZE at a time (a server-side cursor on PostgreSQL) and a CSV
+response sends each chunk as soon as it is read. Memory stays constant however
+many appointments are exported, and the first bytes leave immediately.
+
+Excel exports use openpyxl's write-only workbook: rows are serialized to disk
+as they are appended, and formatting comes from a few named styles registered
+once per workbook instead of style objects per cell.
+"""
+
+import codecs
+import csv
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def _full_name(first_name, last_name):
+    # Same as User.get_full_name()
+    return f'{first_name} {last_name}'.strip()
+
+
+def _appointments(start, end):
+    from appointments.models import Appointment
+
+    appointments = Appointment.objects.all()
+    if start:
+        appointments = appointments.filter(appointment_date__gte=start)
+    if end:
+        appointments = appointments.filter(appointment_date__lte=end)
+    return appointments
+
+
+def _prescriptions(start, end):
+    from appointments.models import Prescription
+
+    prescriptions = Prescription.objects.all()
+    if start:
+        prescriptions = prescriptions.filter(created_at__date__gte=start)
+    if end:
+        prescriptions = prescriptions.filter(created_at__date__lte=end)
+    return prescriptions
+
+
+def _active_doctors():
+    from accounts.models import Doctor
+    return Doctor.objects.filter(user__is_active=True)
+
+
+def appointment_rows(start=None, end=None):
+    from accounts.models import Doctor
+
+    yield [
+        'Appointment ID', 'Date', 'Time', 'Status', 'Token', 'Patient ID', 'Patient Name',
+        'Doctor ID', 'Doctor Name', 'Specialization', 'Created At',
+    ]
+
+    specializations = dict(Doctor.SPECIALIZATION_CHOICES)
+    rows = _appointments(start, end).order_by('appointment_date', 'appointment_time', 'id').values_list(
+        'appointment_id', 'appointment_date', 'appointment_time', 'status', 'token_number',
+        'patient__patient_id', 'patient__user__first_name', 'patient__user__last_name',
+        'doctor__doctor_id', 'doctor__user__first_name', 'doctor__user__last_name', 'doctor__specialization',
+        'created_at',
+    ).iterator(chunk_size=_chunk_size())
+    for (appointment_id, day, moment, status, token, patient_id, patient_first, patient_last,
+         doctor_id, doctor_first, doctor_last, specialization, created_at) in rows:
+        yield [
+            appointment_id, day, moment, status, token, patient_id, _full_name(patient_first, patient_last),
+            doctor_id, _full_name(doctor_first, doctor_last), specializations.get(specialization, specialization),
+            created_at,
+        ]
+
+
+def prescription_rows(start=None, end=None):
+    yield [
+        'Prescription ID', 'Appointment ID', 'Patient ID', 'Patient Name', 'Doctor Name',
+        'Diagnosis', 'Medications', 'Tests Recommended', 'Follow Up', 'Created At',
+    ]
+
+    rows = _prescriptions(start, end).order_by('created_at', 'id').values_list(
+        'prescription_id', 'appointment__appointment_id', 'patient__patient_id',
+        'patient__user__first_name', 'patient__user__last_name', 'doctor__user__first_name', 'doctor__user__last_name',
+        'diagnosis', 'medications', 'tests_recommended', 'follow_up_date', 'created_at',
+    ).iterator(chunk_size=_chunk_size())
+    for (prescription_id, appointment_id, patient_id, patient_first, patient_last, doctor_first, doctor_last,
+         diagnosis, medications, tests, follow_up, created_at) in rows:
+        yield [
+            prescription_id, appointment_id, patient_id, _full_name(patient_first, patient_last),
+            _full_name(doctor_first, doctor_last), diagnosis, medications, tests, follow_up, created_at,
+        ]
+
+
+def workload_rows(start=None, end=None):
+    """Per active doctor: appointments between start and end (default: the coming week)"""
+    from core.ai_utils import doctor_allocator
+
+    yield ['Doctor Name', 'Specialization', 'Upcoming Appointments', 'Workload Status', 'Utilization Rate']
+
+    start = start or timezone.localdate()
+    end = end or start + timedelta(days=7)
+    # Status and utilization are rated per week
+    weeks = max((end - start).days, 7) / 7
+
+    doctors = doctor_allocator._with_workload(_active_doctors(), start, end)
+    for doctor in doctors.order_by('id').iterator(chunk_size=_chunk_size()):
+        workload_status, utilization_rate = doctor_allocator.describe_workload(doctor.workload / weeks)
+        yield [
+            doctor.user.get_full_name(),
+            doctor.get_specialization_display(),
+            doctor.workload,
+            workload_status,
+            f"{utilization_rate:.1f}%",
+        ]
+
+
+EXPORTERS = {
+    'appointments': appointment_rows,
+    'prescriptions': prescription_rows,
+    'workload': workload_rows,
+}
+ENTITIES = tuple(EXPORTERS)
+
+# A PDF table is laid out in memory; only the per-doctor report is small enough
+PDF_ENTITIES = ('workload',)
+
+# Reports small enough to render inside a request; the views queue the rest as
+# ExportJobs, except CSV reports of up to EXPORT_STREAM_MAX_ROWS rows, which stream
+SYNC_ENTITIES = ('workload',)
+
+# Excel column widths, and the column colour-coded by workload status
+COLUMN_WIDTHS = {
+    'appointments': [14, 12, 10, 12, 8, 12, 25, 12, 25, 18, 22],
+    'prescriptions': [14, 14, 12, 25, 25, 40, 40, 30, 12, 22],
+    'workload': [25, 15, 20, 15, 15],
+}
+STATUS_COLUMNS = {'workload': 3}
+STATUS_STYLES = {'Low': 'status_low', 'Moderate': 'status_moderate', 'High': 'status_high'}
+
+
+def export_rows(entity, start=None, end=None):
+    """Header row, then one row per record of entity, read lazily in chunks"""
+    return EXPORTERS[entity](start, end)
+
+
+def count_rows(entity, start=None, end=None):
+    """Number of data rows export_rows() will produce (one COUNT query)"""
+    if entity == 'appointments':
+        return _appointments(start, end).count()
+    if entity == 'prescriptions':
+        return _prescriptions(start, end).count()
+    return _active_doctors().count()
+
+
+def renders_in_request(format, entity, start=None, end=None):
+    """Whether a view should render this report itself rather than queue it (at most one COUNT query)"""
+    if entity in SYNC_ENTITIES:
+        return True
+    return format == 'csv' and count_rows(entity, start, end) <= getattr(settings, 'EXPORT_STREAM_MAX_ROWS', 50000)
+
+
+def _reporting(rows, progress):
+    """rows, calling progress(data rows so far) every EXPORT_CHUNK_SIZE rows and at the end"""
+    if progress is None:
+        yield from rows
+        return
+
+    chunk_size = _chunk_size()
+    written = -1  # the header row
+    for row in rows:
+        yield row
+        written += 1
+        if written and written % chunk_size == 0:
+            progress(written)
+    progress(max(written, 0))
+
+
+def parse_export_params(params):
+    """
+    (entity, start, end) from GET parameters entity, start and end (YYYY-MM-DD, optional)
+
+    Raises:
+        ValueError: unknown entity, malformed date or start after end
+    """
+    entity = params.get('entity') or 'workload'
+    if entity not in ENTITIES:
+        raise ValueError(f'Unknown export: {entity}')
+
+    bounds = []
+    for name in ('start', 'end'):
+        value = params.get(name)
+        try:
+            bounds.append(date.fromisoformat(value) if value else None)
+        except ValueError:
+            raise ValueError(f'Invalid {name} date: {value}') from None
+
+    start, end = bounds
+    if start and end and start > end:
+        raise ValueError('The start date is after the end date')
+    return entity, start, end
+
+
+def export_filename(entity, start, end, extension):
+    span = f"_{start or 'all'}_{end or 'all'}" if start or end else ''
+    return f'{entity}{span}_{timezone.localtime().strftime("%Y%m%d_%H%M%S")}.{extension}'
+
+
+class Echo:
+    """Pseudo-buffer whose write() returns the line, so csv.writer output can be yielded"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """CSV lines of rows, one at a time (for StreamingHttpResponse)"""
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_csv(entity, start, end, file, progress=None):
+    """Write entity's rows to a binary file as UTF-8 CSV"""
+    writer = csv.writer(codecs.getwriter('utf-8')(file))
+    writer.writerows(_reporting(export_rows(entity, start, end), progress))
+
+
+def _named_styles():
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    center = Alignment(horizontal='center', vertical='center')
+
+    def style(name, fill=None, **font):
+        named = NamedStyle(name=name, border=border, alignment=center, font=Font(**font))
+        if fill:
+            named.fill = PatternFill(start_color=fill, end_color=fill, fill_type='solid')
+        return named
+
+    return [
+        style('header', '366092', bold=True, color='FFFFFF'),
+        style('cell'),
+        style('status_low', 'D4EDDA'),
+        style('status_moderate', 'FFF3CD'),
+        style('status_high', 'F8D7DA'),
+    ]
+
+
+def _excel_value(value):
+    # Excel has no time zones: write aware datetimes in local time
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+def write_xlsx(entity, start, end, file, progress=None):
+    """Write entity's rows to file as a single-sheet workbook, streaming rows to disk"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    for named_style in _named_styles():
+        workbook.add_named_style(named_style)
+
+    sheet = workbook.create_sheet(entity.title())
+    for column, width in enumerate(COLUMN_WIDTHS[entity], 1):
+        sheet.column_dimensions[get_column_letter(column)].width = width
+
+    def styled(value, style):
+        cell = WriteOnlyCell(sheet, value=_excel_value(value))
+        cell.style = style
+        return cell
+
+    rows = _reporting(export_rows(entity, start, end), progress)
+    sheet.append([styled(value, 'header') for value in next(rows)])
+
+    status_column = STATUS_COLUMNS.get(entity)
+    if status_column is None:
+        # Large reports: plain values, no per-cell style
+        for row in rows:
+            sheet.append([_excel_value(value) for value in row])
+    else:
+        for row in rows:
+            cells = [styled(value, 'cell') for value in row]
+            cells[status_column].style = STATUS_STYLES.get(row[status_column], 'cell')
+            sheet.append(cells)
+
+    workbook.save(file)
+
+
+def write_pdf(entity, start, end, file, progress=None):
+    """Write the workload report to file as a PDF table"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+    if entity not in PDF_ENTITIES:
+        raise ValueError(f'No PDF layout for {entity}')
+
+    doc = SimpleDocTemplate(file, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    styles = getSampleStyleSheet()
+    title_style = styles['Heading1']
+    title_style.alignment = 1  # Center alignment
+    elements = [
+        Paragraph("Analytics & Reports", title_style),
+        Paragraph(f"Generated on {timezone.localtime().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']),
+        Paragraph("<br/><br/>", styles['Normal']),
+    ]
+
+    rows = _reporting(export_rows(entity, start, end), progress)
+    next(rows)
+    table_data = [['Doctor Name', 'Specialization', 'Appointments', 'Status', 'Utilization']]
+    table_data.extend([str(value) for value in row] for row in rows)
+
+    style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#366092')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#F8F9FA')),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#DEE2E6')),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ])
+    status_colors = {'Low': '#D4EDDA', 'Moderate': '#FFF3CD', 'High': '#F8D7DA'}
+    for i, row in enumerate(table_data[1:], 1):
+        style.add('BACKGROUND', (3, i), (3, i), colors.HexColor(status_colors.get(row[3], '#F8D7DA')))
+
+    table = Table(table_data, repeatRows=1)
+    table.setStyle(style)
+    elements.append(table)
+    doc.build(elements)
+
+
+WRITERS = {
+    'csv': write_csv,
+    'xlsx': write_xlsx,
+    'pdf': write_pdf,
+}
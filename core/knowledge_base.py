@@ -0,0 +1,61 @@
+"""
+Symptom knowledge base loaded from a versioned data file
+The specialization -> symptom phrases map and the urgency keyword lists live in
+SYMPTOM_KNOWLEDGE_BASE (JSON), so vocabulary changes ship without a deploy:
+
+    {
+      "version": "2",
+      "specializations": {"cardiology": ["chest pain", ...], ...},
+      "urgency_keywords": {"high": ["severe", ...], "moderate": [...]}
+    }
+
+Urgency levels are listed in priority order (highest first).
+"""
+
+import json
+import os
+from collections import namedtuple
+
+KnowledgeBase = namedtuple('KnowledgeBase', [
+    'version',
+    'symptom_specialization_map',
+    'urgency_keywords',
+    'source_mtime',
+])
+
+
+def knowledge_base_mtime(path):
+    """Modification time of the knowledge base file, or None if it is missing"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_knowledge_base(path):
+    """
+    Read and validate a knowledge base file
+
+    Raises:
+        ValueError: if the file is missing, not JSON or not shaped as above
+    """
+    mtime = knowledge_base_mtime(path)
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"Cannot read symptom knowledge base {path}: {e}") from e
+
+    if not isinstance(data, dict) or 'version' not in data:
+        raise ValueError(f"Symptom knowledge base {path} has no version")
+
+    specializations = data.get('specializations')
+    urgency_keywords = data.get('urgency_keywords', {})
+    for name, section in (('specializations', specializations), ('urgency_keywords', urgency_keywords)):
+        if not isinstance(section, dict) or not all(
+            isinstance(phrases, list) and all(isinstance(phrase, str) for phrase in phrases)
+            for phrases in section.values()
+        ):
+            raise ValueError(f"Symptom knowledge base {path}: '{name}' must map names to lists of strings")
+
+    return KnowledgeBase(str(data['version']), specializations, urgency_keywords, mtime)
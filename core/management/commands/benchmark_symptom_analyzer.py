@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the symptom analyzer on labeled synthetic complaints (latency, throughput, '
+        'peak memory, top-1/top-3 accuracy) and fail on regressions against a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cases', type=int, default=3000, help='Synthetic complaints to generate (default: 3000)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--dataset', help='Labeled JSON/JSON Lines file (text, age, specialization) instead of synthetic cases')
+        parser.add_argument('--batch-size', type=int, default=256)
+        parser.add_argument('--repeat', type=int, default=5, help='Timed passes; each call/batch keeps its fastest time')
+        parser.add_argument('--with-result-cache', action='store_true', help='Keep SYMPTOM_RESULT_CACHE on while timing')
+        parser.add_argument('--output', help='Write the results JSON here (default: stdout)')
+        parser.add_argument('--baseline', help='Results JSON of an earlier run to compare against')
+        parser.add_argument('--save-baseline', action='store_true', help='Write the results to --baseline instead of comparing')
+        parser.add_argument('--accuracy-only', action='store_true',
+                            help='Compare accuracy only (performance baselines are machine-specific)')
+        parser.add_argument('--max-accuracy-drop', type=float, default=0.005,
+                            help='Allowed absolute drop in top-1/top-3 accuracy (default: 0.005)')
+        parser.add_argument('--max-slowdown', type=float, default=0.5,
+                            help='Allowed relative worsening of latency, throughput and memory (default: 0.5)')
+
+    def handle(self, *args, **options):
+        from core.symptom_analyzer import SymptomAnalyzer
+        from core.symptom_benchmark import compare_to_baseline, generate_dataset, load_dataset, run_benchmark
+
+        if options['dataset']:
+            cases = load_dataset(options['dataset'])
+        else:
+            cases = generate_dataset(options['cases'], options['seed'])
+        if not cases:
+            raise CommandError('The benchmark dataset is empty')
+
+        def analyzer_factory():
+            # Build in memory so the numbers don't depend on a stale artifact on disk
+            analyzer = SymptomAnalyzer(model_dir='')
+            if not options['with_result_cache']:
+                analyzer.result_cache = None
+            return analyzer
+
+        results = run_benchmark(analyzer_factory, cases, options['batch_size'], options['repeat'])
+        results['meta']['dataset'] = options['dataset'] or f"synthetic:{options['cases']}:seed={options['seed']}"
+        output = json.dumps(results, indent=2)
+
+        if options['output']:
+            Path(options['output']).write_text(output + '\n')
+            self.stderr.write(f"Results written to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+        self.stderr.write(
+            f"top-1 {results['accuracy']['top1']:.2%}  top-3 {results['accuracy']['top3']:.2%}  "
+            f"per call p50/p95/p99 {results['per_call']['p50_ms']}/{results['per_call']['p95_ms']}/"
+            f"{results['per_call']['p99_ms']} ms  batch {results['per_batch']['throughput_per_s']:.0f} texts/s"
+        )
+
+        baseline_path = options['baseline']
+        if not baseline_path:
+            return
+
+        if options['save_baseline']:
+            Path(baseline_path).write_text(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Baseline saved to {baseline_path}'))
+            return
+
+        try:
+            baseline = json.loads(Path(baseline_path).read_text())
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read baseline {baseline_path}: {e}')
+
+        if baseline.get('meta', {}).get('dataset') != results['meta']['dataset']:
+            raise CommandError(
+                f"Baseline {baseline_path} was measured on {baseline.get('meta', {}).get('dataset')!r}, "
+                f"not {results['meta']['dataset']!r}"
+            )
+
+        regressions = compare_to_baseline(
+            results,
+            baseline,
+            max_accuracy_drop=options['max_accuracy_drop'],
+            max_slowdown=options['max_slowdown'],
+            check_performance=not options['accuracy_only'],
+        )
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(self.style.ERROR(f'  {regression}'))
+            raise CommandError(f'{len(regressions)} regression(s) against {baseline_path}')
+
+        self.stderr.write(self.style.SUCCESS(f'No regressions against {baseline_path}'))
@@ -0,0 +1,31 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Build the symptom analyzer model artifact that gunicorn workers memory-map at startup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=str(settings.SYMPTOM_MODEL_DIR),
+            help='Artifact directory (default: SYMPTOM_MODEL_DIR)'
+        )
+
+    def handle(self, *args, **options):
+        from core.symptom_analyzer import SymptomAnalyzer
+
+        output = Path(options['output'])
+
+        # Build in memory (ignoring any existing artifact), then write it out
+        analyzer = SymptomAnalyzer(model_dir='')
+        version = analyzer.index.save(output)
+
+        size = sum(path.stat().st_size for path in version.iterdir() if path.is_file())
+        rows, terms = analyzer.index.matrix.shape
+        self.stdout.write(self.style.SUCCESS(
+            f'Built symptom model in {version}: {rows} phrases x {terms} terms, '
+            f'{size / 1024:.1f} KiB, fingerprint {analyzer.index.fingerprint[:12]}'
+        ))
@@ -0,0 +1,81 @@
+import csv
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.models import Appointment
+
+REQUIRED_COLUMNS = ('patient_id', 'specialization')
+
+
+class Command(BaseCommand):
+    help = (
+        'Assign many patients to doctors at once (vaccination drives, camp days) from a CSV '
+        'with patient_id, specialization and optional date (YYYY-MM-DD) columns'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--capacity', type=int, help='Maximum appointments per doctor per day')
+        parser.add_argument(
+            '--status', default='confirmed', choices=[status for status, _ in Appointment.STATUS_CHOICES],
+            help='Status of the created appointments (default: confirmed)'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Solve and report without creating appointments')
+
+    def handle(self, *args, **options):
+        from accounts.models import Patient
+        from core.ai_utils import doctor_allocator
+
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                columns = set(reader.fieldnames or ())
+                rows = list(reader)
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['csv_file']}: {e}")
+
+        missing_columns = [column for column in REQUIRED_COLUMNS if column not in columns]
+        if missing_columns:
+            raise CommandError(f"{options['csv_file']} has no {', '.join(missing_columns)} column(s)")
+
+        patients = Patient.objects.in_bulk([row['patient_id'] for row in rows], field_name='patient_id')
+        missing = sorted({row['patient_id'] for row in rows} - patients.keys())
+        if missing:
+            raise CommandError(f"Unknown patient IDs: {', '.join(missing)}")
+
+        try:
+            requests = [
+                (
+                    patients[row['patient_id']],
+                    row['specialization'],
+                    datetime.strptime(row['date'], '%Y-%m-%d').date() if row.get('date') else None
+                )
+                for row in rows
+            ]
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        result = doctor_allocator.allocate_batch(
+            requests,
+            capacity=options['capacity'],
+            status=options['status'],
+            create=not options['dry_run']
+        )
+
+        for day in result['days']:
+            self.stdout.write(
+                f"{day['date']}: {day['assigned']}/{day['requests']} assigned, workload spread "
+                f"{json.dumps(day['workload_before'])} -> {json.dumps(day['workload_after'])}"
+            )
+        for request in result['unassigned']:
+            self.stdout.write(self.style.WARNING(
+                f"  No free slot for {request['patient'].patient_id} ({request['specialization']}) on {request['date']}"
+            ))
+
+        action = 'Planned' if options['dry_run'] else 'Booked'
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {len(result['assignments'])} appointment(s), {len(result['unassigned'])} unassigned; "
+            f"solved in {result['solve_ms']} ms with {result['queries']} queries"
+        ))
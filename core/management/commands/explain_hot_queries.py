@@ -0,0 +1,139 @@
+import re
+from datetime import time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+# Plan lines that read a whole table, per database vendor
+SEQUENTIAL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)(?!\w| USING)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+# Plan lines that walk a whole index (fine with a LIMIT, linear in table size without)
+FULL_INDEX_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+) USING (?:COVERING )?INDEX (\w+)'),
+}
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    'postgresql': re.compile(r'\bSort\b'),
+}
+
+
+def hot_queries(doctor_id, patient_id, user_id, today):
+    """(name, queryset) of the queries behind dashboards, allocation and slot lookups"""
+    from appointments.models import Appointment, DoctorWorkload, Notification, TokenCounter
+    from appointments.pagination import PAGE_SIZE
+
+    def paginate_query(queryset):
+        # A deep keyset page, as built by appointments.pagination.paginate_appointments
+        return queryset.filter(
+            Q(appointment_date__lte=today) &
+            (Q(appointment_date__lt=today) | Q(appointment_time__lt=time(12)) | Q(appointment_time=time(12), id__lt=1))
+        ).order_by('-appointment_date', '-appointment_time', '-id')[:PAGE_SIZE + 1]
+
+    week = (today, today + timedelta(days=7))
+    return [
+        ('patient dashboard: recent appointments',
+         Appointment.objects.filter(patient_id=patient_id).order_by('-appointment_date')[:5]),
+        ('patient dashboard: unread notifications',
+         Notification.objects.filter(user_id=user_id, is_read=False)[:5]),
+        ('patient dashboard: confirmed count',
+         Appointment.objects.filter(patient_id=patient_id, status='confirmed').order_by().values('pk')),
+        ('medical history: completed appointments',
+         Appointment.objects.filter(patient_id=patient_id, status='completed')),
+        ('doctor dashboard: confirmed appointments',
+         Appointment.objects.filter(doctor_id=doctor_id, status='confirmed')[:10]),
+        ('doctor dashboard: pending count',
+         Appointment.objects.filter(doctor_id=doctor_id, status='pending').order_by().values('pk')),
+        ('doctor dashboard: distinct patients',
+         Appointment.objects.filter(doctor_id=doctor_id).order_by().values('patient').distinct()),
+        ('manage appointments: doctor schedule',
+         Appointment.objects.filter(doctor_id=doctor_id).order_by('-appointment_date', '-appointment_time')),
+        ('listings: admin page',
+         paginate_query(Appointment.objects.all())),
+        ('listings: doctor page',
+         paginate_query(Appointment.objects.filter(doctor_id=doctor_id))),
+        ('admin dashboard: pending count',
+         Appointment.objects.filter(status='pending').order_by().values('pk')),
+        ('admin dashboard: recent appointments',
+         Appointment.objects.order_by('-created_at')[:10]),
+        ('allocator: workload snapshot',
+         DoctorWorkload.objects.filter(date__range=week).values('doctor_id').annotate(total=Sum('appointment_count'))),
+        ('allocator: doctor workload',
+         DoctorWorkload.objects.filter(doctor_id=doctor_id, date__range=week).values('appointment_count')),
+        ('booking: doctor day appointments',
+         Appointment.objects.filter(doctor_id=doctor_id, appointment_date=today, status__in=['pending', 'confirmed'])),
+        ('booking: token counter',
+         TokenCounter.objects.filter(doctor_id=doctor_id, date=today)),
+        ('slot index: upcoming appointments',
+         Appointment.objects.filter(appointment_date__gte=today).exclude(status='cancelled').order_by().values_list(
+             'id', 'doctor_id', 'appointment_date', 'appointment_time', 'status')),
+        ('slot index: changed appointments',
+         Appointment.objects.filter(updated_at__gte=timezone.now() - timedelta(seconds=5)).order_by('updated_at')),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the dashboard, allocator and slot lookup queries and flag sequential scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctor', type=int, help='Doctor id to plan with (default: the first doctor)')
+        parser.add_argument('--patient', type=int, help='Patient id to plan with (default: the first patient)')
+        parser.add_argument('--analyze', action='store_true', help='Run the queries and show actual timings (PostgreSQL)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not only flagged ones')
+        parser.add_argument('--fail-on-seq-scan', action='store_true', help='Exit with an error if any query scans a table')
+
+    def handle(self, *args, **options):
+        from accounts.models import Doctor, Patient
+
+        doctor_id = options['doctor'] or Doctor.objects.order_by('id').values_list('id', flat=True).first()
+        patient = Patient.objects.filter(
+            **({'id': options['patient']} if options['patient'] else {})
+        ).order_by('id').values_list('id', 'user_id').first()
+        if doctor_id is None or patient is None:
+            raise CommandError('Need at least one doctor and one patient to plan queries with')
+
+        vendor = connection.vendor
+        scan_pattern = SEQUENTIAL_SCAN_PATTERNS.get(vendor)
+        index_scan_pattern = FULL_INDEX_SCAN_PATTERNS.get(vendor)
+        sort_pattern = SORT_PATTERNS.get(vendor)
+        if scan_pattern is None:
+            self.stdout.write(self.style.WARNING(f'Scan detection is not supported on {vendor}; printing plans only'))
+
+        explain_options = {'analyze': True} if options['analyze'] and vendor == 'postgresql' else {}
+
+        queries = hot_queries(doctor_id, patient[0], patient[1], timezone.localdate())
+        flagged = []
+        for name, queryset in queries:
+            plan = queryset.explain(**explain_options)
+            scans = sorted(set(scan_pattern.findall(plan))) if scan_pattern else []
+            index_scans = [] if queryset.query.high_mark else sorted(
+                set(index_scan_pattern.findall(plan)) if index_scan_pattern else []
+            )
+            sorts = bool(sort_pattern and sort_pattern.search(plan))
+
+            if scans:
+                flagged.append(name)
+                self.stdout.write(self.style.ERROR(f"SEQ SCAN  {name}: {', '.join(scans)}"))
+            elif index_scans:
+                self.stdout.write(self.style.WARNING(
+                    f"FULL IDX  {name}: {', '.join(f'{table} ({index})' for table, index in index_scans)}"
+                ))
+            elif sorts:
+                self.stdout.write(self.style.WARNING(f'SORT      {name}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'OK        {name}'))
+
+            if scans or options['verbose_plans']:
+                self.stdout.write('\n'.join(f'    {line}' for line in plan.splitlines()))
+
+        self.stdout.write(f'\n{len(flagged)} of {len(queries)} queries scan a table')
+        if flagged:
+            self.stdout.write(
+                'Planners prefer sequential scans on small or unanalyzed tables; '
+                'confirm against production-sized data (run ANALYZE first).'
+            )
+            if options['fail_on_seq_scan']:
+                raise CommandError(f"Sequential scans in: {', '.join(flagged)}")
@@ -0,0 +1,60 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+class Command(BaseCommand):
+    help = 'Render queued report exports (CSV, Excel, PDF) in the background; run alongside the web workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--poll-seconds', type=float, default=2.0, help='Wait between empty queue checks (default: 2)')
+        parser.add_argument(
+            '--stale-seconds', type=int, default=getattr(settings, 'EXPORT_JOB_STALE_SECONDS', 300),
+            help='Requeue running jobs without progress for this long (their worker died)'
+        )
+        parser.add_argument(
+            '--keep-days', type=int, default=getattr(settings, 'EXPORT_JOB_KEEP_DAYS', 7),
+            help='Delete finished jobs and their files after this many days'
+        )
+
+    def handle(self, *args, **options):
+        from core.export_jobs import claim_next_job, purge_jobs, requeue_stale_jobs, run_job, worker_name
+
+        worker = worker_name()
+        self.stdout.write(f'Export worker {worker} started')
+        purged_at = 0
+
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() - purged_at > 3600:
+                    purged = purge_jobs(options['keep_days'])
+                    if purged:
+                        self.stdout.write(f'Purged {purged} old export jobs')
+                    purged_at = time.monotonic()
+
+                requeued = requeue_stale_jobs(options['stale_seconds'])
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'Requeued {requeued} stalled export jobs'))
+
+                job = claim_next_job(worker)
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_seconds'])
+                    continue
+
+                started = time.perf_counter()
+                try:
+                    job = run_job(job)
+                except Exception as e:
+                    self.stderr.write(self.style.ERROR(f'{job} failed: {type(e).__name__}: {e}'))
+                    continue
+                self.stdout.write(self.style.SUCCESS(
+                    f'{job}: {job.rows_written} rows, {job.size} bytes in {time.perf_counter() - started:.1f}s'
+                ))
+        except KeyboardInterrupt:
+            self.stdout.write('Export worker stopped')
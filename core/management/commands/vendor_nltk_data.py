@@ -0,0 +1,17 @@
+import nltk
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Download the NLTK data the symptom analyzer needs into NLTK_DATA_DIR (needs network access)'
+
+    packages = ['stopwords']
+
+    def handle(self, *args, **options):
+        data_dir = str(settings.NLTK_DATA_DIR)
+
+        for package in self.packages:
+            if not nltk.download(package, download_dir=data_dir, quiet=True):
+                raise CommandError(f'Could not download NLTK package "{package}"')
+            self.stdout.write(self.style.SUCCESS(f'Vendored {package} into {data_dir}'))
@@ -0,0 +1,78 @@
+"""
+Per-request query budgets
+QueryCountMiddleware counts the queries each view runs, compares the count with
+the budget declared for the view in settings.QUERY_COUNT['BUDGETS'] and flags
+query shapes repeated once per row (N+1). Problems are logged; in development
+the counts are also reported as X-Query-* response headers, and tests turn
+budget overruns into errors with QUERY_COUNT['RAISE']. In production only
+budgeted views are counted.
+"""
+
+import logging
+
+from django.conf import settings
+
+from .query_count import QueryCounter
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'HEADERS': False,
+    'RAISE': False,
+    'REPEAT_LIMIT': 3,
+    'BUDGETS': {},
+}
+
+
+class QueryBudgetExceeded(Exception):
+    """A view ran more queries than its budget, or repeated a query shape per row"""
+
+
+class QueryCountMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Read per request so tests can override_settings
+        config = {**DEFAULTS, **getattr(settings, 'QUERY_COUNT', {})}
+        budget = config['BUDGETS'].get(request.resolver_match.view_name)
+        # Unbudgeted views run unwrapped unless a developer or test is looking
+        if budget is not None or settings.DEBUG or config['HEADERS'] or config['RAISE']:
+            request._query_count = config, budget, QueryCounter().__enter__()
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            counted = getattr(request, '_query_count', None)
+            if counted is not None:
+                counted[2].__exit__(None, None, None)
+
+        if counted is None:
+            return response
+        config, budget, queries = counted
+        view_name = request.resolver_match.view_name
+
+        over_budget = budget is not None and queries.count > budget
+        # A shape run more than REPEAT_LIMIT times is a query per row of some loop
+        repeated = queries.repeated(config['REPEAT_LIMIT'] + 1)
+
+        if over_budget or repeated:
+            problems = []
+            if over_budget:
+                problems.append(f'{queries.count} queries, budget {budget}')
+            problems.extend(f'{count}x {shape}' for shape, count in repeated)
+            message = f"{view_name}: {'; '.join(problems)}"
+            logger.warning(message)
+            if config['RAISE'] and budget is not None:
+                raise QueryBudgetExceeded(message)
+
+        if config['HEADERS']:
+            response['X-Query-Count'] = str(queries.count)
+            if budget is not None:
+                response['X-Query-Budget'] = str(budget)
+            if repeated:
+                shape, count = repeated[0]
+                response['X-Query-Repeated'] = f'{len(repeated)} shape(s); worst {count}x {shape[:200]}'
+
+        return response
@@ -1,3 +1,65 @@
 from django.db import models
 
-# Create your models here.
+
+class ExportJob(models.Model):
+    """
+    A report rendered by the export worker (python manage.py run_export_worker)
+    The table is the queue: workers claim the oldest queued job with a
+    conditional UPDATE, so no broker is needed. Finished files are stored
+    under EXPORT_ROOT by content hash.
+    """
+    FORMAT_CHOICES = (
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel'),
+        ('pdf', 'PDF'),
+    )
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    requested_by = models.ForeignKey(
+        'accounts.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs'
+    )
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    entity = models.CharField(max_length=20)
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    rows_written = models.IntegerField(default=0)
+    total_rows = models.IntegerField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    filename = models.CharField(max_length=200, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Workers claim the oldest job of a status (queued, or running with a stale heartbeat)
+            models.Index(fields=['status', 'created_at'], name='exportjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_format_display()} {self.entity} export #{self.pk} ({self.status})"
+
+    @property
+    def progress(self):
+        """Percent of rows written, None while the total is unknown"""
+        if self.status == 'done':
+            return 100
+        if not self.total_rows:
+            return None
+        return min(round(self.rows_written * 100 / self.total_rows), 99)
+
+    @property
+    def artifact_name(self):
+        """File name under EXPORT_ROOT"""
+        return f"{self.content_hash}.{self.format}" if self.content_hash else ''
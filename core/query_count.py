@@ -0,0 +1,56 @@
+"""
+Database query counting
+Wraps connection.execute_wrapper so code paths can report (and tests can
+assert) how many queries they ran, and groups statements by shape so N+1
+patterns (one query per row of a loop) stand out.
+"""
+
+import re
+from collections import Counter
+
+from django.db import connection
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def query_shape(sql):
+    """sql with literals and IN lists collapsed: queries differing only in values share a shape"""
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+class QueryCounter:
+    """
+    Count the queries run on the default connection inside a `with` block
+
+        with QueryCounter() as queries:
+            ...
+        queries.count, queries.repeated()
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.shapes[query_shape(sql)] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, min_count=2):
+        """[(shape, count)] of shapes run at least min_count times, most repeated first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= min_count]
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
@@ -0,0 +1,196 @@
+"""
+Cache shared by all workers for allocation inputs, workload snapshots, analytics
+and dashboard counters
+Entries live in a Django cache alias (CACHES in settings; a file-based cache by
+default, so no external service is needed) and are grouped in namespaces.
+Each namespace has a generation token that is part of every key: invalidating a
+namespace just replaces the token, which orphans all its entries at once
+(they expire by their TTL). core.signals invalidates on Appointment, Doctor
+and doctor User writes once the transaction commits; single entries (one
+user's dashboard counters) can also be dropped with delete().
+
+Hit/miss counters are kept per process; every STATS_FLUSH_SECONDS a process
+adds what it counted since to totals in the cache itself (best effort:
+file-based incr is not atomic), so lookups themselves never write stats.
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+ALLOCATION = 'allocation'
+WORKLOAD = 'workload'
+ANALYTICS = 'analytics'
+DASHBOARD = 'dashboard'
+NAMESPACES = (ALLOCATION, WORKLOAD, ANALYTICS, DASHBOARD)
+
+DEFAULT_TIMEOUTS = {
+    ALLOCATION: 60,
+    WORKLOAD: 60,
+    ANALYTICS: 300,
+    DASHBOARD: 300,
+}
+
+# Stored instead of None so a cached "nothing" is not mistaken for a miss
+_NONE = '__shared_cache_none__'
+
+# How often a process adds its hit/miss counts to the cross-worker totals
+STATS_FLUSH_SECONDS = 30
+
+
+class SharedCache:
+    """Namespaced get-or-compute cache with generation-based invalidation"""
+
+    def __init__(self, alias='default', key_prefix='medconnect', timeouts=None):
+        self.alias = alias
+        self.key_prefix = key_prefix
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self._lock = threading.Lock()
+        self.hits = dict.fromkeys(NAMESPACES, 0)
+        self.misses = dict.fromkeys(NAMESPACES, 0)
+        # Counts not yet added to the shared totals, by (namespace, outcome)
+        self._unflushed = Counter()
+        self._flushed_at = time.monotonic()
+
+    @classmethod
+    def from_settings(cls, config):
+        """
+        Build from the SHARED_CACHE setting, e.g.
+        {'CACHE_ALIAS': 'default', 'KEY_PREFIX': 'medconnect', 'TIMEOUTS': {'analytics': 300}}
+        """
+        config = config or {}
+        return cls(config.get('CACHE_ALIAS', 'default'), config.get('KEY_PREFIX', 'medconnect'), config.get('TIMEOUTS'))
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _generation_key(self, namespace):
+        return f'{self.key_prefix}:generation:{namespace}'
+
+    def _generation(self, namespace):
+        generation = self.cache.get(self._generation_key(namespace))
+        if generation is None:
+            generation = uuid.uuid4().hex
+            # add() keeps the token another worker may have just set
+            if not self.cache.add(self._generation_key(namespace), generation, None):
+                generation = self.cache.get(self._generation_key(namespace), generation)
+        return generation
+
+    def make_key(self, namespace, parts):
+        raw = '\x1f'.join(str(part) for part in parts)
+        digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        return f'{self.key_prefix}:{namespace}:{self._generation(namespace)}:{digest}'
+
+    def get_or_set(self, namespace, parts, compute, timeout=None):
+        """
+        Cached value for (namespace, parts), computed and stored on a miss
+
+        Args:
+            namespace: One of NAMESPACES; decides the TTL and what invalidates it
+            parts: Values identifying the entry (dates, ids...)
+            compute: Called without arguments on a miss
+            timeout: Seconds to keep the entry (default: the namespace's TTL)
+        """
+        key = self.make_key(namespace, parts)
+        value = self.cache.get(key)
+        if value is not None:
+            self._count(namespace, 'hits')
+            return None if isinstance(value, str) and value == _NONE else value
+
+        self._count(namespace, 'misses')
+        value = compute()
+        self.cache.set(key, _NONE if value is None else value, timeout or self.timeouts.get(namespace, 60))
+        return value
+
+    def delete(self, namespace, *entries):
+        """Drop single entries of a namespace, each given by the parts it was stored under"""
+        self.cache.delete_many([self.make_key(namespace, parts) for parts in entries])
+
+    def invalidate(self, *namespaces):
+        """Drop every entry of the namespaces (all of them if none are given)"""
+        for namespace in namespaces or NAMESPACES:
+            self.cache.set(self._generation_key(namespace), uuid.uuid4().hex, None)
+
+    def _count(self, namespace, outcome):
+        with self._lock:
+            getattr(self, outcome)[namespace] += 1
+            self._unflushed[namespace, outcome] += 1
+            due = time.monotonic() - self._flushed_at >= STATS_FLUSH_SECONDS
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Add this process's counts since the last flush to the shared totals"""
+        with self._lock:
+            unflushed, self._unflushed = self._unflushed, Counter()
+            self._flushed_at = time.monotonic()
+
+        for (namespace, outcome), count in unflushed.items():
+            key = f'{self.key_prefix}:stats:{namespace}:{outcome}'
+            try:
+                self.cache.incr(key, count)
+            except ValueError:
+                # First flush since the counter expired or the cache was cleared
+                if not self.cache.add(key, count, None):
+                    self.cache.incr(key, count)
+
+    def stats(self):
+        """
+        Per-namespace hits and misses, for this process and across all workers
+        (other workers' counts arrive within STATS_FLUSH_SECONDS)
+        """
+        self.flush_stats()
+        shared = self.cache.get_many([
+            f'{self.key_prefix}:stats:{namespace}:{outcome}'
+            for namespace in NAMESPACES
+            for outcome in ('hits', 'misses')
+        ])
+
+        namespaces = {}
+        for namespace in NAMESPACES:
+            hits = shared.get(f'{self.key_prefix}:stats:{namespace}:hits', 0)
+            misses = shared.get(f'{self.key_prefix}:stats:{namespace}:misses', 0)
+            namespaces[namespace] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                'process_hits': self.hits[namespace],
+                'process_misses': self.misses[namespace],
+                'timeout': self.timeouts.get(namespace),
+            }
+
+        return {
+            'backend': settings.CACHES[self.alias]['BACKEND'],
+            'namespaces': namespaces,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = dict.fromkeys(NAMESPACES, 0)
+            self.misses = dict.fromkeys(NAMESPACES, 0)
+            self._unflushed = Counter()
+        self.cache.delete_many([
+            f'{self.key_prefix}:stats:{namespace}:{outcome}'
+            for namespace in NAMESPACES
+            for outcome in ('hits', 'misses')
+        ])
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """This process's SharedCache front, configured from settings.SHARED_CACHE"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = SharedCache.from_settings(getattr(settings, 'SHARED_CACHE', None))
+    return _shared_cache
@@ -0,0 +1,83 @@
+"""
+Invalidates the shared cache (core.shared_cache) when the data behind it changes
+Runs after the transaction commits, so another worker can't recompute and cache
+the pre-commit state under the new generation. Dashboard counters are dropped
+only for the doctor, patient and admin dashboards a write affects, and doctor
+User saves only invalidate when a field the cache uses changes.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from accounts.models import Doctor, Patient, User
+from appointments.models import Appointment
+
+from .dashboard_stats import invalidate_dashboard_stats
+from .shared_cache import ALLOCATION, ANALYTICS, WORKLOAD, get_shared_cache
+
+
+def invalidate_shared_cache(*namespaces):
+    transaction.on_commit(lambda: get_shared_cache().invalidate(*namespaces))
+
+
+def invalidate_dashboards(doctor_ids=(), patient_ids=()):
+    transaction.on_commit(lambda: invalidate_dashboard_stats(doctor_ids, patient_ids))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def invalidate_on_write(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_shared_cache(ALLOCATION, WORKLOAD, ANALYTICS)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_dashboards_on_appointment_write(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    doctor_ids = {instance.doctor_id}
+    # A reassigned pending/confirmed appointment also leaves its previous doctor's
+    # counters (appointments.signals records the old workload key before saving)
+    previous = getattr(instance, '_previous_workload_key', None)
+    if previous is not None:
+        doctor_ids.add(previous[0])
+    invalidate_dashboards(doctor_ids, {instance.patient_id})
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def invalidate_admin_dashboard(sender, instance, raw=False, **kwargs):
+    # Only the admin totals count doctors and patients
+    if not raw:
+        invalidate_dashboards()
+
+
+# User fields cached entries depend on: deactivating a doctor's account removes
+# them from allocation and analytics, and doctor pickers show their name
+CACHED_USER_FIELDS = ('is_active', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_cached_user_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._cached_user_fields = None
+    # Logins only save last_login
+    if raw or instance.pk is None or instance.role != 'doctor':
+        return
+    if update_fields is not None and not set(update_fields) & set(CACHED_USER_FIELDS):
+        return
+    instance._cached_user_fields = sender.objects.filter(pk=instance.pk).values_list(*CACHED_USER_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_on_doctor_user_write(sender, instance, created, raw=False, **kwargs):
+    if raw or instance.role != 'doctor':
+        return
+    previous = getattr(instance, '_cached_user_fields', None)
+    if created or (previous is not None and previous != tuple(getattr(instance, field) for field in CACHED_USER_FIELDS)):
+        invalidate_shared_cache(ALLOCATION, WORKLOAD, ANALYTICS)
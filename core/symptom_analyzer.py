@@ -0,0 +1,513 @@
+"""
+NLP symptom analyzer for MedConnect
+TF-IDF matching against the symptom knowledge base plus urgency keyword detection.
+Imported lazily through core.ai_utils so workers only pay for NumPy, scikit-learn
+and NLTK when the first symptom check arrives.
+"""
+
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import nltk
+from nltk.corpus import stopwords
+from sklearn.feature_extraction.text import TfidfVectorizer
+from django.conf import settings
+
+from .analysis_cache import AnalysisCache
+from .knowledge_base import knowledge_base_mtime, load_knowledge_base
+from .symptom_index import SymptomIndex
+from .urgency_matcher import UrgencyMatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KNOWLEDGE_BASE = Path(__file__).resolve().parent / 'data' / 'symptom_knowledge_base.json'
+
+# Text preprocessing patterns, compiled once
+NON_ALPHANUMERIC_PATTERN = re.compile(r'[^a-z0-9\s]')
+
+# Splits cleaned text exactly like NLTK's word_tokenize, including its
+# Treebank contractions ("cannot" -> "can", "not"; "gonna" -> "gon", "na"; ...)
+TOKEN_PATTERN = re.compile(
+    r'\b(?:can(?=not\b)|gim(?=me\b)|gon(?=na\b)|got(?=ta\b)|lem(?=me\b)|wan(?=na\b))'
+    r'|[a-z0-9]+'
+)
+
+
+def load_stopwords(language='english'):
+    """
+    Load NLTK stopwords without touching the network
+    Looks in the vendored NLTK_DATA_DIR first; run `python manage.py vendor_nltk_data`
+    once (with network access) if the corpus is missing.
+    """
+    data_dir = getattr(settings, 'NLTK_DATA_DIR', None)
+    if data_dir and str(data_dir) not in nltk.data.path:
+        nltk.data.path.insert(0, str(data_dir))
+    return frozenset(stopwords.words(language))
+
+
+class AnalyzerState:
+    """
+    Everything built from one knowledge base version. Never modified after
+    construction, so requests can keep using it while a newer one is built.
+    """
+    
+    def __init__(self, knowledge_base, urgency_matcher, corpus_texts, corpus_labels, index):
+        self.knowledge_base = knowledge_base
+        self.version = knowledge_base.version
+        self.urgency_matcher = urgency_matcher
+        self.corpus_texts = corpus_texts
+        self.corpus_labels = corpus_labels
+        self.index = index
+        self.corpus_array = np.asarray(corpus_texts, dtype=object)
+        
+        # Integer label ids so specialization scoring can run on NumPy arrays
+        self.specialization_names = list(dict.fromkeys(corpus_labels + ['general_medicine']))
+        label_ids = {name: i for i, name in enumerate(self.specialization_names)}
+        self.label_ids = np.array([label_ids[label] for label in corpus_labels], dtype=np.intp)
+        self.general_medicine_id = label_ids['general_medicine']
+
+
+class SymptomAnalyzer:
+    """
+    NLP-based symptom analyzer using TF-IDF and pattern matching
+    Can be extended with TensorFlow models for more advanced analysis
+    """
+    
+    # Texts scored per similarity matrix in analyze_symptoms_batch (bounds memory)
+    BATCH_CHUNK_SIZE = 2048
+    
+    def __init__(self, model_dir=None, knowledge_base_path=None):
+        """
+        Args:
+            model_dir: Directory of the saved model artifact; defaults to
+                settings.SYMPTOM_MODEL_DIR. Pass '' to build in memory only.
+            knowledge_base_path: Knowledge base JSON file; defaults to
+                settings.SYMPTOM_KNOWLEDGE_BASE.
+        """
+        self.model_dir = getattr(settings, 'SYMPTOM_MODEL_DIR', '') if model_dir is None else model_dir
+        self.knowledge_base_path = knowledge_base_path or getattr(
+            settings, 'SYMPTOM_KNOWLEDGE_BASE', DEFAULT_KNOWLEDGE_BASE
+        )
+        
+        # How often (seconds) a request checks the knowledge base file for changes; 0 = never
+        self.reload_interval = getattr(settings, 'SYMPTOM_KNOWLEDGE_BASE_CHECK_SECONDS', 30)
+        self._next_check = time.monotonic() + self.reload_interval
+        self._reload_lock = threading.Lock()
+        
+        # Stopwords are loaded once; preprocess_text only does set lookups
+        self.stop_words = load_stopwords('english')
+        
+        # Everything derived from the knowledge base lives in one state object.
+        # A reload builds a new one and swaps the reference; each request reads
+        # self._state once, so it finishes on the version it started with.
+        self._state = self._build_state(load_knowledge_base(self.knowledge_base_path))
+        self._seen_mtime = self._state.knowledge_base.source_mtime
+        
+        # Optional LRU/TTL cache of analyses keyed by preprocessed text (None = off)
+        self.result_cache = AnalysisCache.from_settings(getattr(settings, 'SYMPTOM_RESULT_CACHE', None))
+    
+    def _build_state(self, knowledge_base):
+        """Build the matcher and corpus index for one knowledge base version"""
+        # Compile the urgency keyword lists into one matcher; earlier levels take priority
+        urgency_matcher = UrgencyMatcher(knowledge_base.urgency_keywords)
+        
+        # Build corpus from symptom knowledge base
+        corpus_texts = []
+        corpus_labels = []
+        for specialization, symptoms in knowledge_base.symptom_specialization_map.items():
+            for symptom in symptoms:
+                corpus_texts.append(symptom)
+                corpus_labels.append(specialization)
+        
+        if not corpus_texts:
+            # Handle empty corpus case with fallback
+            corpus_texts = ['general medicine']
+            corpus_labels = ['general_medicine']
+        
+        # Initialize TF-IDF vectorizer for symptom matching
+        vectorizer = TfidfVectorizer(
+            ngram_range=(1, 2),  # Reduced from 1-3 for better matching
+            #stop_words='english',
+            max_features=1000,
+            lowercase=True,
+            strip_accents='ascii'
+        )
+        
+        # Fit the vectorizer and vectorize the corpus once; reuses the
+        # memory-mapped artifact on disk when it matches this knowledge base
+        index = SymptomIndex.load_or_build(self.model_dir, vectorizer, corpus_texts, corpus_labels)
+        
+        return AnalyzerState(knowledge_base, urgency_matcher, corpus_texts, corpus_labels, index)
+    
+    def reload_knowledge_base(self, wait=False):
+        """
+        Rebuild from the knowledge base file in a background thread, then swap
+        the new state in. Requests keep being served by the current state
+        meanwhile; if the file is invalid the current state stays in place.
+        
+        Returns:
+            The rebuild thread, or None if a rebuild is already running
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return None
+        
+        thread = threading.Thread(target=self._reload, name='symptom-knowledge-base-reload', daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return thread
+    
+    def _reload(self):
+        try:
+            state = self._build_state(load_knowledge_base(self.knowledge_base_path))
+        except ValueError as e:
+            logger.error("%s; keeping version %s", e, self._state.version)
+        except Exception:
+            logger.exception("Symptom knowledge base reload failed; keeping version %s", self._state.version)
+        else:
+            self._state = state
+            logger.info("Symptom knowledge base version %s loaded", state.version)
+        finally:
+            self._reload_lock.release()
+    
+    def check_for_updates(self):
+        """Start a background reload if the knowledge base file changed (at most once per reload_interval)"""
+        if not self.reload_interval or time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + self.reload_interval
+        
+        mtime = knowledge_base_mtime(self.knowledge_base_path)
+        if mtime is not None and mtime != self._seen_mtime and self.reload_knowledge_base():
+            self._seen_mtime = mtime
+    
+    # Read-only views of the current state, for callers that inspect the knowledge base
+    @property
+    def knowledge_base_version(self):
+        return self._state.version
+    
+    @property
+    def symptom_specialization_map(self):
+        return self._state.knowledge_base.symptom_specialization_map
+    
+    @property
+    def high_urgency_keywords(self):
+        return self._state.knowledge_base.urgency_keywords.get('high', [])
+    
+    @property
+    def moderate_urgency_keywords(self):
+        return self._state.knowledge_base.urgency_keywords.get('moderate', [])
+    
+    @property
+    def urgency_matcher(self):
+        return self._state.urgency_matcher
+    
+    @property
+    def corpus_texts(self):
+        return self._state.corpus_texts
+    
+    @property
+    def corpus_labels(self):
+        return self._state.corpus_labels
+    
+    @property
+    def index(self):
+        return self._state.index
+    
+    @property
+    def vectorizer(self):
+        return self._state.index.vectorizer
+    
+    def preprocess_text(self, text):
+        """Clean and preprocess symptom text"""
+        # Lowercase and remove special characters except spaces
+        text = NON_ALPHANUMERIC_PATTERN.sub('', text.lower())
+        
+        # Tokenize and remove stopwords in one pass
+        stop_words = self.stop_words
+        return ' '.join([token for token in TOKEN_PATTERN.findall(text) if token not in stop_words])
+    
+    def analyze_symptoms(self, symptom_text, patient_age=None, patient_gender=None):
+        """
+        Analyze patient symptoms using NLP and return recommendations
+        
+        Args:
+            symptom_text: Patient's description of symptoms
+            patient_age: Patient age (optional, for better recommendations)
+            patient_gender: Patient gender (optional, for better recommendations)
+        
+        Returns:
+            dict with specialization, severity, confidence, recommendations and
+            the knowledge_base_version that produced them
+        """
+        self.check_for_updates()
+        state = self._state
+        
+        if self.result_cache is None:
+            # A single check is a batch of one, so both entry points score identically
+            return self._analyze_chunk(state, [symptom_text], [patient_age], [patient_gender])[0]
+        
+        # Severity comes from the raw text, so it is part of the key; keyword spans
+        # are specific to this exact text and are never taken from the cache
+        processed_text = self.preprocess_text(symptom_text)
+        urgency_matches = state.urgency_matcher.find(symptom_text)
+        cache_key = self.result_cache.make_key(
+            f'{state.version}:{state.index.fingerprint}',
+            processed_text,
+            patient_age,
+            state.urgency_matcher.severity(urgency_matches)
+        )
+        
+        result = self.result_cache.get(cache_key)
+        if result is None:
+            result = self._analyze_chunk(state, [symptom_text], [patient_age], [patient_gender])[0]
+            if processed_text:
+                self.result_cache.set(cache_key, {k: v for k, v in result.items() if k != 'urgency_keywords'})
+            return result
+        
+        result['urgency_keywords'] = [match._asdict() for match in urgency_matches]
+        return result
+    
+    def analyze_symptoms_batch(self, texts, ages=None, genders=None):
+        """
+        Analyze many symptom descriptions at once
+        
+        All texts are vectorized into one sparse matrix and scored against the
+        corpus index with a single matrix product per chunk; top-k selection,
+        specialization scoring and confidence run as NumPy operations over the
+        whole chunk. Results are identical to calling analyze_symptoms per text.
+        
+        Args:
+            texts: Iterable of patients' symptom descriptions
+            ages: Optional list of patient ages, aligned with texts
+            genders: Optional list of patient genders, aligned with texts
+        
+        Returns:
+            list of analysis dicts, in the same order as texts
+        """
+        texts = list(texts)
+        ages = list(ages) if ages is not None else [None] * len(texts)
+        genders = list(genders) if genders is not None else [None] * len(texts)
+        
+        # The whole batch is scored with one knowledge base version, even if a reload lands meanwhile
+        self.check_for_updates()
+        state = self._state
+        
+        results = []
+        for start in range(0, len(texts), self.BATCH_CHUNK_SIZE):
+            end = start + self.BATCH_CHUNK_SIZE
+            results.extend(self._analyze_chunk(state, texts[start:end], ages[start:end], genders[start:end]))
+        
+        return results
+    
+    def _analyze_chunk(self, state, texts, ages, genders):
+        """Score one chunk of texts against one AnalyzerState and assemble the per-text result dicts"""
+        processed_texts = [self.preprocess_text(text) for text in texts]
+        
+        # Score every text against the corpus at once; the inverted index limits
+        # the work to phrases sharing at least one term with each text
+        symptom_vectors = state.index.vectorizer.transform(processed_texts)
+        top_indices, top_similarities = state.index.search(symptom_vectors, 5)
+        scores = self._score_matches(state, top_indices, top_similarities)
+        
+        results = []
+        for row, (symptom_text, processed_text) in enumerate(zip(texts, processed_texts)):
+            if not processed_text:
+                results.append({
+                    'recommended_specialization': 'general_medicine',
+                    'severity': 'low',
+                    'confidence': 0.5,
+                    'recommendations': ['Please provide more details about your symptoms.'],
+                    'matched_symptoms': [],
+                    'urgency_keywords': [],
+                    'knowledge_base_version': state.version
+                })
+                continue
+            
+            recommended_spec = state.specialization_names[scores['recommended'][row]]
+            
+            # Assess severity based on urgency keywords (single scan, spans kept for highlighting)
+            urgency_matches = state.urgency_matcher.find(symptom_text)
+            severity = state.urgency_matcher.severity(urgency_matches)
+            
+            # Generate recommendations
+            recommendations = self._generate_recommendations(
+                recommended_spec,
+                severity,
+                ages[row],
+                genders[row]
+            )
+            
+            results.append({
+                'recommended_specialization': recommended_spec,
+                'severity': severity,
+                'confidence': scores['confidence'][row],
+                'recommendations': recommendations,
+                'matched_symptoms': state.corpus_array[scores['top_indices'][row][scores['matched'][row]]][:3].tolist(),
+                'alternative_specializations': [
+                    state.specialization_names[label]
+                    for label in scores['top_labels'][row][scores['alternative'][row]]
+                ],
+                'urgency_keywords': [match._asdict() for match in urgency_matches],
+                'knowledge_base_version': state.version
+            })
+        
+        return results
+    
+    def _score_matches(self, state, top_indices, top_similarities):
+        """
+        Turn each text's top corpus matches into recommendations
+        
+        Every step works on whole (n_texts, k) arrays; the only loops run over
+        the top-k positions (at most 5), never over texts.
+        
+        Returns:
+            dict of per-text arrays: top_indices, top_labels, recommended,
+            confidence, matched (mask over top_indices) and alternative
+            (mask over top_labels)
+        """
+        top_labels = state.label_ids[top_indices]
+        n_texts, k = top_indices.shape
+        
+        # Use adaptive threshold for matched symptoms (30% of max similarity)
+        max_similarity = top_similarities[:, :1]
+        adaptive_threshold = np.maximum(0.1, max_similarity * 0.3)
+        matched = top_similarities > adaptive_threshold
+        
+        # Boost score if multiple top matches share a specialization
+        same_label = top_labels[:, :, None] == top_labels[:, None, :]
+        weighted = np.where(same_label.sum(axis=2) > 1, top_similarities * 1.1, top_similarities)
+        
+        # Total score per specialization, accumulated in rank order like a running dict
+        totals = np.zeros_like(weighted)
+        for j in range(k):
+            totals = totals + np.where(same_label[:, :, j], weighted[:, j:j + 1], 0.0)
+        
+        # argmax picks the first-ranked specialization among equal totals
+        best_position = np.argmax(totals, axis=1)
+        recommended = top_labels[np.arange(n_texts), best_position]
+        confidence = self._calculate_confidence(top_similarities)
+        
+        # Fall back to general medicine with very low confidence when nothing matched
+        has_match = top_similarities[:, 0] > 0
+        recommended = np.where(has_match, recommended, state.general_medicine_id)
+        confidence = np.where(has_match, confidence, 0.2)
+        
+        # Alternatives: ranks 2-4, different from the recommendation, above threshold, first occurrence only
+        alternative = np.zeros_like(matched)
+        for j in range(1, min(k, 4)):
+            candidate = (top_labels[:, j] != recommended) & (top_similarities[:, j] > 0.2)
+            for earlier in range(1, j):
+                candidate &= ~(alternative[:, earlier] & (top_labels[:, earlier] == top_labels[:, j]))
+            alternative[:, j] = candidate
+        
+        return {
+            'top_indices': top_indices,
+            'top_labels': top_labels,
+            'recommended': recommended,
+            'confidence': np.round(confidence, 2).tolist(),
+            'matched': matched,
+            'alternative': alternative,
+        }
+    
+    def _assess_severity(self, text):
+        """Assess symptom severity based on keywords"""
+        urgency_matcher = self.urgency_matcher
+        return urgency_matcher.severity(urgency_matcher.find(text))
+    
+    def _calculate_confidence(self, top_similarities):
+        """
+        Calculate realistic confidence scores using multiple factors
+        
+        Args:
+            top_similarities: (n_texts, k) similarities of the top matches, best first
+            
+        Returns:
+            np.ndarray: Confidence score between 0.0 and 1.0 per text
+        """
+        # Factor 1: Average similarity of top 3 matches (40% weight)
+        top_3_similarities = top_similarities[:, :3]
+        avg_similarity = np.mean(top_3_similarities, axis=1)
+        
+        # Factor 2: Consistency across matches (25% weight)
+        # Lower standard deviation = more consistent matches
+        if top_3_similarities.shape[1] > 1:
+            consistency = 1.0 - np.minimum(np.std(top_3_similarities, axis=1), 1.0)
+        else:
+            consistency = np.ones(len(top_similarities))
+        
+        # Factor 3: Number of quality matches (20% weight)
+        # Count matches above reasonable threshold
+        quality_matches = (top_3_similarities > 0.2).sum(axis=1)
+        quality_factor = np.minimum(quality_matches / 3.0, 1.0)
+        
+        # Factor 4: Similarity distribution (15% weight)
+        # Prefer scenarios where top match is significantly better than others
+        if top_3_similarities.shape[1] >= 2:
+            distribution = top_3_similarities[:, 0] - top_3_similarities[:, 1]
+            distribution_factor = np.minimum(distribution, 1.0)
+        else:
+            distribution_factor = np.full(len(top_similarities), 0.5)
+        
+        # Calculate weighted confidence
+        confidence = (
+            avg_similarity * 0.4 +
+            consistency * 0.25 +
+            quality_factor * 0.2 +
+            distribution_factor * 0.15
+        )
+        
+        # Apply additional sanity checks
+        # Ensure confidence doesn't exceed maximum similarity by too much
+        max_possible_confidence = np.minimum(top_similarities[:, 0] * 1.2, 1.0)
+        confidence = np.minimum(confidence, max_possible_confidence)
+        
+        # Ensure minimum confidence for reasonable matches
+        confidence = np.where(top_similarities[:, 0] > 0.3, np.maximum(confidence, 0.3), confidence)
+        
+        return np.round(np.clip(confidence, 0.0, 1.0), 2)
+    
+    def _generate_recommendations(self, specialization, severity, age, gender):
+        """Generate personalized recommendations"""
+        recommendations = []
+        
+        # Urgency-based recommendations
+        if severity == 'high':
+            recommendations.append('⚠️ Your symptoms suggest urgent medical attention may be needed.')
+            recommendations.append('Please visit the emergency department or book an immediate consultation.')
+        elif severity == 'moderate':
+            recommendations.append('Your symptoms require medical attention soon.')
+            recommendations.append('Please book an appointment within the next 1-2 days.')
+        else:
+            recommendations.append('Your symptoms can typically be managed with a routine consultation.')
+            recommendations.append('Book an appointment at your convenience.')
+        
+        # Specialization-specific advice
+        spec_advice = {
+            'cardiology': 'Avoid strenuous activities and rest until you see a doctor.',
+            'neurology': 'Keep a symptom diary noting frequency and triggers.',
+            'orthopedics': 'Apply ice/heat as appropriate and avoid aggravating movements.',
+            'dermatology': 'Avoid scratching and keep the affected area clean.',
+            'gastroenterology': 'Stay hydrated and maintain a bland diet until symptoms improve.',
+            'pulmonology': 'Rest, stay hydrated, and avoid smoke/pollutants.',
+            'ent': 'Gargle with warm salt water and stay hydrated.',
+            'ophthalmology': 'Avoid eye strain and bright lights until examined.',
+            'gynecology': 'Track your symptoms and menstrual cycle.',
+            'psychiatry': 'Practice stress management and maintain sleep routine.',
+            'general_medicine': 'Get adequate rest and stay hydrated.'
+        }
+        
+        if specialization in spec_advice:
+            recommendations.append(spec_advice[specialization])
+        
+        # Age-specific recommendations
+        if age:
+            if age < 18:
+                recommendations.append('As this is for a minor, parental/guardian presence is recommended.')
+            elif age > 65:
+                recommendations.append('Given your age, regular health monitoring is advisable.')
+        
+        return recommendations
@@ -0,0 +1,282 @@
+"""
+Benchmark and accuracy regression suite for the symptom analyzer
+Generates a labeled set of synthetic patient complaints, measures latency,
+throughput, peak memory and top-1/top-3 specialization accuracy, and compares
+a run against a saved baseline. Driven by `python manage.py benchmark_symptom_analyzer`.
+"""
+
+import json
+import platform
+import random
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+import sklearn
+
+# Lay descriptions per specialization. Some match knowledge base phrases
+# exactly, others are paraphrases the analyzer has to generalize to.
+COMPLAINTS = {
+    'cardiology': [
+        'chest pain', 'heart palpitations', 'irregular heartbeat', 'high blood pressure',
+        'my heart keeps pounding', 'pain in my chest when walking', 'angina',
+        'heart racing at night', 'feeling faint and dizzy',
+    ],
+    'neurology': [
+        'headache', 'migraine', 'numbness in my hands', 'tingling in my feet',
+        'memory loss', 'vertigo', 'tremor in my hand', 'brain fog',
+        'trouble concentrating', 'seizure',
+    ],
+    'orthopedics': [
+        'back pain', 'knee pain', 'joint pain', 'shoulder pain', 'hip pain',
+        'sprained ankle', 'neck pain after an injury', 'arthritis in my fingers',
+        'leg pain when climbing stairs', 'sports injury',
+    ],
+    'dermatology': [
+        'skin rash', 'itching all over', 'acne', 'eczema', 'psoriasis patches',
+        'a mole that changed shape', 'hives', 'very dry skin', 'skin discoloration',
+    ],
+    'gastroenterology': [
+        'stomach pain', 'abdominal pain', 'nausea', 'diarrhea', 'constipation',
+        'bloating after meals', 'indigestion', 'vomiting', 'digestive issues',
+    ],
+    'pulmonology': [
+        'cough', 'wheezing', 'asthma attacks', 'chest congestion', 'coughing up phlegm',
+        'breathing difficulty', 'bronchitis', 'chest tightness', 'lung pain',
+    ],
+    'ent': [
+        'sore throat', 'ear pain', 'hearing loss', 'ringing in my ears', 'tinnitus',
+        'nasal congestion', 'sinus pressure', 'nose bleeding', 'ear infection',
+        'losing my voice',
+    ],
+    'ophthalmology': [
+        'eye pain', 'blurry vision', 'double vision', 'red eyes', 'eye discharge',
+        'dry eyes', 'watery eyes', 'sensitivity to light', 'vision problems',
+    ],
+    'gynecology': [
+        'menstrual pain', 'irregular periods', 'pelvic pain', 'vaginal discharge',
+        'heavy bleeding during my period', 'missed period', 'menopause symptoms',
+    ],
+    'pediatrics': [
+        'my child has a fever', 'my baby', 'newborn', 'infant',
+        'child cough', 'child rash', 'vaccination for my son', 'growth issues in my daughter',
+    ],
+    'psychiatry': [
+        'depression', 'anxiety', 'panic attacks', 'insomnia', 'mood swings',
+        'constant stress', 'sleep problems', 'feeling hopeless and anxious',
+    ],
+    'general_medicine': [
+        'fever', 'fatigue', 'flu', 'a cold', 'body ache', 'tiredness',
+        'general checkup', 'malaise',
+    ],
+}
+
+TEMPLATES = [
+    '{complaint}',
+    'I have {complaint}',
+    'I have {modifier} {complaint}',
+    "I've been having {complaint} for {duration}",
+    '{complaint} since {duration} ago',
+    'I have {complaint} and {second}',
+    'Experiencing {modifier} {complaint} for {duration}, also {second}',
+    'Need to see someone about {complaint}',
+    '{modifier} {complaint}, {filler}',
+]
+
+MODIFIERS = ['mild', 'moderate', 'persistent', 'recurring', 'worsening', 'severe', 'occasional', 'sudden']
+DURATIONS = ['2 days', 'a week', 'three weeks', 'a month', 'yesterday', 'several months']
+FILLERS = [
+    'not sure what to do', 'please help', 'it is getting annoying',
+    'it started after my trip', 'nothing seems to help',
+]
+
+
+def generate_dataset(size=3000, seed=42):
+    """
+    Deterministic labeled complaints: [{'text', 'age', 'specialization'}, ...]
+    Every text describes symptoms of its labeled specialization only.
+    """
+    rng = random.Random(seed)
+    specializations = sorted(COMPLAINTS)
+    cases = []
+    for i in range(size):
+        specialization = specializations[i % len(specializations)]
+        complaint, second = rng.sample(COMPLAINTS[specialization], 2)
+        text = rng.choice(TEMPLATES).format(
+            complaint=complaint,
+            second=second,
+            modifier=rng.choice(MODIFIERS),
+            duration=rng.choice(DURATIONS),
+            filler=rng.choice(FILLERS),
+        )
+        age = rng.randint(1, 12) if specialization == 'pediatrics' else rng.randint(18, 85)
+        cases.append({'text': text, 'age': age, 'specialization': specialization})
+    return cases
+
+
+def load_dataset(path):
+    """Labeled complaints from a JSON list or JSON Lines file with text/age/specialization"""
+    with open(path, encoding='utf-8') as f:
+        content = f.read().strip()
+    if content.startswith('['):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def _latency_summary(seconds, items):
+    """Percentiles in milliseconds plus items per second"""
+    milliseconds = np.asarray(seconds) * 1000
+    return {
+        'runs': len(seconds),
+        'p50_ms': round(float(np.percentile(milliseconds, 50)), 4),
+        'p95_ms': round(float(np.percentile(milliseconds, 95)), 4),
+        'p99_ms': round(float(np.percentile(milliseconds, 99)), 4),
+        'mean_ms': round(float(milliseconds.mean()), 4),
+        'throughput_per_s': round(items / float(np.sum(seconds)), 1),
+    }
+
+
+def measure_accuracy(results, cases):
+    """Top-1 (recommendation) and top-3 (recommendation + 2 alternatives) accuracy"""
+    per_specialization = {}
+    top1 = top3 = 0
+    for result, case in zip(results, cases):
+        ranked = [result['recommended_specialization']] + result.get('alternative_specializations', [])[:2]
+        hit1 = ranked[0] == case['specialization']
+        hit3 = case['specialization'] in ranked
+        top1 += hit1
+        top3 += hit3
+
+        counts = per_specialization.setdefault(case['specialization'], {'cases': 0, 'top1': 0, 'top3': 0})
+        counts['cases'] += 1
+        counts['top1'] += hit1
+        counts['top3'] += hit3
+
+    return {
+        'cases': len(cases),
+        'top1': round(top1 / len(cases), 4),
+        'top3': round(top3 / len(cases), 4),
+        'per_specialization': {
+            name: {
+                'cases': counts['cases'],
+                'top1': round(counts['top1'] / counts['cases'], 4),
+                'top3': round(counts['top3'] / counts['cases'], 4),
+            }
+            for name, counts in sorted(per_specialization.items())
+        },
+    }
+
+
+def run_benchmark(analyzer_factory, cases, batch_size=256, repeat=5):
+    """
+    Build an analyzer and measure it on cases
+
+    Args:
+        analyzer_factory: Callable returning a fresh SymptomAnalyzer
+        cases: Labeled complaints (see generate_dataset)
+        batch_size: Texts per analyze_symptoms_batch call
+        repeat: Timed passes over the dataset; each call/batch keeps its fastest time
+
+    Returns:
+        JSON-serializable dict of metrics
+    """
+    texts = [case['text'] for case in cases]
+    ages = [case.get('age') for case in cases]
+
+    # Build cost: time of constructing the analyzer, then its peak Python
+    # allocations in a second, traced build (tracing would skew the timing)
+    start = time.perf_counter()
+    analyzer = analyzer_factory()
+    build_seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    analyzer_factory()
+    build_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # Peak allocations of scoring the whole dataset (traced separately, it slows the timed runs)
+    tracemalloc.start()
+    results = analyzer.analyze_symptoms_batch(texts, ages)
+    batch_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    per_call_passes = []
+    for _ in range(repeat):
+        timings = []
+        for text, age in zip(texts, ages):
+            start = time.perf_counter()
+            analyzer.analyze_symptoms(text, age)
+            timings.append(time.perf_counter() - start)
+        per_call_passes.append(timings)
+
+    per_batch_passes = []
+    for _ in range(repeat):
+        timings = []
+        for offset in range(0, len(texts), batch_size):
+            start = time.perf_counter()
+            analyzer.analyze_symptoms_batch(texts[offset:offset + batch_size], ages[offset:offset + batch_size])
+            timings.append(time.perf_counter() - start)
+        per_batch_passes.append(timings)
+
+    # Fastest time per call/batch across passes filters out scheduler and GC noise
+    per_call = _latency_summary(np.min(per_call_passes, axis=0), len(texts))
+    per_batch = _latency_summary(np.min(per_batch_passes, axis=0), len(texts))
+    per_batch['batch_size'] = batch_size
+
+    return {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'knowledge_base_version': analyzer.knowledge_base_version,
+            'result_cache': analyzer.result_cache is not None,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'scikit_learn': sklearn.__version__,
+            'machine': platform.machine(),
+        },
+        'accuracy': measure_accuracy(results, cases),
+        'per_call': per_call,
+        'per_batch': per_batch,
+        'memory': {
+            'build_peak_mib': round(build_peak / 2 ** 20, 3),
+            'batch_peak_mib': round(batch_peak / 2 ** 20, 3),
+        },
+        'build_ms': round(build_seconds * 1000, 1),
+    }
+
+
+def compare_to_baseline(current, baseline, max_accuracy_drop=0.005, max_slowdown=0.5, check_performance=True):
+    """
+    Regressions of current against baseline, as human-readable strings
+
+    Accuracy may not drop by more than max_accuracy_drop (absolute); latency,
+    memory and throughput may not get worse by more than max_slowdown (relative).
+    Performance numbers are only comparable between runs on the same machine.
+    """
+    regressions = []
+
+    for metric in ('top1', 'top3'):
+        before, after = baseline['accuracy'][metric], current['accuracy'][metric]
+        if after < before - max_accuracy_drop:
+            regressions.append(f"accuracy.{metric}: {before:.4f} -> {after:.4f}")
+
+    if not check_performance:
+        return regressions
+
+    lower_is_better = [
+        ('per_call', 'p50_ms'), ('per_call', 'p95_ms'), ('per_call', 'p99_ms'),
+        ('per_batch', 'p50_ms'), ('per_batch', 'p95_ms'), ('per_batch', 'p99_ms'),
+        ('memory', 'build_peak_mib'), ('memory', 'batch_peak_mib'),
+    ]
+    for section, metric in lower_is_better:
+        before, after = baseline[section][metric], current[section][metric]
+        if before and after > before * (1 + max_slowdown):
+            regressions.append(f"{section}.{metric}: {before} -> {after} (+{(after / before - 1) * 100:.0f}%)")
+
+    for section in ('per_call', 'per_batch'):
+        before, after = baseline[section]['throughput_per_s'], current[section]['throughput_per_s']
+        if after < before * (1 - max_slowdown):
+            regressions.append(f"{section}.throughput_per_s: {before} -> {after} ({(after / before - 1) * 100:.0f}%)")
+
+    return regressions
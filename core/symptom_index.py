@@ -0,0 +1,290 @@
+"""
+Persistent TF-IDF model for the symptom knowledge base
+Holds the fitted vectorizer, the L2-normalized corpus matrix, an inverted index
+(term -> corpus rows) and the label array, so a symptom check only vectorizes the
+patient's text and only scores phrases that share a term with it.
+
+Saved as a directory artifact (see `python manage.py build_symptom_model`):
+the arrays are plain .npy files and the vectorizer a joblib pickle, all loaded
+memory-mapped read-only so every worker process shares one page-cache copy.
+Each model version gets its own subdirectory named after its fingerprint,
+written in full under a temporary name and renamed into place, so a reader
+never sees files from two versions; a CURRENT file names the latest one.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import joblib
+import numpy as np
+import sklearn
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+
+class SymptomIndex:
+    """
+    Fitted vectorizer plus sparse corpus matrix (one L2-normalized row per
+    symptom phrase), its transpose as posting lists, and labels.
+    """
+
+    ARRAYS = (
+        'data', 'indices', 'indptr',
+        'postings_data', 'postings_indices', 'postings_indptr',
+        'labels',
+    )
+    VECTORIZER_FILE = 'vectorizer.joblib'
+    META_FILE = 'meta.json'
+    CURRENT_FILE = 'CURRENT'
+
+    def __init__(self, vectorizer, matrix, labels, fingerprint, postings=None):
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.labels = labels
+        self.fingerprint = fingerprint
+        # Inverted index: row t lists the corpus rows containing term t
+        if postings is None:
+            postings = matrix.T.tocsr()
+            postings.sort_indices()
+        self.postings = postings
+
+    @staticmethod
+    def fingerprint_for(vectorizer, texts, labels):
+        """
+        Hash of everything the model depends on, used to detect stale artifacts.
+        Only the vectorizer's parameters are used, so it can be computed before fitting.
+        """
+        params = sorted((key, repr(value)) for key, value in vectorizer.get_params().items())
+        payload = json.dumps([sklearn.__version__, params, list(texts), list(labels)])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def build(cls, vectorizer, texts, labels):
+        """Fit the vectorizer and vectorize the corpus once"""
+        fingerprint = cls.fingerprint_for(vectorizer, texts, labels)
+        vectorizer.fit(texts)
+        matrix = normalize(vectorizer.transform(texts), norm='l2').tocsr()
+        matrix.sort_indices()
+        return cls(vectorizer, matrix, np.asarray(labels, dtype=str), fingerprint)
+
+    @staticmethod
+    def version_name(fingerprint):
+        return fingerprint[:16]
+
+    def save(self, directory):
+        """
+        Write the artifact as a new version under directory and make it current.
+        Versions are immutable: an existing one with this fingerprint is reused.
+
+        Returns:
+            The version's directory
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        version = directory / self.version_name(self.fingerprint)
+
+        if not (version / self.META_FILE).exists():
+            building = Path(tempfile.mkdtemp(prefix=f'.{version.name}.', dir=directory))
+            try:
+                # mkdtemp makes it private; workers may run as another user
+                building.chmod(0o755)
+                arrays = {
+                    'data': self.matrix.data,
+                    'indices': self.matrix.indices,
+                    'indptr': self.matrix.indptr,
+                    'postings_data': self.postings.data,
+                    'postings_indices': self.postings.indices,
+                    'postings_indptr': self.postings.indptr,
+                    'labels': self.labels,
+                }
+                for name, array in arrays.items():
+                    np.save(building / f'{name}.npy', array)
+                joblib.dump(self.vectorizer, building / self.VECTORIZER_FILE)
+                meta = {
+                    'fingerprint': self.fingerprint,
+                    'shape': list(self.matrix.shape),
+                    'sklearn_version': sklearn.__version__,
+                }
+                (building / self.META_FILE).write_text(json.dumps(meta))
+                try:
+                    os.rename(building, version)
+                except OSError:
+                    # Another process published the same version first
+                    if not (version / self.META_FILE).exists():
+                        raise
+            finally:
+                shutil.rmtree(building, ignore_errors=True)
+
+        previous = self._current_version(directory)
+        current_tmp = directory / f'.{self.CURRENT_FILE}.{os.getpid()}.tmp'
+        current_tmp.write_text(version.name)
+        os.replace(current_tmp, directory / self.CURRENT_FILE)
+
+        # Keep the version being replaced for workers still loading it
+        for path in directory.iterdir():
+            if path.is_dir() and not path.name.startswith('.') and path.name not in (version.name, previous):
+                shutil.rmtree(path, ignore_errors=True)
+        return version
+
+    @classmethod
+    def _current_version(cls, directory):
+        try:
+            return (Path(directory) / cls.CURRENT_FILE).read_text().strip() or None
+        except OSError:
+            return None
+
+    @classmethod
+    def load(cls, directory, fingerprint=None, mmap_mode='r'):
+        """
+        Memory-map a saved artifact: the version built for `fingerprint`, or the
+        current one if no fingerprint is given. Returns None if it is missing or
+        was built from a different knowledge base.
+        """
+        directory = Path(directory)
+        name = cls.version_name(fingerprint) if fingerprint is not None else cls._current_version(directory)
+        if name is None:
+            return None
+        directory = directory / name
+        try:
+            meta = json.loads((directory / cls.META_FILE).read_text())
+            if fingerprint is not None and meta['fingerprint'] != fingerprint:
+                return None
+            arrays = {
+                name: np.load(directory / f'{name}.npy', mmap_mode=mmap_mode, allow_pickle=False)
+                for name in cls.ARRAYS
+            }
+            vectorizer = joblib.load(directory / cls.VECTORIZER_FILE, mmap_mode=mmap_mode)
+        except (OSError, ValueError, KeyError, EOFError):
+            return None
+
+        shape = tuple(meta['shape'])
+        matrix = sparse.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']),
+            shape=shape,
+            copy=False
+        )
+        postings = sparse.csr_matrix(
+            (arrays['postings_data'], arrays['postings_indices'], arrays['postings_indptr']),
+            shape=shape[::-1],
+            copy=False
+        )
+        return cls(vectorizer, matrix, arrays['labels'], meta['fingerprint'], postings)
+
+    @classmethod
+    def load_or_build(cls, directory, vectorizer, texts, labels):
+        """
+        Reuse the on-disk artifact when it matches the knowledge base, otherwise
+        fit `vectorizer` (an unfitted template) and save the result
+        """
+        if directory:
+            index = cls.load(directory, cls.fingerprint_for(vectorizer, texts, labels))
+            if index is not None:
+                return index
+
+        index = cls.build(vectorizer, texts, labels)
+
+        if directory:
+            try:
+                index.save(directory)
+            except OSError:
+                # Read-only deployments simply keep the in-memory model
+                pass
+
+        return index
+
+    def search(self, query_vectors, k):
+        """
+        Top-k corpus rows for each vectorized query (row), best first.
+        
+        Walks only the posting lists of the query's terms, so only phrases
+        sharing at least one term are scored. Each score is summed over the
+        same terms in the same order as the brute-force product, so the result
+        is identical to top_k(similarities(query_vectors), k).
+        
+        Returns:
+            (indices, similarities), both shaped (n_queries, k)
+        """
+        query_vectors = normalize(query_vectors, norm='l2')
+        scores = (query_vectors @ self.postings).tocsr()
+        scores.eliminate_zeros()
+        return self._sparse_top_k(scores, k)
+
+    def similarities(self, query_vectors):
+        """
+        Cosine similarity of each vectorized query (row) against every corpus row
+        (dense brute force; search() is the pruned equivalent)
+        """
+        query_vectors = normalize(query_vectors, norm='l2')
+        return (query_vectors @ self.matrix.T).toarray()
+
+    @staticmethod
+    def top_k(similarities, k):
+        """
+        Indices of the k highest similarities per row, best first.
+        Ties resolve toward later corpus rows, as a stable argsort would.
+        Accepts a 1-D array or an (n_queries, n_phrases) matrix.
+        """
+        if similarities.ndim == 1:
+            return SymptomIndex.top_k(similarities[np.newaxis, :], k)[0]
+
+        n_rows, n = similarities.shape
+        k = min(k, n)
+        if k == 0:
+            return np.empty((n_rows, 0), dtype=np.intp)
+
+        if k < n:
+            # Everything above the k-th value is in; fill the rest with the right-most ties
+            kth_value = np.partition(similarities, n - k, axis=1)[:, n - k:n - k + 1]
+            above = similarities > kth_value
+            tied = similarities == kth_value
+            needed = k - above.sum(axis=1, keepdims=True)
+            tied_from_right = np.cumsum(tied[:, ::-1], axis=1)[:, ::-1]
+            selected = above | (tied & (tied_from_right <= needed))
+            candidates = np.nonzero(selected)[1].reshape(n_rows, k)
+        else:
+            candidates = np.broadcast_to(np.arange(n), (n_rows, n))
+
+        # Stable sort on descending similarity, with candidates pre-ordered by descending index
+        candidates = candidates[:, ::-1]
+        values = np.take_along_axis(similarities, candidates, axis=1)
+        order = np.argsort(-values, axis=1, kind='stable')
+        return np.take_along_axis(candidates, order, axis=1)
+
+    @staticmethod
+    def _sparse_top_k(scores, k):
+        """
+        top_k for a sparse score matrix whose stored entries are the candidates.
+        Rows with fewer than k candidates are padded with zero-similarity rows,
+        highest index first, exactly as the dense top_k would pick them.
+        """
+        n_rows, n = scores.shape
+        k = min(k, n)
+        counts = np.diff(scores.indptr)
+        rows = np.repeat(np.arange(n_rows), counts)
+
+        # Sort all candidates by row, then similarity (desc), then index (desc)
+        order = np.lexsort((-scores.indices, -scores.data, rows))
+        rank = np.arange(order.size) - np.repeat(scores.indptr[:-1], counts)
+        keep = rank < k
+
+        top_indices = np.full((n_rows, k), -1, dtype=np.intp)
+        top_similarities = np.zeros((n_rows, k), dtype=scores.dtype)
+        top_indices[rows[order][keep], rank[keep]] = scores.indices[order][keep]
+        top_similarities[rows[order][keep], rank[keep]] = scores.data[order][keep]
+
+        short = np.flatnonzero(counts < k)
+        if short.size:
+            # At most k - 1 candidates can sit among the 2k highest indices,
+            # so those always hold enough zero-similarity rows to fill up
+            highest = n - 1 - np.arange(min(2 * k, n))
+            taken = (highest[np.newaxis, :, np.newaxis] == top_indices[short][:, np.newaxis, :]).any(axis=2)
+            free = ~taken
+            slot = counts[short][:, np.newaxis] + np.cumsum(free, axis=1) - 1
+            fill_row, fill_col = np.nonzero(free & (slot < k))
+            top_indices[short[fill_row], slot[fill_row, fill_col]] = highest[fill_col]
+
+        return top_indices, top_similarities
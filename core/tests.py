@@ -0,0 +1,651 @@
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import time, timedelta
+from functools import partial
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from appointments.models import Appointment, Notification
+from appointments.tests import make_doctor, make_patient
+
+from .allocation_engine import AllocationEngine, DoctorFeatures
+from .dashboard_stats import admin_dashboard_stats, doctor_dashboard_stats, patient_dashboard_stats
+from .export_jobs import claim_next_job, enqueue_export, requeue_stale_jobs, run_job
+from .exports import WRITERS
+from .middleware import QueryBudgetExceeded
+from .models import ExportJob
+from .query_count import QueryCounter, query_shape
+from .shared_cache import ANALYTICS, get_shared_cache
+from .symptom_analyzer import DEFAULT_KNOWLEDGE_BASE, SymptomAnalyzer
+from .symptom_index import SymptomIndex
+from .urgency_matcher import UrgencyMatcher
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def strict_query_count(**overrides):
+    """settings.QUERY_COUNT with headers on and budget overruns raised"""
+    return {**settings.QUERY_COUNT, 'HEADERS': True, 'RAISE': True, **overrides}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SharedCacheTestCase(TestCase):
+    def setUp(self):
+        # Cached entries would outlive each test's rolled back rows
+        get_shared_cache().invalidate()
+
+
+class QueryBudgetTestCase(SharedCacheTestCase):
+    """Enough rows per listing that a query per row would show up as a repeated shape"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='pass', role='admin')
+        cls.doctors = [make_doctor(f'doctor{i}') for i in range(3)]
+        cls.patients = [make_patient(f'patient{i}') for i in range(3)]
+        today = timezone.localdate()
+        for i in range(12):
+            Appointment.objects.create(
+                patient=cls.patients[i % 3], doctor=cls.doctors[i % 2],
+                appointment_date=today + timedelta(days=i % 4), appointment_time=time(9 + i % 8),
+                status=('confirmed', 'pending', 'completed')[i % 3], symptoms='fever and cough',
+            )
+            Notification.objects.create(
+                user=cls.patients[0].user, title=f'Reminder {i}', message='Upcoming appointment',
+                notification_type='appointment',
+            )
+
+
+class QueryCounterTests(QueryBudgetTestCase):
+    def test_query_shape_ignores_values(self):
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE id = 12 AND name = 'a''b'"),
+            query_shape("SELECT * FROM t WHERE id = 7 AND name = 'x'"),
+        )
+        self.assertEqual(
+            query_shape('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            query_shape('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+    def test_repeated_shapes_reveal_n_plus_one(self):
+        with QueryCounter() as queries:
+            [str(appointment) for appointment in Appointment.objects.all()]
+        self.assertEqual(queries.count, 1 + 4 * 12)
+        self.assertEqual(sorted(count for _, count in queries.repeated()), [12, 12, 24])  # patient and doctor users share a shape
+
+        with QueryCounter() as queries:
+            [str(appointment) for appointment in Appointment.objects.select_related('patient__user', 'doctor__user')]
+        self.assertEqual(queries.count, 1)
+        self.assertEqual(queries.repeated(), [])
+
+
+class DashboardStatsTests(SharedCacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctors = [make_doctor(f'doctor{i}') for i in range(2)]
+        cls.patients = [make_patient(f'patient{i}') for i in range(2)]
+        today = timezone.localdate()
+        bookings = ((0, 0, 'completed'), (0, 1, 'pending'), (0, 1, 'completed'), (1, 1, 'confirmed'))
+        for hour, (doctor, patient, status) in enumerate(bookings, start=9):
+            Appointment.objects.create(
+                patient=cls.patients[patient], doctor=cls.doctors[doctor], appointment_date=today,
+                appointment_time=time(hour), status=status,
+            )
+
+    def test_counters_match_separate_counts(self):
+        doctor = self.doctors[0]
+        self.assertEqual(doctor_dashboard_stats(doctor.id), {
+            'total_consultations': doctor.appointments.filter(status='completed').count(),
+            'pending_appointments': doctor.appointments.filter(status='pending').count(),
+            'total_patients': doctor.appointments.values('patient').distinct().count(),
+        })
+        patient = self.patients[1]
+        self.assertEqual(patient_dashboard_stats(patient.id), {
+            'total_appointments': patient.appointments.count(),
+            'upcoming_appointments': patient.appointments.filter(status='confirmed').count(),
+        })
+        stats = admin_dashboard_stats()
+        self.assertEqual(
+            (stats['total_appointments'], stats['pending_appointments'], stats['total_patients'], stats['total_doctors']),
+            (4, 1, 2, 2),
+        )
+
+    def test_one_query_then_cached(self):
+        with QueryCounter() as queries:
+            doctor_dashboard_stats(self.doctors[0].id)
+            patient_dashboard_stats(self.patients[0].id)
+            admin_dashboard_stats()
+        self.assertEqual(queries.count, 3)
+
+        with QueryCounter() as queries:
+            doctor_dashboard_stats(self.doctors[0].id)
+            patient_dashboard_stats(self.patients[0].id)
+            admin_dashboard_stats()
+        self.assertEqual(queries.count, 0)
+
+    def test_writes_drop_affected_entries(self):
+        doctor, other_doctor, patient = self.doctors[0], self.doctors[1], self.patients[0]
+        pending = doctor_dashboard_stats(doctor.id)['pending_appointments']
+        other_stats = doctor_dashboard_stats(other_doctor.id)
+        total = patient_dashboard_stats(patient.id)['total_appointments']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                patient=patient, doctor=doctor, appointment_date=timezone.localdate(), appointment_time=time(16),
+            )
+
+        self.assertEqual(doctor_dashboard_stats(doctor.id)['pending_appointments'], pending + 1)
+        self.assertEqual(patient_dashboard_stats(patient.id)['total_appointments'], total + 1)
+        with QueryCounter() as queries:
+            self.assertEqual(doctor_dashboard_stats(other_doctor.id), other_stats)
+        self.assertEqual(queries.count, 0)
+
+
+class SharedCacheTests(SharedCacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_doctor('doctor')
+
+    def test_lookups_leave_shared_stats_to_flushes(self):
+        shared_cache = get_shared_cache()
+        shared_cache.reset_stats()
+        shared_cache.get_or_set(ANALYTICS, ('stats-test',), lambda: 1)
+        shared_cache.get_or_set(ANALYTICS, ('stats-test',), lambda: 1)
+
+        self.assertIsNone(shared_cache.cache.get(f'{shared_cache.key_prefix}:stats:{ANALYTICS}:hits'))
+        stats = shared_cache.stats()['namespaces'][ANALYTICS]
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_doctor_logins_keep_cached_doctors(self):
+        from .ai_utils import doctor_allocator
+
+        user = self.doctor.user
+        doctor_allocator.get_available_doctors()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(user)
+        with QueryCounter() as queries:
+            doctor_allocator.get_available_doctors()
+        self.assertEqual(queries.count, 0)
+
+        user.first_name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        names = [doctor['name'] for doctor in doctor_allocator.get_available_doctors()]
+        self.assertIn('Renamed', names)
+
+
+@override_settings(QUERY_COUNT=strict_query_count())
+class ViewQueryBudgetTests(QueryBudgetTestCase):
+    def assertWithinBudget(self, user, url_name):
+        self.client.force_login(user)
+        response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(int(response['X-Query-Count']), int(response['X-Query-Budget']))
+        self.assertNotIn('X-Query-Repeated', response)
+
+    def test_patient_views(self):
+        for url_name in ('patient_dashboard', 'appointments:my_appointments'):
+            with self.subTest(url_name):
+                self.assertWithinBudget(self.patients[0].user, url_name)
+
+    def test_doctor_views(self):
+        for url_name in ('doctor_dashboard', 'manage_appointments', 'appointments:my_appointments'):
+            with self.subTest(url_name):
+                self.assertWithinBudget(self.doctors[0].user, url_name)
+
+    def test_admin_views(self):
+        for url_name in ('admin_dashboard', 'manage_patients', 'manage_doctors', 'analytics',
+                         'appointments:my_appointments'):
+            with self.subTest(url_name):
+                self.assertWithinBudget(self.admin, url_name)
+
+    def test_every_budgeted_view_is_covered(self):
+        covered = {
+            'patient_dashboard', 'doctor_dashboard', 'admin_dashboard', 'manage_patients', 'manage_doctors',
+            'analytics', 'appointments:my_appointments', 'manage_appointments',
+        }
+        self.assertEqual(set(settings.QUERY_COUNT['BUDGETS']), covered)
+
+    @override_settings(QUERY_COUNT=strict_query_count(BUDGETS={'patient_dashboard': 2}))
+    def test_over_budget_raises(self):
+        self.client.force_login(self.patients[0].user)
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'patient_dashboard'), self.assertLogs('core.middleware'):
+            self.client.get(reverse('patient_dashboard'))
+
+    @override_settings(QUERY_COUNT={'BUDGETS': {'patient_dashboard': 2}})
+    def test_production_defaults_only_log(self):
+        self.client.force_login(self.patients[0].user)
+        with self.assertLogs('core.middleware', 'WARNING'):
+            response = self.client.get(reverse('patient_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Query-Count', response)
+
+    @override_settings(QUERY_COUNT={'BUDGETS': {'patient_dashboard': 2}})
+    def test_production_skips_unbudgeted_views(self):
+        self.client.force_login(self.patients[0].user)
+        response = self.client.get(reverse('appointments:my_appointments'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hasattr(response.wsgi_request, '_query_count'))
+
+        with self.assertLogs('core.middleware', 'WARNING'):
+            response = self.client.get(reverse('patient_dashboard'))
+        self.assertEqual(response.wsgi_request._query_count[1], 2)
+
+
+class AllocateBatchTests(SharedCacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctors = [make_doctor(f'doctor{i}') for i in range(3)]
+        cls.patient = make_patient('patient')
+
+    def test_batch_uses_free_slots_on_working_days(self):
+        from .ai_utils import doctor_allocator
+
+        day = timezone.localdate() + timedelta(days=10)
+        first, off_duty, third = self.doctors
+        # A pending booking holds the first slot; one doctor doesn't work that day
+        Appointment.objects.create(patient=self.patient, doctor=first, appointment_date=day, appointment_time=time(9))
+        off_duty.available_days = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')[(day.weekday() + 1) % 7]
+        off_duty.save()
+        third.available_time_end = time(9, 30)
+        third.save()
+
+        result = doctor_allocator.allocate_batch(
+            [(self.patient, 'general', day)] * 6, capacity=3
+        )
+
+        booked = Appointment.objects.filter(appointment_date=day).exclude(doctor=off_duty)
+        self.assertFalse(Appointment.objects.filter(appointment_date=day, doctor=off_duty).exists())
+        self.assertEqual(booked.filter(doctor=first).count(), 3)
+        self.assertEqual(booked.filter(doctor=first, appointment_time=time(9)).count(), 1)
+        self.assertEqual(
+            sorted(booked.filter(doctor=third).values_list('appointment_time', flat=True)), [time(9), time(9, 15)]
+        )
+        self.assertEqual(len(result['assignments']), 4)
+        self.assertEqual(len(result['unassigned']), 2)
+
+    def test_command_checks_columns_and_status(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = Path(directory) / 'requests.csv'
+        path.write_text('patient_id,date\nPATIENT,2030-01-01\n', encoding='utf-8')
+
+        with self.assertRaisesMessage(CommandError, 'has no specialization column(s)'):
+            call_command('bulk_allocate', str(path), stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, 'invalid choice'):
+            call_command('bulk_allocate', str(path), '--status', 'booked', stdout=io.StringIO())
+
+
+class StreamingExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='pass', role='admin')
+        cls.doctors = [make_doctor(f'doctor{i}') for i in range(2)]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_workload_streams(self):
+        response = self.client.get(reverse('export_analytics_csv'))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines) - 1, len(self.doctors))
+
+    def test_small_csv_reports_stream(self):
+        patient = make_patient('patient')
+        for hour in (9, 10):
+            Appointment.objects.create(
+                patient=patient, doctor=self.doctors[0], appointment_date=timezone.localdate(), appointment_time=time(hour),
+            )
+
+        # Session and user, then the row count and the rows themselves
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('export_analytics_csv'), {'entity': 'appointments'})
+            self.assertTrue(response.streaming)
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1 + 2)
+        self.assertFalse(ExportJob.objects.exists())
+
+    @override_settings(EXPORT_STREAM_MAX_ROWS=-1)
+    def test_large_reports_are_queued(self):
+        today = timezone.localdate()
+        params = {'entity': 'appointments', 'start': today.isoformat(), 'end': (today + timedelta(days=1)).isoformat()}
+        for url_name, format in (('export_analytics_csv', 'csv'), ('export_analytics_excel', 'xlsx')):
+            with self.subTest(url_name):
+                self.assertRedirects(
+                    self.client.get(reverse(url_name), params), reverse('export_jobs'), fetch_redirect_response=False
+                )
+                job = ExportJob.objects.get(format=format)
+                self.assertEqual((job.entity, job.status, job.start_date), ('appointments', 'queued', today))
+
+        # No PDF layout for appointments at all
+        self.assertRedirects(
+            self.client.get(reverse('export_analytics_pdf'), params), reverse('analytics'),
+            fetch_redirect_response=False,
+        )
+        self.assertFalse(ExportJob.objects.filter(format='pdf').exists())
+
+    def test_invalid_parameters_redirect(self):
+        for params in ({'entity': 'payments'}, {'start': 'yesterday'}, {'start': '2026-02-02', 'end': '2026-02-01'}):
+            with self.subTest(params):
+                self.assertRedirects(
+                    self.client.get(reverse('export_analytics_csv'), params), reverse('analytics'),
+                    fetch_redirect_response=False,
+                )
+
+    def test_excel_export_is_a_workbook(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get(reverse('export_analytics_excel'), {'entity': 'workload'})
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        sheet = workbook.active
+        self.assertEqual(sheet.max_row, 1 + len(self.doctors))
+        self.assertEqual(sheet['A1'].style, 'header')
+
+
+def use_temp_export_root(testcase):
+    """Point EXPORT_ROOT at a directory removed when testcase finishes"""
+    root = tempfile.mkdtemp()
+    testcase.addCleanup(shutil.rmtree, root)
+    settings_override = override_settings(EXPORT_ROOT=root)
+    settings_override.enable()
+    testcase.addCleanup(settings_override.disable)
+
+
+class ExportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='pass', role='admin')
+        doctor, patient = make_doctor('doctor'), make_patient('patient')
+        for hour in (9, 10, 11):
+            Appointment.objects.create(
+                patient=patient, doctor=doctor, appointment_date=timezone.localdate(), appointment_time=time(hour),
+            )
+
+    def setUp(self):
+        use_temp_export_root(self)
+        self.client.force_login(self.admin)
+
+    def test_worker_renders_queued_job_for_download(self):
+        self.client.post(reverse('export_jobs'), {'format': 'csv', 'entity': 'appointments'})
+        job = ExportJob.objects.get()
+        self.assertEqual(job.status, 'queued')
+
+        call_command('run_export_worker', '--once', stdout=io.StringIO())
+
+        status = self.client.get(reverse('export_job_status', args=[job.id])).json()
+        self.assertEqual((status['status'], status['progress'], status['rows_written']), ('done', 100, 3))
+        response = self.client.get(status['download_url'])
+        content = b''.join(response.streaming_content)
+        self.assertEqual(len(content.decode().splitlines()), 1 + 3)
+        self.assertEqual(hashlib.sha256(content).hexdigest(), ExportJob.objects.get().content_hash)
+
+    def test_identical_requests_share_a_job(self):
+        first = enqueue_export(self.admin, 'xlsx', 'workload')
+        self.assertEqual(enqueue_export(self.admin, 'xlsx', 'workload'), first)
+        self.assertNotEqual(enqueue_export(self.admin, 'csv', 'workload'), first)
+        with self.assertRaises(ValueError):
+            enqueue_export(self.admin, 'pdf', 'appointments')
+
+    def test_identical_reports_reuse_the_file(self):
+        # Excel files embed their creation time, so only the parameters can match them
+        write_xlsx = mock.Mock(wraps=WRITERS['xlsx'])
+        with mock.patch.dict(WRITERS, xlsx=write_xlsx):
+            first = run_job(ExportJob.objects.create(requested_by=self.admin, format='xlsx', entity='appointments'))
+            second = run_job(ExportJob.objects.create(requested_by=self.admin, format='xlsx', entity='appointments'))
+            self.assertEqual(write_xlsx.call_count, 1)
+            self.assertEqual(
+                (second.status, second.content_hash, second.size, second.rows_written),
+                ('done', first.content_hash, first.size, 3),
+            )
+
+            ExportJob.objects.filter(id__in=(first.id, second.id)).update(finished_at=timezone.now() - timedelta(hours=1))
+            run_job(ExportJob.objects.create(requested_by=self.admin, format='xlsx', entity='appointments'))
+            self.assertEqual(write_xlsx.call_count, 2)
+
+    def test_stalled_jobs_are_requeued(self):
+        job = enqueue_export(self.admin, 'csv', 'workload')
+        self.assertEqual(claim_next_job('worker-1'), job)
+        self.assertIsNone(claim_next_job('worker-2'))
+
+        ExportJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(requeue_stale_jobs(300), 1)
+        self.assertEqual(claim_next_job('worker-2').worker, 'worker-2')
+
+
+@override_settings(EXPORT_JOB_HEARTBEAT_SECONDS=0.05)
+class ExportHeartbeatTests(TransactionTestCase):
+    def setUp(self):
+        use_temp_export_root(self)
+
+    def test_heartbeat_runs_while_rows_are_slow(self):
+        job = enqueue_export(None, 'csv', 'workload')
+        claim_next_job('worker-1')
+        stale = timezone.now() - timedelta(minutes=10)
+        ExportJob.objects.filter(id=job.id).update(heartbeat_at=stale)
+        beats = []
+
+        def stalled_writer(entity, start, end, file, progress):
+            # No progress() calls: only the clock can keep the job alive
+            for _ in range(100):
+                beats.append(ExportJob.objects.get(id=job.id).heartbeat_at)
+                if beats[-1] > stale:
+                    break
+                threading.Event().wait(0.02)
+
+        with mock.patch.dict(WRITERS, csv=stalled_writer):
+            job = run_job(job)
+
+        self.assertEqual(job.status, 'done')
+        self.assertGreater(beats[-1], stale)
+        self.assertEqual(requeue_stale_jobs(300), 0)
+
+
+class AllocationEngineTests(SimpleTestCase):
+    def test_unknown_specializations_leave_the_engine_unchanged(self):
+        engine = AllocationEngine(['cardiology', 'general'])
+        vocabulary, affinity = dict(engine.specialization_ids), engine.affinity
+        features = DoctorFeatures(
+            [1, 2, 3], ['Sleep Medicine', 'General Medicine', 'cardiology'], [0, 0, 0], [True] * 3, [4.0] * 3, [5] * 3
+        )
+
+        positions, _ = engine.rank(features, 'sleep medicine', k=3)
+        self.assertEqual(list(positions), [0, 1, 2])
+        engine.assign(features, ['sleep medicine', 'made up'], [0, 0, 0], capacity=2)
+
+        self.assertEqual(engine.specialization_ids, vocabulary)
+        self.assertIs(engine.affinity, affinity)
+
+
+class UrgencyMatcherTests(SimpleTestCase):
+    def test_level_names_need_not_be_identifiers(self):
+        matcher = UrgencyMatcher({'very high': ['chest pain'], '2-moderate': ['severe', 'severe pain'], 'low': ['mild']})
+        matches = matcher.find('Severe pain, then chest pain and a mild cough')
+
+        self.assertEqual(
+            [(match.keyword, match.severity) for match in matches],
+            [('severe pain', '2-moderate'), ('chest pain', 'very high'), ('mild', 'low')],
+        )
+        self.assertEqual(matcher.severity(matches), 'very high')
+        self.assertEqual(matcher.severity(matcher.find('no keywords here')), 'low')
+
+
+def build_symptom_analyzer(**kwargs):
+    """A SymptomAnalyzer fitted in memory, without the result cache"""
+    with override_settings(SYMPTOM_RESULT_CACHE=None):
+        return SymptomAnalyzer(model_dir='', **kwargs)
+
+
+class SymptomIndexTests(SimpleTestCase):
+    def test_search_matches_brute_force_ranking(self):
+        analyzer = build_symptom_analyzer()
+        queries = [analyzer.preprocess_text(text) for text in analyzer.corpus_texts] + [
+            'pain', 'severe headache and chest pain', 'fever cough', 'zzz qqq', '',
+        ]
+        vectors = analyzer.vectorizer.transform(queries)
+        k = 5
+
+        indices, similarities = analyzer.index.search(vectors, k)
+        dense = analyzer.index.similarities(vectors)
+        expected = SymptomIndex.top_k(dense, k)
+        np.testing.assert_array_equal(indices, expected)
+        np.testing.assert_array_equal(similarities, np.take_along_axis(dense, expected, axis=1))
+
+        # The queries exercise ties across the k-th place and rows with no matching term
+        ranked = -np.sort(-dense, axis=1)
+        self.assertTrue(((ranked[:, k - 1] == ranked[:, k]) & (ranked[:, k - 1] > 0)).any())
+        self.assertEqual(dense[-2:].max(), 0)
+        last = len(analyzer.corpus_texts) - 1
+        np.testing.assert_array_equal(indices[-1], np.arange(last, last - k, -1))
+
+
+
+class SymptomTokenizerTests(SimpleTestCase):
+    SAMPLES = [
+        "I have chest pain and heart palpitations",
+        "I've been having severe headaches with nausea and some vision problems for the past 3 days",
+        "My child has a high fever and cough, and I cannot get him to sleep",
+        "I don't feel well",
+        "gonna need a checkup, wanna know why my back pain keeps coming back!!",
+        "gimme something for this rash, lemme know, gotta work tomorrow",
+        "Short-of-breath\tafter climbing 2 flights;\nswollen ankles (left > right)",
+        "Café-au-lait spots, 39.5°C fever & earache",
+        "cannotsleep, can not sleep, cannot.",
+        "",
+    ]
+
+    @staticmethod
+    def word_tokenize_preprocess(analyzer, text):
+        """The original preprocessing, with NLTK's tokenizer instead of TOKEN_PATTERN"""
+        from nltk.tokenize.destructive import NLTKWordTokenizer
+
+        text = re.sub(r'[^a-z0-9\s]', '', text.lower())
+        return ' '.join(token for token in NLTKWordTokenizer().tokenize(text) if token not in analyzer.stop_words)
+
+    def test_tokens_and_analyses_match_nltk(self):
+        analyzer = build_symptom_analyzer()
+        legacy = build_symptom_analyzer()
+        legacy.preprocess_text = partial(self.word_tokenize_preprocess, legacy)
+
+        for text in self.SAMPLES:
+            with self.subTest(text):
+                self.assertEqual(analyzer.preprocess_text(text), legacy.preprocess_text(text))
+                self.assertEqual(analyzer.analyze_symptoms(text, 40), legacy.analyze_symptoms(text, 40))
+
+
+class SymptomBatchTests(SimpleTestCase):
+    def test_batch_matches_single_analyses_in_order(self):
+        analyzer = build_symptom_analyzer()
+        texts = SymptomTokenizerTests.SAMPLES + [
+            'severe chest pain radiating to the left arm', 'itchy red rash', 'blurred vision', 'anxiety and insomnia',
+        ]
+        ages = [None, 8, 30, 70] * 4
+        genders = ['female', 'male', None] * 5
+
+        # Several chunks, the last one short
+        analyzer.BATCH_CHUNK_SIZE = 3
+        results = analyzer.analyze_symptoms_batch(texts, ages[:len(texts)], genders[:len(texts)])
+
+        self.assertEqual(results, [
+            analyzer.analyze_symptoms(text, age, gender) for text, age, gender in zip(texts, ages, genders)
+        ])
+        self.assertEqual(analyzer.analyze_symptoms_batch(texts[::-1]), [
+            analyzer.analyze_symptoms(text) for text in texts[::-1]
+        ])
+
+
+class KnowledgeBaseFileTestCase(SimpleTestCase):
+    """Analyzers reading a writable copy of the shipped knowledge base"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.knowledge_base_path = Path(directory) / 'symptom_knowledge_base.json'
+        self.knowledge_base = json.loads(DEFAULT_KNOWLEDGE_BASE.read_text(encoding='utf-8'))
+        self.write_knowledge_base()
+
+    def write_knowledge_base(self, content=None):
+        if content is None:
+            content = json.dumps(self.knowledge_base)
+        self.knowledge_base_path.write_text(content, encoding='utf-8')
+
+    def move_cardiology(self, version):
+        """A new version listing the cardiology phrases under pulmonology"""
+        specializations = self.knowledge_base['specializations']
+        specializations['pulmonology'] += specializations.pop('cardiology')
+        self.knowledge_base['version'] = version
+        self.write_knowledge_base()
+
+
+class AnalysisCacheTests(KnowledgeBaseFileTestCase):
+    def test_returned_results_do_not_share_cached_state(self):
+        with override_settings(SYMPTOM_RESULT_CACHE={'BACKEND': 'local', 'MAX_ENTRIES': 10}):
+            analyzer = SymptomAnalyzer(model_dir='', knowledge_base_path=self.knowledge_base_path)
+        expected = build_symptom_analyzer(knowledge_base_path=self.knowledge_base_path).analyze_symptoms('chest pain', 40)
+
+        for _ in range(3):
+            result = analyzer.analyze_symptoms('chest pain', 40)
+            self.assertEqual(result, expected)
+            result['recommendations'].append('Tampered')
+            result['matched_symptoms'].clear()
+            result['severity'] = 'high'
+        self.assertEqual(analyzer.result_cache.stats()['hits'], 2)
+
+    def test_knowledge_base_change_invalidates_entries(self):
+        with override_settings(SYMPTOM_RESULT_CACHE={'BACKEND': 'local', 'MAX_ENTRIES': 10}):
+            analyzer = SymptomAnalyzer(model_dir='', knowledge_base_path=self.knowledge_base_path)
+        analyzer.analyze_symptoms('palpitations', 40)
+        self.assertEqual(analyzer.analyze_symptoms('palpitations', 40)['recommended_specialization'], 'cardiology')
+
+        self.move_cardiology('2')
+        analyzer.reload_knowledge_base(wait=True)
+
+        result = analyzer.analyze_symptoms('palpitations', 40)
+        self.assertEqual((result['knowledge_base_version'], result['recommended_specialization']), ('2', 'pulmonology'))
+        stats = analyzer.result_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 2, 1))
+
+
+@override_settings(SYMPTOM_KNOWLEDGE_BASE_CHECK_SECONDS=60)
+class KnowledgeBaseReloadTests(KnowledgeBaseFileTestCase):
+    def check_for_updates(self, analyzer):
+        """Touch the file, run the request-time check now and wait for the rebuild"""
+        mtime = analyzer._seen_mtime + 10 ** 9
+        os.utime(self.knowledge_base_path, ns=(mtime, mtime))
+        analyzer._next_check = 0
+        analyzer.check_for_updates()
+        with analyzer._reload_lock:
+            pass
+
+    def test_changed_file_is_reloaded_and_broken_files_are_skipped(self):
+        analyzer = build_symptom_analyzer(knowledge_base_path=self.knowledge_base_path)
+        self.assertEqual(analyzer.analyze_symptoms('palpitations')['knowledge_base_version'], '1')
+
+        self.move_cardiology('2')
+        self.check_for_updates(analyzer)
+        result = analyzer.analyze_symptoms('palpitations')
+        self.assertEqual((result['knowledge_base_version'], result['recommended_specialization']), ('2', 'pulmonology'))
+
+        for content in ('{"version": "3", "specializations": {', '{"version": "3", "specializations": ["fever"]}'):
+            with self.subTest(content), self.assertLogs('core.symptom_analyzer', 'ERROR') as logs:
+                self.write_knowledge_base(content)
+                self.check_for_updates(analyzer)
+            self.assertIn('keeping version 2', logs.output[0])
+            self.assertEqual(analyzer.knowledge_base_version, '2')
+            self.assertEqual(analyzer.analyze_symptoms('palpitations')['recommended_specialization'], 'pulmonology')
@@ -0,0 +1,104 @@
+"""
+Single-pass urgency keyword matcher
+Compiles the urgency keyword lists once into a trie-shaped regex so a symptom
+description is scanned a single time, however many keywords there are
+"""
+
+import re
+from collections import namedtuple
+
+UrgencyMatch = namedtuple('UrgencyMatch', ['keyword', 'severity', 'start', 'end'])
+
+
+def _trie_pattern(keywords):
+    """
+    Build a regex alternation shaped like a prefix trie, e.g.
+    ['severe', 'severe pain', 'seizure'] -> 'se(?:izure|vere(?: pain)?)'.
+    The engine only follows the branch matching the next character, so match
+    cost depends on keyword length, not on how many keywords there are.
+    Optional tails are greedy, so the longest keyword at a position wins.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def walk(node):
+        branches = [re.escape(char) + walk(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            return f'(?:{body})?'
+        return body
+
+    return walk(trie)
+
+
+class UrgencyMatcher:
+    """
+    Finds urgency keywords with word boundaries, case-insensitively.
+
+    Levels are given in priority order (e.g. high before moderate). Keywords may
+    overlap ("severe" and "severe pain"); at each position the highest-priority
+    level wins, so the reported severity matches checking every keyword separately.
+    Level names come from the knowledge base and may be any string; the regex
+    groups are named g0, g1, ... and mapped back to them.
+    """
+
+    def __init__(self, keywords_by_severity):
+        self.levels = []
+        self._group_levels = {}
+        branches = []
+        for severity, keywords in keywords_by_severity.items():
+            keywords = [keyword.lower() for keyword in keywords if keyword]
+            if keywords:
+                group = f'g{len(self.levels)}'
+                self.levels.append(severity)
+                self._group_levels[group] = severity
+                branches.append(f'(?P<{group}>{_trie_pattern(keywords)})\\b')
+
+        # Zero-width lookahead so overlapping keywords are all reported
+        self.pattern = re.compile(r'(?=\b(?:' + '|'.join(branches) + '))', re.IGNORECASE) if branches else None
+
+    def find(self, text):
+        """All keyword hits in text as UrgencyMatch tuples, ordered by position"""
+        if self.pattern is None:
+            return []
+
+        matches = []
+        for match in self.pattern.finditer(text):
+            start, end = match.span(match.lastgroup)
+            severity = self._group_levels[match.lastgroup]
+            matches.append(UrgencyMatch(text[start:end].lower(), severity, start, end))
+        return matches
+
+    def severity(self, matches, default='low'):
+        """Highest-priority level among matches"""
+        found = {match.severity for match in matches}
+        for level in self.levels:
+            if level in found:
+                return level
+        return default
+
+    @staticmethod
+    def highlight(text, matches):
+        """
+        Split text into segments for display, e.g.
+        [{'text': 'I have ', 'severity': None}, {'text': 'severe', 'severity': 'high'}, ...].
+        Overlapping hits are merged into the first one.
+        """
+        segments = []
+        position = 0
+        for match in matches:
+            if match.start < position:
+                continue
+            if match.start > position:
+                segments.append({'text': text[position:match.start], 'severity': None})
+            segments.append({'text': text[match.start:match.end], 'severity': match.severity})
+            position = match.end
+        if position < len(text):
+            segments.append({'text': text[position:], 'severity': None})
+        return segments
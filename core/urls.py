@@ -10,6 +10,10 @@ urlpatterns = [
     path('export/analytics/csv/', views.export_analytics_csv, name='export_analytics_csv'),
     path('export/analytics/excel/', views.export_analytics_excel, name='export_analytics_excel'),
     path('export/analytics/pdf/', views.export_analytics_pdf, name='export_analytics_pdf'),
+    path('admin-dashboard/cache-stats/', views.cache_stats, name='cache_stats'),
+    path('admin-dashboard/exports/', views.export_jobs, name='export_jobs'),
+    path('admin-dashboard/exports/<int:job_id>/status/', views.export_job_status, name='export_job_status'),
+    path('admin-dashboard/exports/<int:job_id>/download/', views.download_export, name='download_export'),
     path('about/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
 ]
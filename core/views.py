@@ -1,21 +1,18 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from accounts.models import Doctor, Patient, User
-from appointments.models import Appointment
-from django.db.models import Count
-import csv
+from appointments.models import Appointment, AppointmentMonthRollup, SpecializationRollup
+from django.db.models import Sum
+from core.dashboard_stats import admin_dashboard_stats
+from core.exports import (
+    ENTITIES as EXPORT_ENTITIES, export_filename, export_rows, parse_export_params, renders_in_request, stream_csv,
+    write_pdf, write_xlsx
+)
 import io
-from datetime import datetime
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+import tempfile
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 
 def index(request):
     """Homepage view"""
@@ -62,23 +59,12 @@ def admin_dashboard(request):
         messages.error(request, 'Access denied. Admin privileges required.')
         return redirect('index')
     
-    total_patients = Patient.objects.count()
-    total_doctors = Doctor.objects.count()
-    total_appointments = Appointment.objects.count()
-    pending_appointments = Appointment.objects.filter(status='pending').count()
-    
-    recent_appointments = Appointment.objects.all().order_by('-created_at')[:10]
-    
-    # Department-wise statistics
-    department_stats = Doctor.objects.values('specialization').annotate(count=Count('id'))
+    recent_appointments = Appointment.objects.select_related('patient__user', 'doctor__user').order_by('-created_at')[:10]
     
+    # Totals and department-wise statistics (cached until the next write)
     context = {
-        'total_patients': total_patients,
-        'total_doctors': total_doctors,
-        'total_appointments': total_appointments,
-        'pending_appointments': pending_appointments,
         'recent_appointments': recent_appointments,
-        'department_stats': department_stats,
+        **admin_dashboard_stats(),
     }
     
     return render(request, 'core/admin_dashboard.html', context)
@@ -112,56 +98,70 @@ def analytics(request):
     
     from core.ai_utils import doctor_allocator
     
-    # Monthly appointment statistics
-    from django.db.models.functions import TruncMonth
-    monthly_appointments = Appointment.objects.annotate(
-        month=TruncMonth('appointment_date')
-    ).values('month').annotate(count=Count('id')).order_by('month')
+    # Charts read the rollup tables (appointments.rollups), not the appointments
+    monthly_appointments = AppointmentMonthRollup.objects.values('month').annotate(
+        count=Sum('appointment_count')
+    ).filter(count__gt=0).order_by('month')
     
-    # Department-wise patient distribution
-    department_patients = Appointment.objects.values(
-        'doctor__specialization'
-    ).annotate(count=Count('patient', distinct=True))
+    specializations = dict(Doctor.SPECIALIZATION_CHOICES)
+    department_patients = SpecializationRollup.objects.filter(patient_count__gt=0).order_by('specialization')
     
     # AI-powered workload analytics
     workload_analytics = doctor_allocator.get_workload_analytics()
     
     context = {
-        'monthly_appointments': list(monthly_appointments),
-        'department_patients': list(department_patients),
+        'monthly_appointments': [
+            {'month': row['month'].isoformat(), 'count': row['count']} for row in monthly_appointments
+        ],
+        'department_patients': [
+            {'specialization': specializations.get(row.specialization, row.specialization or 'General'), 'count': row.patient_count}
+            for row in department_patients
+        ],
         'workload_analytics': workload_analytics,
+        'export_entities': EXPORT_ENTITIES,
     }
     
     return render(request, 'core/analytics.html', context)
 
 
+def _sync_export_params(request, format):
+    """
+    (entity, start, end) of a report to render in this request, or a redirect:
+    invalid parameters go back to analytics, large reports to the background queue
+    """
+    from core.export_jobs import enqueue_export
+    
+    try:
+        entity, start, end = parse_export_params(request.GET)
+        if renders_in_request(format, entity, start, end):
+            return (entity, start, end), None
+        job = enqueue_export(request.user, format, entity, start, end)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return None, redirect('analytics')
+    
+    messages.info(
+        request,
+        f'{entity.title()} reports are generated in the background: '
+        f'report #{job.id} is {job.get_status_display().lower()}.'
+    )
+    return None, redirect('export_jobs')
+
+
 @login_required
 def export_analytics_csv(request):
     if request.user.role != 'admin':
         messages.error(request, 'Access denied')
         return redirect('index')
     
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="analytics_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    writer = csv.writer(response)
+    params, redirect_response = _sync_export_params(request, 'csv')
+    if redirect_response:
+        return redirect_response
+    entity, start, end = params
     
-    # Write headers
-    writer.writerow(['Doctor Name', 'Specialization', 'Upcoming Appointments', 'Workload Status', 'Utilization Rate'])
-    
-    # Get analytics data
-    from core.ai_utils import doctor_allocator
-    analytics = doctor_allocator.get_workload_analytics()
-    
-    # Write data rows
-    for item in analytics:
-        writer.writerow([
-            item['doctor'].user.get_full_name(),
-            item['doctor'].get_specialization_display(),
-            item['workload'],
-            item['status'],
-            f"{item['utilization_rate']:.1f}%"
-        ])
+    # Rows are read in chunks and sent as they are written, never held in memory
+    response = StreamingHttpResponse(stream_csv(export_rows(entity, start, end)), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(entity, start, end, "csv")}"'
     
     return response
 
@@ -172,73 +172,23 @@ def export_analytics_excel(request):
         messages.error(request, 'Access denied')
         return redirect('index')
     
-    # Create workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Analytics Report"
+    params, redirect_response = _sync_export_params(request, 'xlsx')
+    if redirect_response:
+        return redirect_response
+    entity, start, end = params
     
-    # Get analytics data
-    from core.ai_utils import doctor_allocator
-    analytics = doctor_allocator.get_workload_analytics()
-    
-    # Define styles
-    header_font = Font(bold=True, color='FFFFFF')
-    header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-    header_alignment = Alignment(horizontal='center', vertical='center')
-    border = Border(left=Side(style='thin'), right=Side(style='thin'), 
-                   top=Side(style='thin'), bottom=Side(style='thin'))
-    
-    # Write headers
-    headers = ['Doctor Name', 'Specialization', 'Upcoming Appointments', 'Workload Status', 'Utilization Rate']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = border
-    
-    # Write data rows
-    for row, item in enumerate(analytics, 2):
-        data = [
-            item['doctor'].user.get_full_name(),
-            item['doctor'].get_specialization_display(),
-            item['workload'],
-            item['status'],
-            f"{item['utilization_rate']:.1f}%"
-        ]
-        
-        for col, value in enumerate(data, 1):
-            cell = ws.cell(row=row, column=col, value=value)
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            
-            # Color code workload status
-            if col == 4:  # Status column
-                if item['status'] == 'Low':
-                    cell.fill = PatternFill(start_color='D4EDDA', end_color='D4EDDA', fill_type='solid')
-                elif item['status'] == 'Moderate':
-                    cell.fill = PatternFill(start_color='FFF3CD', end_color='FFF3CD', fill_type='solid')
-                else:  # High
-                    cell.fill = PatternFill(start_color='F8D7DA', end_color='F8D7DA', fill_type='solid')
-    
-    # Adjust column widths
-    column_widths = [25, 15, 20, 15, 15]
-    for col, width in enumerate(column_widths, 1):
-        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = width
-    
-    # Save to memory
-    excel_file = io.BytesIO()
-    wb.save(excel_file)
+    # Rows go straight from the database cursor to a temporary file, which is
+    # then sent in chunks and deleted when the response closes it
+    excel_file = tempfile.TemporaryFile()
+    write_xlsx(entity, start, end, excel_file)
     excel_file.seek(0)
     
-    # Create response
-    response = HttpResponse(
-        excel_file.read(),
+    return FileResponse(
+        excel_file,
+        as_attachment=True,
+        filename=export_filename(entity, start, end, 'xlsx'),
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
-    response['Content-Disposition'] = f'attachment; filename="analytics_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-    
-    return response
 
 
 @login_required
@@ -247,77 +197,107 @@ def export_analytics_pdf(request):
         messages.error(request, 'Access denied')
         return redirect('index')
     
-    # Create PDF buffer
+    params, redirect_response = _sync_export_params(request, 'pdf')
+    if redirect_response:
+        return redirect_response
+    entity, start, end = params
+    
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    write_pdf(entity, start, end, buffer)
     
-    # Get analytics data
-    from core.ai_utils import doctor_allocator
-    analytics = doctor_allocator.get_workload_analytics()
-    
-    # Create content
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Title
-    title_style = styles['Heading1']
-    title_style.alignment = 1  # Center alignment
-    elements.append(Paragraph("Analytics & Reports", title_style))
-    elements.append(Paragraph(f"Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
-    elements.append(Paragraph("<br/><br/>", styles['Normal']))
-    
-    # Table data
-    table_data = [['Doctor Name', 'Specialization', 'Appointments', 'Status', 'Utilization']]
-    
-    for item in analytics:
-        table_data.append([
-            item['doctor'].user.get_full_name(),
-            item['doctor'].get_specialization_display(),
-            str(item['workload']),
-            item['status'],
-            f"{item['utilization_rate']:.1f}%"
-        ])
-    
-    # Create table
-    table = Table(table_data, repeatRows=1)
-    
-    # Style table
-    style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#366092')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#F8F9FA')),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#DEE2E6')),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-    ])
-    
-    table.setStyle(style)
-    
-    # Add color coding for status rows
-    for i, item in enumerate(analytics, 1):
-        if item['status'] == 'Low':
-            style.add('BACKGROUND', (3, i), (3, i), colors.HexColor('#D4EDDA'))
-        elif item['status'] == 'Moderate':
-            style.add('BACKGROUND', (3, i), (3, i), colors.HexColor('#FFF3CD'))
-        else:  # High
-            style.add('BACKGROUND', (3, i), (3, i), colors.HexColor('#F8D7DA'))
-    
-    elements.append(table)
-    
-    # Build PDF
-    doc.build(elements)
-    buffer.seek(0)
-    
-    # Create response
-    response = HttpResponse(buffer.read(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="analytics_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
+    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(entity, start, end, "pdf")}"'
     
     return response
 
 
+@login_required
+def export_jobs(request):
+    """Queue background reports (POST) and list recent ones with their progress"""
+    if request.user.role != 'admin':
+        messages.error(request, 'Access denied')
+        return redirect('index')
+    
+    from core.export_jobs import enqueue_export
+    from core.models import ExportJob
+    
+    if request.method == 'POST':
+        try:
+            entity, start, end = parse_export_params(request.POST)
+            job = enqueue_export(request.user, request.POST.get('format', ''), entity, start, end)
+        except ValueError as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, f'Report #{job.id} is {job.get_status_display().lower()}.')
+        return redirect('export_jobs')
+    
+    context = {
+        'jobs': ExportJob.objects.select_related('requested_by')[:50],
+        'export_entities': EXPORT_ENTITIES,
+        'export_formats': ExportJob.FORMAT_CHOICES,
+    }
+    
+    return render(request, 'core/export_jobs.html', context)
+
+
+@login_required
+def export_job_status(request, job_id):
+    """Progress of one export job, as JSON for the polling page"""
+    if request.user.role != 'admin':
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    from core.models import ExportJob
+    
+    job = get_object_or_404(ExportJob, id=job_id)
+    return JsonResponse({
+        'id': job.id,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+        'error': job.error,
+        'download_url': reverse('download_export', args=[job.id]) if job.status == 'done' else None,
+    })
+
+
+@login_required
+def download_export(request, job_id):
+    """A finished export's file, served from EXPORT_ROOT"""
+    if request.user.role != 'admin':
+        messages.error(request, 'Access denied')
+        return redirect('index')
+    
+    from core.export_jobs import artifact_path
+    from core.models import ExportJob
+    
+    job = get_object_or_404(ExportJob, id=job_id, status='done')
+    try:
+        artifact = open(artifact_path(job), 'rb')
+    except FileNotFoundError:
+        raise Http404('The report file has been removed; queue it again')
+    
+    return FileResponse(artifact, as_attachment=True, filename=job.filename)
+
+
+@login_required
+def cache_stats(request):
+    """Hit/miss metrics of the shared cache and the symptom result cache, as JSON"""
+    if request.user.role != 'admin':
+        messages.error(request, 'Access denied')
+        return redirect('index')
+    
+    from core import ai_utils
+    from core.shared_cache import get_shared_cache
+    
+    # Only report the symptom cache of an analyzer this worker has already built
+    analyzer = ai_utils._symptom_analyzer
+    return JsonResponse({
+        'shared': get_shared_cache().stats(),
+        'symptom_results': analyzer.result_cache.stats() if analyzer and analyzer.result_cache else None,
+    })
+
+
 def about(request):
     return render(request, 'core/about.html')
 
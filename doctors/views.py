@@ -2,7 +2,9 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from appointments.models import Appointment, Prescription, MedicalRecord
+from appointments.pagination import appointment_listing
 from accounts.models import Patient
+from core.dashboard_stats import doctor_dashboard_stats
 
 @login_required
 def doctor_dashboard(request):
@@ -11,15 +13,12 @@ def doctor_dashboard(request):
         return redirect('index')
     
     doctor = request.user.doctor_profile
-    today_appointments = Appointment.objects.filter(doctor=doctor, status='confirmed')[:10]
-    total_patients = Appointment.objects.filter(doctor=doctor).values('patient').distinct().count()
+    today_appointments = Appointment.objects.filter(doctor=doctor, status='confirmed').select_related('patient__user')[:10]
     
     context = {
         'doctor': doctor,
         'today_appointments': today_appointments,
-        'total_consultations': Appointment.objects.filter(doctor=doctor, status='completed').count(),
-        'pending_appointments': Appointment.objects.filter(doctor=doctor, status='pending').count(),
-        'total_patients': total_patients,
+        **doctor_dashboard_stats(doctor.id),
     }
     
     return render(request, 'doctors/dashboard.html', context)
@@ -78,12 +77,8 @@ def create_prescription(request, appointment_id):
         follow_up_date = request.POST.get('follow_up_date', None)
         notes = request.POST.get('notes', '')
         
-        # Generate prescription ID
-        prescription_count = Prescription.objects.count() + 1
-        prescription_id = f"PRE{prescription_count:06d}"
-        
+        # The prescription ID is assigned on save
         prescription = Prescription.objects.create(
-            prescription_id=prescription_id,
             appointment=appointment,
             patient=appointment.patient,
             doctor=doctor,
@@ -111,9 +106,10 @@ def manage_appointments(request):
         return redirect('index')
     
     doctor = request.user.doctor_profile
-    appointments = Appointment.objects.filter(doctor=doctor).order_by('-appointment_date', '-appointment_time')
+    appointments = Appointment.objects.filter(doctor=doctor)
     
-    return render(request, 'doctors/manage_appointments.html', {'appointments': appointments})
+    # One page at a time (newest first), filtered by status/date
+    return render(request, 'doctors/manage_appointments.html', appointment_listing(request, appointments))
 
 
 @login_required
@@ -0,0 +1,33 @@
+"""
+Gunicorn settings, picked up automatically from the project directory
+
+preload_app imports Django in the master process before forking. With
+AI_WARMUP_ON_STARTUP=1 the symptom model is loaded there too (in when_ready,
+so management commands such as migrate never pay for it), and workers
+inherit it copy-on-write instead of each building their own. The model's
+arrays are memory-mapped read-only from SYMPTOM_MODEL_DIR (build them with
+`python manage.py build_symptom_model` during deploy), so those pages stay
+shared in the page cache however many workers run.
+"""
+import gc
+
+preload_app = True
+
+
+def when_ready(server):
+    from django.conf import settings
+
+    if getattr(settings, 'AI_WARMUP_ON_STARTUP', False):
+        from core.ai_utils import warm_up
+        warm_up()
+
+    # Move everything loaded so far out of the GC's reach, so collections in
+    # workers don't write to (and un-share) the preloaded objects
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Each worker keeps its own doctor availability slot index; build it now,
+    # off the request path, instead of on the first booking page
+    from appointments.slot_index import warm_slot_index
+    warm_slot_index()
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryCountMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,6 +77,14 @@ DATABASES = {
     }
 }
 
+# Identifiers (APT/PRE/REC) each process reserves per database round trip
+# (appointments.sequences). On PostgreSQL, add a second alias for the same
+# database, e.g. DATABASES['sequences'] = dict(DATABASES['default'], TEST={'MIRROR': 'default'}),
+# and set ID_SEQUENCE_DATABASE = 'sequences' so reservations made inside a
+# booking transaction commit on their own. SQLite must reserve on 'default'.
+ID_SEQUENCE_BLOCK_SIZE = 50
+ID_SEQUENCE_DATABASE = None
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -126,3 +135,96 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 # Session Settings
 SESSION_COOKIE_AGE = 86400  # 24 hours
+
+# Symptom analyzer model artifact (fitted vectorizer + corpus index), memory-mapped
+# read-only by every worker; build it with `python manage.py build_symptom_model`
+SYMPTOM_MODEL_DIR = BASE_DIR / 'var' / 'symptom_model'
+
+# NLTK data vendored with the project so workers never download at boot
+# (refresh with `python manage.py vendor_nltk_data`)
+NLTK_DATA_DIR = BASE_DIR / 'nltk_data'
+
+# Build the symptom analyzer when gunicorn starts (gunicorn.conf.py when_ready)
+# instead of on the first symptom check; runserver and management commands stay lazy
+AI_WARMUP_ON_STARTUP = os.environ.get('AI_WARMUP_ON_STARTUP', '') == '1'
+
+# Cache of symptom analyses keyed by preprocessed text + age bucket.
+# 'local' is a per-worker LRU; 'django' shares entries through CACHES[CACHE_ALIAS].
+SYMPTOM_RESULT_CACHE = {
+    'BACKEND': 'local',
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60 * 60,
+}
+
+# Symptom knowledge base (specialization phrases + urgency keywords), versioned JSON.
+# Workers check it for changes every SYMPTOM_KNOWLEDGE_BASE_CHECK_SECONDS and rebuild
+# in the background, so vocabulary updates need no restart (0 disables the check).
+SYMPTOM_KNOWLEDGE_BASE = BASE_DIR / 'core' / 'data' / 'symptom_knowledge_base.json'
+SYMPTOM_KNOWLEDGE_BASE_CHECK_SECONDS = 30
+
+# Doctor availability slot index (appointments.slot_index): each worker applies
+# appointment changes made by other workers every SLOT_INDEX_REFRESH_SECONDS and
+# rebuilds the whole index every SLOT_INDEX_REBUILD_SECONDS.
+SLOT_INDEX_REFRESH_SECONDS = 5
+SLOT_INDEX_REBUILD_SECONDS = 300
+
+# Cache shared by all workers. The file-based cache needs no external service;
+# point 'default' at Redis/Memcached in production without other changes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('MEDCONNECT_CACHE_DIR', str(BASE_DIR / 'var' / 'cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Allocation inputs, workload snapshots, analytics payloads and dashboard counters
+# (core.shared_cache), TTL in seconds per namespace. Appointment/Doctor writes
+# invalidate them sooner.
+SHARED_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUTS': {
+        'allocation': 60,
+        'workload': 60,
+        'analytics': 300,
+        'dashboard': 300,
+    },
+}
+
+# Rows fetched per database round trip by the streaming exports (core.exports).
+# Appointment and prescription CSVs of up to EXPORT_STREAM_MAX_ROWS rows stream
+# from the request; larger ones, and their Excel/PDF reports, go to the worker.
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_STREAM_MAX_ROWS = 50000
+
+# Background report jobs (core.export_jobs, `python manage.py run_export_worker`).
+# Files are kept out of MEDIA_ROOT (they hold patient data) and only served to
+# admins. An identical request within EXPORT_JOB_REUSE_SECONDS reuses the last
+# report; workers stamp a running job every EXPORT_JOB_HEARTBEAT_SECONDS, and
+# running jobs silent for EXPORT_JOB_STALE_SECONDS are requeued.
+EXPORT_ROOT = Path(os.environ.get('MEDCONNECT_EXPORT_DIR', str(BASE_DIR / 'var' / 'exports')))
+EXPORT_JOB_REUSE_SECONDS = 300
+EXPORT_JOB_HEARTBEAT_SECONDS = 30
+EXPORT_JOB_STALE_SECONDS = 300
+EXPORT_JOB_KEEP_DAYS = 7
+
+# Per-request query budgets (core.middleware.QueryCountMiddleware), keyed by URL
+# name and counting session/user lookups. Over-budget requests and query shapes
+# repeated more than REPEAT_LIMIT times (N+1) are logged; HEADERS adds X-Query-*
+# response headers and RAISE turns problems in budgeted views into errors (tests).
+QUERY_COUNT = {
+    'HEADERS': DEBUG,
+    'RAISE': False,
+    'REPEAT_LIMIT': 3,
+    'BUDGETS': {
+        'patient_dashboard': 6,
+        'doctor_dashboard': 5,
+        'admin_dashboard': 6,
+        'manage_patients': 3,
+        'manage_doctors': 3,
+        'analytics': 5,
+        'appointments:my_appointments': 4,
+        'manage_appointments': 4,
+    },
+}
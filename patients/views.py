@@ -3,6 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from appointments.models import Appointment, MedicalRecord, Prescription, Notification
 from accounts.models import Doctor
+from core.dashboard_stats import patient_dashboard_stats
 import json
 
 @login_required
@@ -12,15 +13,14 @@ def patient_dashboard(request):
         return redirect('index')
     
     patient = request.user.patient_profile
-    appointments = Appointment.objects.filter(patient=patient).order_by('-appointment_date')[:5]
+    appointments = Appointment.objects.filter(patient=patient).select_related('doctor__user').order_by('-appointment_date')[:5]
     notifications = Notification.objects.filter(user=request.user, is_read=False)[:5]
     
     context = {
         'patient': patient,
         'appointments': appointments,
         'notifications': notifications,
-        'total_appointments': Appointment.objects.filter(patient=patient).count(),
-        'upcoming_appointments': Appointment.objects.filter(patient=patient, status='confirmed').count(),
+        **patient_dashboard_stats(patient.id),
     }
     
     return render(request, 'patients/dashboard.html', context)
@@ -74,7 +74,8 @@ def symptom_checker(request):
         'confidence': session_data['confidence'],
         'matched_symptoms': session_data.get('matched_symptoms', []),
         'recommendations': session_data.get('recommendations', ['This is your previous analysis. Submit new symptoms for updated analysis.']),
-        'alternative_specializations': session_data.get('alternative_specializations', [])
+        'alternative_specializations': session_data.get('alternative_specializations', []),
+        'highlighted_symptoms': _highlight_urgency(session_data.get('symptoms', ''), session_data.get('urgency_keywords', []))
     }
     
     if request.method == 'POST':
@@ -111,7 +112,9 @@ def symptom_checker(request):
         'confidence': analysis_result['confidence'],
         'matched_symptoms': analysis_result.get('matched_symptoms', []),
         'recommendations': analysis_result.get('recommendations', []),
-        'alternative_specializations': analysis_result.get('alternative_specializations', [])
+        'alternative_specializations': analysis_result.get('alternative_specializations', []),
+        'urgency_keywords': analysis_result.get('urgency_keywords', []),
+        'knowledge_base_version': analysis_result.get('knowledge_base_version')
 }
         
         ai_response = {
@@ -124,12 +127,22 @@ def symptom_checker(request):
             'alternative_specializations': [
                 spec.replace('_', ' ').title() 
                 for spec in analysis_result.get('alternative_specializations', [])
-            ]
+            ],
+            'highlighted_symptoms': _highlight_urgency(symptoms, analysis_result.get('urgency_keywords', []))
         }
     
     return render(request, 'patients/symptom_checker.html', {'ai_response': ai_response})
 
 
+def _highlight_urgency(symptoms, urgency_keywords):
+    """Split the submitted text into segments, flagging urgency keywords for display"""
+    from core.urgency_matcher import UrgencyMatch, UrgencyMatcher
+    
+    if not urgency_keywords:
+        return []
+    return UrgencyMatcher.highlight(symptoms, [UrgencyMatch(**match) for match in urgency_keywords])
+
+
 @login_required
 def qr_code_view(request):
     if request.user.role != 'patient':